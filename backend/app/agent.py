@@ -6,7 +6,7 @@ Run this script to start the LiveKit agent:
 """
 from dotenv import load_dotenv
 from livekit.agents import cli, WorkerOptions, WorkerPermissions, WorkerType
-from app.services.livekit_agent_service import livekit_agent_entrypoint
+from app.services.livekit_agent_service import livekit_agent_entrypoint, livekit_agent_prewarm
 from app.utils.logger import setup_logging, get_logger
 
 setup_logging()
@@ -18,6 +18,7 @@ if __name__ == "__main__":
     logger.info("Starting LiveKit agent worker...")
     opts = WorkerOptions(
         entrypoint_fnc=livekit_agent_entrypoint,
+        prewarm_fnc=livekit_agent_prewarm,
         worker_type=WorkerType.ROOM,
         permissions=WorkerPermissions(
             can_publish=True,
@@ -1,20 +1,112 @@
 """
-In-memory configuration manager for agent prompts
-No database needed - perfect for demo!
+Configuration manager for agent prompts
+Backed by a shared config store, so a prompt change reaches every process
 """
+from typing import Callable, Dict, List, Optional
 from app.config.prompt import AGENT_SYSTEM_PROMPT
+from app.config.settings import settings
+from app.config.constants import DOCUMENT_CHANGE_LOG_SIZE
+from app.config.config_store import ConfigStore
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
 class ConfigManager:
-    """In-memory configuration manager"""
+    """
+    Agent configuration shared by the API and agent processes
     
-    def __init__(self):
+    The current prompt is cached in memory and refreshed when the store
+    pushes a change notification (see `watch`), so reads never touch disk.
+    
+    The store also carries a short log of changed documents, so a document
+    deleted or re-ingested through one process invalidates the caches of
+    every other one (API workers and agent workers).
+    """
+    
+    def __init__(self, store: Optional[ConfigStore] = None):
+        self._store = store or ConfigStore(settings.CONFIG_STORE_PATH, settings.CONFIG_NOTIFY_DIR)
         # Start with default prompt from prompt.py
         self._current_prompt = AGENT_SYSTEM_PROMPT
-        logger.info("Initialized ConfigManager with default prompt")
+        self._version = 0
+        self._listeners: List[Callable[[str, int], None]] = []
+        self._document_listeners: List[Callable[[Optional[str]], None]] = []
+        self._load(self._store.read())
+        self._store.add_listener(self._load)
+        logger.info(f"Initialized ConfigManager (config version {self._version})")
+    
+    def _load(self, config: Optional[Dict]):
+        """Apply a stored config if it is newer than the cached one"""
+        if not config or config["version"] <= self._version:
+            return
+        seen_version, self._version = self._version, config["version"]
+        self._apply_document_changes(config.get("document_changes") or [], seen_version)
+        
+        prompt = config.get("prompt") or AGENT_SYSTEM_PROMPT
+        if prompt == self._current_prompt:
+            return
+        self._current_prompt = prompt
+        logger.info(f"Loaded system prompt version {self._version} ({len(self._current_prompt)} characters)")
+        for callback in list(self._listeners):
+            try:
+                callback(self._current_prompt, self._version)
+            except Exception as e:
+                logger.error(f"Prompt listener failed: {e}")
+    
+    def _apply_document_changes(self, changes: List[Dict], seen_version: int):
+        """Tell document listeners about changes made since `seen_version`"""
+        if len(changes) >= DOCUMENT_CHANGE_LOG_SIZE and changes[0]["version"] > seen_version + 1:
+            # Older changes were dropped from the log before this process saw them
+            document_ids: List[Optional[str]] = [None]
+        else:
+            document_ids = [change["document_id"] for change in changes if change["version"] > seen_version]
+        for document_id in document_ids:
+            for callback in list(self._document_listeners):
+                try:
+                    callback(document_id)
+                except Exception as e:
+                    logger.error(f"Document listener failed: {e}")
+    
+    @property
+    def version(self) -> int:
+        """Version of the current config (0 until a prompt is stored)"""
+        return self._version
+    
+    def watch(self):
+        """
+        Follow changes made by other processes on the running event loop
+        
+        Catches up with the store first, then applies pushed changes as they
+        arrive. Safe to call repeatedly.
+        """
+        self._load(self._store.read())
+        self._store.subscribe()
+    
+    def add_listener(self, callback: Callable[[str, int], None]):
+        """Call `callback(prompt, version)` whenever the prompt changes"""
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback: Callable[[str, int], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def add_document_listener(self, callback: Callable[[Optional[str]], None]):
+        """
+        Call `callback(document_id)` when a document is deleted or re-ingested
+        by any process (None: any document may have changed)
+        """
+        self._document_listeners.append(callback)
+    
+    def record_document_change(self, document_id: str):
+        """
+        Tell every process that a document was deleted or re-ingested
+        
+        Processes following the store (see `watch`), this one included, get
+        the change on their event loop. Otherwise it is applied here.
+        """
+        config = self._store.append("document_changes", {"document_id": document_id}, DOCUMENT_CHANGE_LOG_SIZE)
+        if not self._store.subscribed:
+            self._load(config)
     
     def get_prompt(self) -> str:
         """Get current system prompt"""
@@ -22,7 +114,7 @@ class ConfigManager:
     
     def update_prompt(self, new_prompt: str) -> str:
         """
-        Update the system prompt (in-memory only)
+        Update the system prompt for all processes
         
         Args:
             new_prompt: New system prompt text
@@ -30,15 +122,20 @@ class ConfigManager:
         Returns:
             Updated prompt
         """
-        self._current_prompt = new_prompt
+        self._load(self._store.write({"prompt": new_prompt}))
         logger.info(f"Updated system prompt ({len(new_prompt)} characters)")
         return self._current_prompt
     
     def reset_prompt(self) -> str:
         """Reset to default prompt"""
-        self._current_prompt = AGENT_SYSTEM_PROMPT
+        # No stored prompt means the default from prompt.py
+        self._load(self._store.write({"prompt": None}))
         logger.info("Reset system prompt to default")
         return self._current_prompt
+    
+    def close(self):
+        """Stop following changes"""
+        self._store.unsubscribe()
 
 
 # Global singleton instance
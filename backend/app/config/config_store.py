@@ -0,0 +1,218 @@
+"""
+Shared, versioned config store with push notification across processes
+
+The config lives in a JSON file written atomically (temp file + rename)
+under an exclusive file lock. Every process that watches the store binds a
+Unix datagram socket in the notify directory; a writer sends the new version
+to all of them, and each reloads the file as soon as the datagram arrives.
+"""
+import asyncio
+import glob
+import json
+import os
+import socket
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from app.utils.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock
+    fcntl = None
+
+logger = get_logger(__name__)
+
+# Unix datagram sockets are unavailable on Windows; the store then only
+# persists changes (other processes see them on their next start)
+NOTIFY_SUPPORTED = hasattr(socket, "AF_UNIX")
+
+
+class ConfigStore:
+    """Versioned JSON config file shared by the API and agent processes"""
+    
+    def __init__(self, path: str, notify_dir: str):
+        """
+        Args:
+            path: JSON file holding the config
+            notify_dir: Directory of subscriber sockets
+        """
+        self.path = path
+        self.notify_dir = notify_dir
+        self._socket: Optional[socket.socket] = None
+        self._socket_path: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listeners: List[Callable[[Dict], None]] = []
+    
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Exclusive lock serializing writers across processes"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def read(self) -> Optional[Dict]:
+        """
+        Read the stored config
+        
+        Returns:
+            Config dict with a `version` key, or None if nothing is stored
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read config store {self.path}: {e}")
+            return None
+    
+    def write(self, values: Dict) -> Dict:
+        """
+        Update the stored config and notify subscribers
+        
+        Args:
+            values: Keys to set
+        
+        Returns:
+            The new config, including its `version`
+        """
+        return self._commit(lambda config: config.update(values))
+    
+    def append(self, key: str, item: Dict, limit: int) -> Dict:
+        """
+        Append to a list in the stored config and notify subscribers
+        
+        The item is stamped with the new config version, so a process can
+        tell which items it has not seen yet.
+        
+        Args:
+            key: List to append to
+            item: JSON-serializable dict
+            limit: Most recent items kept
+        
+        Returns:
+            The new config, including its `version`
+        """
+        def change(config: Dict):
+            items = config.get(key) or []
+            items.append({**item, "version": config["version"] + 1})
+            config[key] = items[-limit:]
+        
+        return self._commit(change)
+    
+    def _commit(self, change: Callable[[Dict], None]) -> Dict:
+        """Apply a change to the stored config under the lock, bump its version and notify"""
+        with self._locked():
+            config = self.read() or {"version": 0}
+            change(config)
+            config["version"] += 1
+            config["updated_at"] = time.time()
+            
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(config, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        
+        logger.info(f"Stored config version {config['version']}")
+        self._notify(config["version"])
+        return config
+    
+    def _notify(self, version: int):
+        """Send the new version to every subscriber socket (including our own)"""
+        if not NOTIFY_SUPPORTED:
+            return
+        message = json.dumps({"version": version}).encode("utf-8")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False)
+            for path in glob.glob(os.path.join(self.notify_dir, "*.sock")):
+                try:
+                    sender.sendto(message, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Subscriber exited without cleaning up
+                    self._unlink(path)
+                except BlockingIOError:
+                    logger.warning(f"Config subscriber {path} is not draining notifications")
+    
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    
+    @property
+    def subscribed(self) -> bool:
+        """Whether notifications (including for our own writes) arrive on an event loop"""
+        return self._socket is not None
+    
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """Call `callback(config)` whenever a notification arrives"""
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback: Callable[[Dict], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def subscribe(self):
+        """
+        Receive change notifications on the running event loop
+        
+        Idempotent per loop; must be called from within the loop.
+        """
+        loop = asyncio.get_running_loop()
+        if not NOTIFY_SUPPORTED or self._loop is loop:
+            return
+        self.unsubscribe()
+        
+        os.makedirs(self.notify_dir, exist_ok=True)
+        self._socket_path = os.path.join(self.notify_dir, f"{os.getpid()}-{id(loop):x}.sock")
+        self._unlink(self._socket_path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._socket.bind(self._socket_path)
+        loop.add_reader(self._socket.fileno(), self._on_notification)
+        self._loop = loop
+        logger.info(f"Subscribed to config changes at {self._socket_path}")
+    
+    def unsubscribe(self):
+        """Stop receiving notifications and remove the subscriber socket"""
+        if self._socket is None:
+            return
+        try:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.remove_reader(self._socket.fileno())
+        finally:
+            self._socket.close()
+            self._unlink(self._socket_path)
+            self._socket, self._socket_path, self._loop = None, None, None
+    
+    def _on_notification(self):
+        """Drain pending datagrams, then reload once and notify listeners"""
+        try:
+            while True:
+                self._socket.recv(1024)
+        except BlockingIOError:
+            pass
+        
+        config = self.read()
+        if config is None:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(config)
+            except Exception as e:
+                logger.error(f"Config listener failed: {e}")
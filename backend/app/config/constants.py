@@ -13,9 +13,32 @@ CHUNK_OVERLAP = 200  # characters
 # Embedding configuration
 EMBEDDING_MODEL = "text-embedding-3-small"
 EMBEDDING_DIMENSION = 1536
+LOCAL_EMBEDDING_NONZEROS = 8  # Dimensions each word/bigram is projected onto by the local provider
+LOCAL_EMBEDDING_BIGRAM_WEIGHT = 0.5  # Weight of word bigrams relative to single words
+LOCAL_EMBEDDING_SEED = 0  # Changing it changes every local vector (re-ingest documents)
+LOCAL_EMBEDDING_CACHE_SIZE = 100_000  # Cached word hashes
+LOCAL_EMBEDDING_THREAD_MIN_TEXTS = 64  # Batches this large are embedded off the event loop
+
+# Near-duplicate chunk detection (MinHash/LSH, before embedding)
+DEDUP_NUM_PERM = 128  # MinHash signature length
+DEDUP_BANDS = 16  # LSH bands (8 rows each): candidate threshold ~0.7, 99% recall at 0.85
+DEDUP_SHINGLE_WORDS = 3  # Words per shingle
+DEDUP_SIMILARITY_THRESHOLD = 0.85  # Estimated Jaccard similarity that counts as a duplicate
+DEDUP_SEED = 1  # Changing it invalidates stored signatures (delete the dedup index)
+# Chunks with identical text within a document are dropped; near-duplicates within it
+# keep their text and reuse the first copy's embedding.
+# Chunks duplicating another document's: "alias" embeds nothing and reuses the stored
+# embedding (the chunk is still stored); "skip" drops the chunk (fewer repeated hits, but
+# the text is gone if the other document is deleted); "off" checks within documents only
+DEDUP_ACROSS_DOCUMENTS = "alias"
+DEDUP_MAX_CANDIDATES = 20  # Stored chunks compared per band bucket
 
 # LLM configuration
 LLM_MODEL = "gpt-5-mini"
+LLM_CONTEXT_TOKEN_BUDGET = 2000  # Max (estimated) tokens of document context per prompt
+CHARS_PER_TOKEN = 4  # Rough English average used by the local token estimator
+LLM_CACHE_TTL_SECONDS = 24 * 60 * 60  # Cached completions expire after a day
+LLM_CACHE_MAX_ENTRIES = 2000  # Least recently used completions are evicted beyond this
 
 RAG_TOP_K=5
 
@@ -27,10 +50,131 @@ REALTIME_TEMPERATURE = 0.8
 
 # RAG configuration
 RAG_TOP_K = 5  # Number of chunks to retrieve
+RAG_ADAPTIVE_TOP_K = True  # Drop chunks that are not close to the best hit
+RAG_MIN_SIMILARITY = 0.25  # Cosine similarity the best hit must reach to use any context
+RAG_RELEVANCE_MARGIN = 0.1  # Keep chunks within this similarity of the best hit
+
+# Two-stage retrieval: route each query to its best documents, then search only their chunks
+RAG_TWO_STAGE_RETRIEVAL = False  # Pays off with exact search (snapshot mode); HNSW is fast enough flat
+RAG_ROUTE_TOP_DOCUMENTS = 20  # Documents whose chunks are searched in the second stage
+RAG_ROUTE_OVERSAMPLE = 3  # Summary vectors fetched per routed document (documents have several)
+DOCUMENT_SUMMARY_SECTION_CHUNKS = 16  # Consecutive chunks averaged into one summary vector
+
+# Latency-SLO retrieval configuration (voice turns)
+VOICE_RETRIEVAL_LATENCY_SLO = True  # Deadline-bound retrieval in the LiveKit agent
+EMBEDDING_DEADLINE_SECONDS = 0.8  # Hard deadline for the query embedding
+EMBEDDING_HEDGE_PERCENTILE = 0.9  # Hedge once the first call is slower than this percentile
+EMBEDDING_HEDGE_MIN_DELAY_SECONDS = 0.15  # Never hedge earlier than this
+EMBEDDING_LATENCY_WINDOW = 200  # Recent latency samples used for the percentile
+RETRIEVAL_CACHE_SIZE = 256  # Recent query results kept as a fallback
+LEXICAL_FALLBACK_MAX_TERMS = 6  # Query terms used by the lexical fallback
+LEXICAL_FALLBACK_CANDIDATES = 50  # Chunks scanned by the lexical fallback
+
+# Speculative retrieval on interim transcripts (voice turns)
+SPECULATIVE_RETRIEVAL_ENABLED = True
+SPECULATIVE_MIN_WORDS = 3  # Interim transcripts shorter than this are never prefetched
+SPECULATIVE_STABILITY_RATIO = 0.8  # Consecutive interims this similar count as stable
+SPECULATIVE_REUSE_RATIO = 0.85  # Final text this similar to the prefetch reuses its result
+
+# Retrieval gating (voice turns): skip RAG for utterances that need no documents
+RETRIEVAL_GATE_ENABLED = True
+RETRIEVAL_GATE_STOP_PHRASES = [
+    "yes", "yeah", "yep", "no", "nope", "ok", "okay", "sure", "right", "alright",
+    "thanks", "thank you", "thank you very much", "thanks a lot", "great", "cool", "nice",
+    "got it", "i see", "makes sense", "hello", "hi", "hey", "bye", "goodbye",
+    "hmm", "uh huh", "mm hmm", "wait", "hold on", "never mind", "go on", "continue",
+    "can you repeat that", "repeat that", "say that again", "what did you say",
+    "sorry", "pardon", "come again"
+]
+RETRIEVAL_GATE_FOLLOWUP_WORDS = [
+    "it", "that", "this", "those", "these", "they", "them", "he", "she",
+    "more", "else", "also", "again", "why", "how", "example", "elaborate", "explain"
+]
+RETRIEVAL_GATE_MAX_FOLLOWUP_WORDS = 6  # Longer utterances are treated as new questions
+# Logistic classifier over cheap features; retrieve when the score reaches the threshold
+RETRIEVAL_GATE_WEIGHTS = {
+    "content_words": 1.0,  # Topic words (capped at 4)
+    "question": 1.2,  # Starts with a question/request word or ends with "?"
+    "entity": 0.8,  # Contains a number or a capitalized word mid-sentence
+    "stopword_ratio": -1.2,
+    "followup": -0.6,  # Leans on the previous turn ("tell me more about it")
+}
+RETRIEVAL_GATE_BIAS = -1.0
+RETRIEVAL_GATE_THRESHOLD = 0.5
+
+# Per-session conversation memory (voice turns)
+CONVERSATION_MEMORY_ENABLED = True
+CONVERSATION_MEMORY_TURNS = 4  # Recent user turns kept for query condensing
+CONVERSATION_CONDENSE_MIN_CONTENT_WORDS = 2  # Utterances with fewer topic words borrow from recent turns
+CONVERSATION_QUERY_MAX_TERMS = 8  # Topic words borrowed from recent turns
+SESSION_CHUNK_CACHE_SIZE = 200  # Chunks kept per session so repeated hits skip the chunk fetch
+DOCUMENT_CHANGE_LOG_SIZE = 100  # Recent document changes kept in the config store for other processes
+
+# Realtime session context injection (voice turns)
+RAG_INJECT_CHAT_CONTEXT = True  # Replace a per-turn context message in the session chat context
+RAG_RETRIEVAL_TOOL_ENABLED = True  # Expose a search_documents tool the model can call before answering
+RAG_REALTIME_CONTEXT_TOKEN_BUDGET = 800  # Max (estimated) context tokens kept in the realtime session
+RAG_CONTEXT_ITEM_PREFIX = "rag_context"  # Chat item id prefix of injected context messages
+RAG_CONTEXT_INSTRUCTIONS = (
+    "Excerpts from the user's documents for the latest question are provided in system messages "
+    "starting with [RAG_CONTEXT]. Answer from them, and say so clearly if they do not contain the answer."
+)
+RAG_TOOL_INSTRUCTIONS = "If no excerpt covers the question, call search_documents before answering."
+
+# rag_sources data-channel payloads
+RAG_SOURCES_PAYLOAD_MODE = "compact"  # "compact" (ids, scores, snippets) or "full" (chunk text)
+RAG_SOURCES_SNIPPET_CHARS = 160  # Snippet length in compact payloads
+RAG_SOURCES_COMPRESSION = False  # zlib-compress payloads (sent on the "<type>.deflate" topic)
+
+# Agent turn management
+MAX_CONCURRENT_TURNS_PER_ROOM = 2  # Turn handlers allowed to run at once in one room
 
 # ChromaDB configuration
 CHROMA_COLLECTION_NAME = "Voice_Ai"
 
+# Retrieval daemon (sidecar) configuration
+SIDECAR_BATCH_WINDOW_MS = 2  # Queries arriving within this window share one ChromaDB call
+SIDECAR_MAX_BATCH = 32  # Max queries per batched ChromaDB call
+SIDECAR_MAX_FRAME_BYTES = 64 * 1024 * 1024  # Reject frames larger than this
+SIDECAR_TIMEOUT_SECONDS = 30  # Client socket timeout for reads
+SIDECAR_WRITE_TIMEOUT_SECONDS = 300  # Writes also republish the snapshot, so they get longer
+SIDECAR_ADD_BATCH_BYTES = 32 * 1024 * 1024  # Target add frame size (well under the frame limit)
+
+# Index snapshots (RETRIEVAL_MODE=snapshot)
+INDEX_SNAPSHOT_KEEP = 3  # Published snapshot files kept by the daemon
+INDEX_SNAPSHOT_REFRESH_SECONDS = 0.5  # How often readers look for a newer snapshot
+INDEX_SNAPSHOT_PUBLISH_SECONDS = 0.2  # Writes within this interval share one published snapshot
+
+# Latency tracing
+TRACE_BUFFER_SIZE = 1000  # Completed traces kept in memory per process
+TRACE_EXPORT_MAX_BYTES = 10 * 1024 * 1024  # Roll a process's trace export file over at this size
+TRACE_EXPORT_BACKUPS = 3  # Rolled-over trace files kept per process (traces.<pid>.jsonl.1, .2, ...)
+TRACE_EXPORT_RETENTION_SECONDS = 7 * 24 * 3600  # Export files untouched this long are deleted at startup
+TRACE_HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Metrics (/metrics on the API, textfiles from agent workers)
+METRICS_LATENCY_BUCKETS_SECONDS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+METRICS_SIZE_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+METRICS_TOKEN_BUCKETS = [10, 50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000]
+METRICS_TEXTFILE_INTERVAL_SECONDS = 15  # How often agent workers rewrite their metrics textfile
+
+# Logging: hot-path INFO records are sampled and rate limited per logger
+# (warnings and errors always pass)
+LOG_SAMPLE_RATES = {  # Logger name prefix -> share of INFO records kept
+    "app.repositories.vector_repository": 0.1,
+    "app.repositories.sidecar_client": 0.1,
+    "app.services.embedding_service": 0.1,
+    "app.services.retrieval_service": 0.25,
+    "app.services.llm_service": 0.25,
+    "app.services.speculative_retrieval": 0.25,
+    "app.routes.chat": 0.25,
+}
+LOG_RATE_LIMIT_PER_SECOND = 50  # Sustained INFO records per logger
+LOG_RATE_LIMIT_BURST = 200  # INFO records a logger may emit at once
+
+# API warmup (/ready stays 503 while a required step has failed)
+WARMUP_RETRY_SECONDS = 10  # Interval between retries of failed required warmup steps
+
 # Document statuses
 DOC_STATUS_UPLOADING = "uploading"
 DOC_STATUS_PROCESSING = "processing"
@@ -10,6 +10,11 @@ class Settings(BaseSettings):
     
     # OpenAI Configuration
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None  # Override for OpenAI-compatible endpoints (e.g. the load-test fake)
+    
+    # Embedding Provider: "openai" or "local" (offline hashing embedder; uses
+    # its own ChromaDB collection, so documents must be uploaded again)
+    EMBEDDING_PROVIDER: str = "openai"
     
     # LiveKit Configuration
     LIVEKIT_URL: str = "ws://localhost:7880"
@@ -19,6 +24,27 @@ class Settings(BaseSettings):
     # ChromaDB Configuration
     CHROMA_DB_PATH: str = "./chroma_db"
     
+    # Retrieval Mode: "embedded" opens ChromaDB in-process, "sidecar" talks to
+    # the retrieval daemon (python -m app.retrieval_daemon) over a Unix socket,
+    # "snapshot" queries the daemon's published snapshots in-process and sends
+    # writes to the daemon (for many API workers)
+    RETRIEVAL_MODE: str = "embedded"
+    RETRIEVAL_SOCKET_PATH: str = "./run/retrieval.sock"
+    INDEX_SNAPSHOT_DIR: str = "./run/index_snapshots"  # Daemon publishes snapshots here ("" disables)
+    
+    # Shared Agent Config Store (persisted prompt; changes are pushed to every
+    # API and agent process subscribed in CONFIG_NOTIFY_DIR)
+    CONFIG_STORE_PATH: str = "./run/agent_config.json"
+    CONFIG_NOTIFY_DIR: str = "./run/config_subscribers"
+    
+    # LLM Completion Cache Configuration
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "./cache/llm_cache.sqlite3"
+    
+    # Near-Duplicate Chunk Detection (chunks are checked before embedding)
+    DEDUP_ENABLED: bool = True
+    DEDUP_INDEX_PATH: str = "./cache/dedup_index.sqlite3"
+    
     # File Upload Configuration
     UPLOAD_DIR: str = "./uploads"
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB in bytes
@@ -26,6 +52,16 @@ class Settings(BaseSettings):
     # Application Settings
     DEBUG: bool = False
     LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_ENABLED: bool = True  # Write logs from a background thread (off: synchronous handlers)
+    LOG_FORMAT: str = "text"  # "text" or "json" (one object per line)
+    
+    # Latency Tracing (completed traces are appended here as JSON lines)
+    TRACING_ENABLED: bool = True
+    TRACE_EXPORT_PATH: str = "./logs/traces.jsonl"
+    
+    # Metrics: agent workers write agent-<pid>.prom here for the node_exporter
+    # textfile collector (empty disables); the API serves /metrics itself
+    METRICS_TEXTFILE_DIR: str = "./run/metrics"
     
     # API Settings
     API_V1_PREFIX: str = "/api"
@@ -1,13 +1,18 @@
 """
 Main FastAPI application (simplified - no database!)
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import os
 from app.config.settings import settings
-from app.routes import documents, agent, livekit, chat
+from app.config.config_manager import config_manager
+from app.routes import documents, agent, livekit, chat, traces
+from app.services.warmup import warmup_service
 from app.utils.logger import setup_logging, get_logger
+from app.utils.metrics import registry, CONTENT_TYPE
 
 # Setup logging
 setup_logging()
@@ -35,12 +40,21 @@ async def lifespan(app: FastAPI):
     os.makedirs("logs", exist_ok=True)
     logger.info("Logs directory ready: ./logs")
     
+    # Follow prompt changes made through other API workers
+    config_manager.watch()
+    
+    # Open ChromaDB, create the OpenAI clients etc. in the background: the
+    # server accepts requests right away and /ready reports when this is done
+    warmup_task = asyncio.create_task(warmup_service.run())
+    
     logger.info("Backend started successfully!")
     
     yield
     
     # Shutdown
     logger.info("Shutting down Voice AI Backend...")
+    warmup_task.cancel()
+    config_manager.close()
 
 
 # Create FastAPI application
@@ -65,6 +79,7 @@ app.include_router(documents.router, prefix=settings.API_V1_PREFIX)
 app.include_router(agent.router, prefix=settings.API_V1_PREFIX)
 app.include_router(livekit.router, prefix=settings.API_V1_PREFIX)
 app.include_router(chat.router, prefix=settings.API_V1_PREFIX)
+app.include_router(traces.router, prefix=settings.API_V1_PREFIX)
 
 
 @app.get("/")
@@ -79,6 +94,12 @@ async def root():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Process metrics in the Prometheus text exposition format"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health():
     """Health check endpoint"""
@@ -88,6 +109,16 @@ async def health():
     }
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness check: 200 once warmup has finished, 503 before or while a required step has failed"""
+    status = warmup_service.status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content={"success": status["ready"], "data": status}
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
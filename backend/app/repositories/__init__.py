@@ -1,9 +1,16 @@
 """
 Repositories package (ChromaDB only - no database!)
+
+Exports are imported on first access (PEP 562).
 """
-from app.repositories.vector_repository import VectorRepository, vector_repository
+from app.utils.lazy import lazy_exports
 
 __all__ = [
     "VectorRepository",
     "vector_repository"
 ]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "VectorRepository": "vector_repository",
+    "vector_repository": "vector_repository"
+})
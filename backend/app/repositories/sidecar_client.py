@@ -0,0 +1,276 @@
+"""
+Client for the retrieval daemon (sidecar mode)
+"""
+import itertools
+import json
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Optional, Tuple
+from app.config.constants import SIDECAR_TIMEOUT_SECONDS, SIDECAR_WRITE_TIMEOUT_SECONDS, SIDECAR_ADD_BATCH_BYTES
+from app.utils.wire_protocol import (
+    encode_frame,
+    recv_frame,
+    OP_QUERY,
+    OP_ADD,
+    OP_DELETE,
+    OP_GET,
+    OP_COUNT,
+    OP_LEXICAL,
+    OP_ROUTE,
+    OP_ADD_SUMMARIES,
+    OP_ERROR
+)
+from app.utils.logger import get_logger
+from app.utils.metrics import VECTOR_QUERY_SECONDS
+
+logger = get_logger(__name__)
+
+# Client-side latency, including the round trip to the daemon
+_QUERY_SECONDS = VECTOR_QUERY_SECONDS.labels("sidecar", "query")
+_LEXICAL_SECONDS = VECTOR_QUERY_SECONDS.labels("sidecar", "lexical")
+_GET_SECONDS = VECTOR_QUERY_SECONDS.labels("sidecar", "get")
+_ROUTE_SECONDS = VECTOR_QUERY_SECONDS.labels("sidecar", "route")
+
+# Ops that are safe to resend when the response does not arrive
+_READ_OPS = frozenset({OP_QUERY, OP_GET, OP_COUNT, OP_LEXICAL, OP_ROUTE})
+
+
+class SidecarVectorClient:
+    """
+    VectorRepository-compatible client that forwards calls to the retrieval daemon
+    
+    The daemon owns the single ChromaDB index, so any number of API and agent
+    processes share one warm copy of it and all writes go through one writer.
+    
+    Requests are multiplexed over one connection: any number of threads can
+    have a request in flight (the daemon answers them as they complete, and
+    batches concurrent queries), and a reader thread hands each response to
+    the thread waiting for its request id. Async callers run the blocking
+    methods with asyncio.to_thread.
+    """
+    
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._sock: Optional[socket.socket] = None
+        # Guards the connection and the pending requests (never held during I/O)
+        self._lock = threading.Lock()
+        # Keeps frames from different threads from interleaving
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, Tuple[socket.socket, Future]] = {}
+        self._request_ids = itertools.count(1)
+        logger.info(f"Using retrieval daemon at {socket_path}")
+    
+    def _connection(self) -> socket.socket:
+        """The daemon connection (connecting and starting its reader if needed)"""
+        with self._lock:
+            if self._sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.settimeout(SIDECAR_TIMEOUT_SECONDS)
+                    sock.connect(self.socket_path)
+                except OSError:
+                    sock.close()
+                    raise
+                # Responses can be minutes apart: only the wait for each one times out
+                sock.settimeout(None)
+                threading.Thread(
+                    target=self._read_responses, args=(sock,), name="sidecar-reader", daemon=True
+                ).start()
+                self._sock = sock
+            return self._sock
+    
+    def _read_responses(self, sock: socket.socket):
+        """Hand each response on a connection to its waiting request (reader thread)"""
+        try:
+            while True:
+                response_op, response_id, response, vectors = recv_frame(sock)
+                with self._lock:
+                    pending = self._pending.pop(response_id, None)
+                # None: the request already timed out
+                if pending is not None:
+                    pending[1].set_result((response_op, response, vectors))
+        except (OSError, ValueError) as e:
+            self._drop(sock, e)
+    
+    def _drop(self, sock: socket.socket, error: Exception):
+        """Close a broken connection and fail the requests waiting on it"""
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            failed = [request_id for request_id, (pending_sock, _) in self._pending.items() if pending_sock is sock]
+            futures = [self._pending.pop(request_id)[1] for request_id in failed]
+        sock.close()
+        for future in futures:
+            future.set_exception(ConnectionError(f"Retrieval daemon connection lost: {error}"))
+    
+    def _call(self, op: int, meta: Dict, vectors: Optional[List[List[float]]] = None) -> Dict:
+        """
+        Send one request and wait for its response
+        
+        Resends once (on a new connection if needed) if the connection was
+        lost before the request was sent, or if a read got no response.
+        Once a write has been sent it is never resent: the daemon may still
+        apply it, and applying it twice is worse than reporting the failure.
+        
+        Raises:
+            ConnectionError: If the daemon is unreachable or does not answer
+            RuntimeError: If the daemon reports an error
+        """
+        is_read = op in _READ_OPS
+        timeout = SIDECAR_TIMEOUT_SECONDS if is_read else SIDECAR_WRITE_TIMEOUT_SECONDS
+        
+        for attempt in range(2):
+            request_id = next(self._request_ids) & 0xFFFFFFFF
+            frame = encode_frame(op, request_id, meta, vectors)
+            future: Future = Future()
+            sent = False
+            try:
+                sock = self._connection()
+                with self._lock:
+                    self._pending[request_id] = (sock, future)
+                try:
+                    with self._send_lock:
+                        sock.sendall(frame)
+                except OSError as e:
+                    self._drop(sock, e)
+                    raise
+                sent = True
+                response_op, response, vectors = future.result(timeout)
+                break
+            except (OSError, FutureTimeoutError) as e:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                reason = str(e) or "timed out"
+                if sent and not is_read:
+                    raise ConnectionError(
+                        f"No response from retrieval daemon at {self.socket_path} to write op {op} "
+                        f"(it may still be applied): {reason}"
+                    )
+                if attempt == 1:
+                    raise ConnectionError(f"Retrieval daemon unavailable at {self.socket_path}: {reason}")
+                logger.warning(f"Retrying retrieval daemon request: {reason}")
+        
+        if response_op == OP_ERROR:
+            raise RuntimeError(f"Retrieval daemon error: {response['error']}")
+        if vectors is not None:
+            response["embeddings"] = vectors
+        return response
+    
+    def warm(self):
+        """Open the daemon connection (the daemon keeps the index warm itself)"""
+        logger.info(f"Retrieval daemon reachable ({self.count()} chunks)")
+    
+    def add_chunks(
+        self,
+        embeddings: List[List[float]],
+        chunks: List[Dict],
+        document_id: str
+    ) -> Dict:
+        """
+        Add chunks with embeddings through the daemon
+        
+        Large documents are sent in several frames, each well under the
+        daemon's frame limit. The daemon publishes a snapshot only after the
+        last one.
+        
+        Returns:
+            Daemon response (with the snapshot_version that includes the
+            chunks when the daemon publishes snapshots)
+        """
+        batches = list(self._add_batches(embeddings, chunks))
+        response: Dict = {}
+        for number, (start, end) in enumerate(batches, 1):
+            response = self._call(
+                OP_ADD,
+                {"chunks": chunks[start:end], "document_id": document_id, "publish": number == len(batches)},
+                embeddings[start:end]
+            )
+        response["added"] = len(chunks)
+        logger.info(
+            f"Added {len(chunks)} chunks via retrieval daemon for document {document_id} "
+            f"({len(batches)} requests)"
+        )
+        return response
+    
+    @staticmethod
+    def _add_batches(embeddings: List[List[float]], chunks: List[Dict]):
+        """(start, end) ranges of chunks whose add frame stays under SIDECAR_ADD_BATCH_BYTES"""
+        start, size = 0, 0
+        for row, (embedding, chunk) in enumerate(zip(embeddings, chunks)):
+            row_size = 4 * len(embedding) + len(json.dumps(chunk, separators=(",", ":")).encode("utf-8"))
+            if row > start and size + row_size > SIDECAR_ADD_BATCH_BYTES:
+                yield start, row
+                start, size = row, 0
+            size += row_size
+        if start < len(chunks) or not chunks:
+            yield start, len(chunks)
+    
+    def add_document_summaries(
+        self,
+        document_id: str,
+        document_name: str,
+        sections: List[int],
+        embeddings: List[List[float]]
+    ) -> Dict:
+        """Store a document's summary vectors through the daemon"""
+        return self._call(
+            OP_ADD_SUMMARIES,
+            {"document_id": document_id, "document_name": document_name, "sections": sections},
+            embeddings
+        )
+    
+    def route_documents(self, query_embeddings: List[List[float]], n_documents: int) -> List[List[str]]:
+        """Documents closest to each query, through the daemon"""
+        with _ROUTE_SECONDS.time():
+            return self._call(OP_ROUTE, {"n_documents": n_documents}, query_embeddings)["documents"]
+    
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 5,
+        include: Optional[List[str]] = None,
+        where: Optional[Dict] = None
+    ) -> Dict:
+        """Query similar chunks through the daemon (batched with other clients)"""
+        with _QUERY_SECONDS.time():
+            return self._call(
+                OP_QUERY,
+                {"n_results": n_results, "include": include, "where": where},
+                query_embeddings
+            )
+    
+    def lexical_search(self, query: str, n_results: int = 5) -> Dict:
+        """Keyword search through the daemon"""
+        with _LEXICAL_SECONDS.time():
+            return self._call(OP_LEXICAL, {"query": query, "n_results": n_results})
+    
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict:
+        """Get stored chunks through the daemon"""
+        with _GET_SECONDS.time():
+            return self._call(OP_GET, {"ids": ids, "where": where, "include": include})
+    
+    def count(self) -> int:
+        """Number of stored chunks"""
+        return self._call(OP_COUNT, {})["count"]
+    
+    def delete_by_document_id(self, document_id: str) -> Dict:
+        """
+        Delete all chunks for a document through the daemon
+        
+        Returns:
+            Daemon response (with snapshot_version, as for add_chunks)
+        """
+        return self._call(OP_DELETE, {"document_id": document_id})
+    
+    def close(self):
+        """Close the daemon connection (failing requests still waiting on it)"""
+        with self._lock:
+            sock = self._sock
+        if sock is not None:
+            self._drop(sock, ConnectionError("client closed"))
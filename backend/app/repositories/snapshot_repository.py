@@ -0,0 +1,354 @@
+"""
+Snapshot-backed vector repository (RETRIEVAL_MODE=snapshot)
+
+For running many API workers on one host: the retrieval daemon is the only
+writer and publishes an immutable snapshot after every change (see
+app.utils.index_snapshot). Each worker answers queries in-process from the
+newest snapshot with an exact NumPy search over memory-mapped vectors, so
+query throughput scales with worker processes instead of funnelling
+through one daemon thread. Writes are forwarded to the daemon.
+
+Document summary vectors for two-stage retrieval are derived from each
+snapshot's chunk vectors on first use, so snapshot files do not store them.
+"""
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config.constants import (
+    INDEX_SNAPSHOT_REFRESH_SECONDS,
+    LEXICAL_FALLBACK_MAX_TERMS,
+    LEXICAL_FALLBACK_CANDIDATES
+)
+from app.repositories.sidecar_client import SidecarVectorClient
+from app.services.embedding_providers import embedding_identity
+from app.utils.document_summaries import SummaryIndex
+from app.utils.index_snapshot import (
+    IndexSnapshot,
+    current_snapshot_path,
+    embedding_mismatch,
+    read_snapshot,
+    normalize_rows
+)
+from app.utils.logger import get_logger
+from app.utils.metrics import VECTOR_QUERY_SECONDS
+
+logger = get_logger(__name__)
+
+_QUERY_SECONDS = VECTOR_QUERY_SECONDS.labels("snapshot", "query")
+_LEXICAL_SECONDS = VECTOR_QUERY_SECONDS.labels("snapshot", "lexical")
+_GET_SECONDS = VECTOR_QUERY_SECONDS.labels("snapshot", "get")
+_ROUTE_SECONDS = VECTOR_QUERY_SECONDS.labels("snapshot", "route")
+
+
+def matches_where(metadata: Dict, where: Optional[Dict]) -> bool:
+    """
+    Evaluate a ChromaDB-style metadata filter
+    
+    Supports field equality, $eq, $ne, $in and $nin on fields, and $and/$or.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+                if operator not in ("$eq", "$ne", "$in", "$nin"):
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class SnapshotVectorRepository:
+    """
+    VectorRepository-compatible reader over published index snapshots
+    
+    Every call works on one snapshot object, so results are consistent even
+    while a newer snapshot is being published. Readers look for a newer
+    snapshot at most every INDEX_SNAPSHOT_REFRESH_SECONDS; after a write
+    through this repository they switch to the snapshot that includes it
+    right away (read-your-writes within a worker). A snapshot whose vectors
+    come from a different embedding provider or model is never loaded.
+    """
+    
+    def __init__(self, snapshot_dir: str, writer: SidecarVectorClient):
+        self.snapshot_dir = snapshot_dir
+        self.writer = writer
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._snapshot_path: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._summaries: Optional[Tuple[IndexSnapshot, SummaryIndex]] = None
+        self._summaries_lock = threading.Lock()
+        self._embedding = embedding_identity()
+        # Last snapshot refused for its embedding model (reported once)
+        self._rejected_path: Optional[str] = None
+        logger.info(f"Serving queries from index snapshots in {snapshot_dir}")
+    
+    def _load(self, min_version: int = 0) -> Optional[IndexSnapshot]:
+        """Switch to the newest published snapshot if it changed"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            path = current_snapshot_path(self.snapshot_dir)
+            if path is None:
+                return self._snapshot
+            current = self._snapshot
+            if path != self._snapshot_path or (current is not None and current.version < min_version):
+                if path == self._rejected_path:
+                    return self._snapshot
+                try:
+                    snapshot = read_snapshot(path)
+                except FileNotFoundError:
+                    # Pruned between reading CURRENT and opening it: a newer one exists
+                    self._checked_at = 0.0
+                    return self._snapshot
+                mismatch = embedding_mismatch(snapshot.header, self._embedding)
+                if mismatch is not None:
+                    logger.error(f"Not loading index snapshot {path}: {mismatch}")
+                    self._rejected_path = path
+                    return self._snapshot
+                self._snapshot = snapshot
+                self._snapshot_path = path
+                logger.info(f"Loaded index snapshot {self._snapshot.version} ({len(self._snapshot)} chunks)")
+            return self._snapshot
+    
+    def snapshot(self) -> Optional[IndexSnapshot]:
+        """Current snapshot (None until the daemon has published one)"""
+        if self._snapshot is None or time.monotonic() - self._checked_at >= INDEX_SNAPSHOT_REFRESH_SECONDS:
+            return self._load()
+        return self._snapshot
+    
+    def _refresh_after_write(self, response: Dict):
+        """Switch to the snapshot that includes a write made through the daemon"""
+        version = response.get("snapshot_version")
+        if version is not None:
+            self._load(min_version=version)
+    
+    def warm(self):
+        """Load the newest snapshot and fault its vectors into memory"""
+        snapshot = self._load()
+        if snapshot is None:
+            logger.warning(f"No index snapshot published in {self.snapshot_dir} yet (is the retrieval daemon running?)")
+            return
+        float(np.asarray(snapshot.vectors).sum())
+        logger.info(f"Warmed index snapshot {snapshot.version} ({len(snapshot)} chunks)")
+    
+    def add_chunks(
+        self,
+        embeddings: List[List[float]],
+        chunks: List[Dict],
+        document_id: str
+    ):
+        """Add chunks through the daemon (the single writer)"""
+        self._refresh_after_write(self.writer.add_chunks(embeddings, chunks, document_id))
+    
+    def delete_by_document_id(self, document_id: str):
+        """Delete a document's chunks through the daemon (the single writer)"""
+        self._refresh_after_write(self.writer.delete_by_document_id(document_id))
+    
+    def add_document_summaries(
+        self,
+        document_id: str,
+        document_name: str,
+        sections: List[int],
+        embeddings: List[List[float]]
+    ):
+        """Store summary vectors in the daemon's index (for sidecar readers)"""
+        self.writer.add_document_summaries(document_id, document_name, sections, embeddings)
+    
+    def _summary_index(self, snapshot: IndexSnapshot) -> SummaryIndex:
+        """Summary vectors of a snapshot (built once per snapshot)"""
+        with self._summaries_lock:
+            if self._summaries is None or self._summaries[0] is not snapshot:
+                started_at = time.perf_counter()
+                self._summaries = (snapshot, SummaryIndex(snapshot.vectors, snapshot.metadatas))
+                logger.info(
+                    f"Built {len(self._summaries[1].document_ids)} summary vectors for snapshot "
+                    f"{snapshot.version} in {(time.perf_counter() - started_at) * 1000:.0f} ms"
+                )
+            return self._summaries[1]
+    
+    def route_documents(self, query_embeddings: List[List[float]], n_documents: int) -> List[List[str]]:
+        """
+        First stage of two-stage retrieval: the documents closest to each query
+        
+        Returns:
+            Document IDs per query, best first
+        """
+        snapshot = self.snapshot()
+        if snapshot is None or not len(snapshot):
+            return [[] for _ in query_embeddings]
+        index = self._summary_index(snapshot)
+        with _ROUTE_SECONDS.time():
+            return index.route(normalize_rows(np.asarray(query_embeddings, dtype=np.float32)), n_documents)
+    
+    def _candidate_rows(self, snapshot: IndexSnapshot, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """Rows a query filter allows (None for every row)"""
+        if not where:
+            return None
+        # Document filters (as sent by two-stage retrieval) use the per-document row lists
+        condition = where.get("document_id") if list(where) == ["document_id"] else None
+        document_ids = None
+        if condition is not None and not isinstance(condition, dict):
+            document_ids = [condition]
+        elif isinstance(condition, dict) and list(condition) in (["$in"], ["$eq"]):
+            document_ids = condition.get("$in", [condition.get("$eq")])
+        if document_ids is not None:
+            index = self._summary_index(snapshot)
+            rows = [index.rows[document_id] for document_id in document_ids if document_id in index.rows]
+            return np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        return np.asarray(
+            [row for row in range(len(snapshot)) if matches_where(snapshot.metadatas[row], where)],
+            dtype=np.int64
+        )
+    
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 5,
+        include: Optional[List[str]] = None,
+        where: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Exact cosine search over the current snapshot
+        
+        Args:
+            query_embeddings: Query embedding vectors
+            n_results: Number of results per query
+            include: Fields to include (defaults to documents, metadatas and
+                distances; ids are always returned)
+            where: Metadata filter; only matching chunks are scored
+        
+        Returns:
+            Results in the ChromaDB query shape (one list per query)
+        """
+        include = include or ["documents", "metadatas", "distances"]
+        snapshot = self.snapshot()
+        results = {"ids": [], **{field: [] for field in include}}
+        rows = self._candidate_rows(snapshot, where) if snapshot is not None else None
+        if snapshot is None or not len(snapshot) or (rows is not None and not len(rows)):
+            for key in results:
+                results[key] = [[] for _ in query_embeddings]
+            return results
+        
+        with _QUERY_SECONDS.time():
+            queries = normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+            vectors = snapshot.vectors if rows is None else snapshot.vectors[rows]
+            scores = vectors @ queries.T
+            k = min(n_results, len(vectors))
+            for column in range(scores.shape[1]):
+                column_scores = scores[:, column]
+                top = np.argpartition(-column_scores, k - 1)[:k]
+                top = top[np.argsort(-column_scores[top])]
+                column_scores = column_scores[top]
+                if rows is not None:
+                    top = rows[top]
+                results["ids"].append([snapshot.ids[row] for row in top])
+                if "documents" in include:
+                    results["documents"].append([snapshot.documents[row] for row in top])
+                if "metadatas" in include:
+                    results["metadatas"].append([snapshot.metadatas[row] for row in top])
+                if "distances" in include:
+                    results["distances"].append((1.0 - column_scores).tolist())
+                if "embeddings" in include:
+                    results["embeddings"].append(np.asarray(snapshot.vectors[top]).tolist())
+        
+        logger.info(f"Retrieved {len(results['ids'][0])} chunks from snapshot {snapshot.version}")
+        return results
+    
+    def lexical_search(self, query: str, n_results: int = 5) -> Dict:
+        """
+        Keyword search over the current snapshot (same ranking as VectorRepository)
+        """
+        terms = sorted(
+            set(re.findall(r"\w{4,}", query.lower())),
+            key=len,
+            reverse=True
+        )[:LEXICAL_FALLBACK_MAX_TERMS]
+        snapshot = self.snapshot()
+        if not terms or snapshot is None:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        
+        # Case-sensitive lower and capitalized forms, as ChromaDB's $contains
+        variants = [variant for term in terms for variant in (term, term.capitalize())]
+        with _LEXICAL_SECONDS.time():
+            candidates = []
+            for row, document in enumerate(snapshot.documents):
+                if any(variant in document for variant in variants):
+                    candidates.append(row)
+                    if len(candidates) >= LEXICAL_FALLBACK_CANDIDATES:
+                        break
+        
+        scored = sorted(
+            candidates,
+            key=lambda row: sum(term in snapshot.documents[row].lower() for term in terms),
+            reverse=True
+        )[:n_results]
+        
+        logger.info(f"Lexical search matched {len(candidates)} chunks for {len(terms)} terms")
+        return {
+            "ids": [[snapshot.ids[row] for row in scored]],
+            "documents": [[snapshot.documents[row] for row in scored]],
+            "metadatas": [[snapshot.metadatas[row] for row in scored]],
+            "distances": [[None for _ in scored]]
+        }
+    
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Get chunks from the current snapshot by ID and/or metadata filter
+        
+        Returns:
+            Results in the ChromaDB get shape
+        """
+        include = include or ["documents", "metadatas"]
+        snapshot = self.snapshot()
+        with _GET_SECONDS.time():
+            if snapshot is None:
+                rows = []
+            elif ids is not None:
+                rows = [snapshot.rows[chunk_id] for chunk_id in ids if chunk_id in snapshot.rows]
+            else:
+                rows = range(len(snapshot))
+            if where:
+                rows = [row for row in rows if matches_where(snapshot.metadatas[row], where)]
+            
+            results = {
+                "ids": [snapshot.ids[row] for row in rows] if snapshot else [],
+                "documents": None,
+                "metadatas": None,
+                "embeddings": None
+            }
+            if snapshot is not None:
+                if "documents" in include:
+                    results["documents"] = [snapshot.documents[row] for row in rows]
+                if "metadatas" in include:
+                    results["metadatas"] = [snapshot.metadatas[row] for row in rows]
+                if "embeddings" in include:
+                    results["embeddings"] = np.asarray(snapshot.vectors[list(rows)]).tolist()
+        return results
+    
+    def count(self) -> int:
+        """Number of chunks in the current snapshot"""
+        snapshot = self.snapshot()
+        return len(snapshot) if snapshot is not None else 0
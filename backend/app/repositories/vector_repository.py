@@ -1,15 +1,30 @@
 """
 ChromaDB vector repository
 """
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict
+import re
+from typing import Iterable, Iterator, List, Dict, Optional
+import numpy as np
 from app.config.settings import settings as app_settings
-from app.config.constants import CHROMA_COLLECTION_NAME
+from app.config.constants import (
+    CHROMA_COLLECTION_NAME,
+    EMBEDDING_DIMENSION,
+    LEXICAL_FALLBACK_MAX_TERMS,
+    LEXICAL_FALLBACK_CANDIDATES,
+    RAG_ROUTE_OVERSAMPLE
+)
+from app.utils.document_summaries import section_of, summary_id, top_documents
+from app.utils.index_snapshot import normalize_rows
+from app.utils.lazy import LazyProxy
 from app.utils.logger import get_logger
+from app.utils.metrics import VECTOR_QUERY_SECONDS
 
 logger = get_logger(__name__)
 
+_QUERY_SECONDS = VECTOR_QUERY_SECONDS.labels("embedded", "query")
+_LEXICAL_SECONDS = VECTOR_QUERY_SECONDS.labels("embedded", "lexical")
+_GET_SECONDS = VECTOR_QUERY_SECONDS.labels("embedded", "get")
+_ROUTE_SECONDS = VECTOR_QUERY_SECONDS.labels("embedded", "route")
+
 
 class VectorRepository:
     """
@@ -20,19 +35,44 @@ class VectorRepository:
         """Initialize ChromaDB client and collection"""
         logger.info(f"Initializing ChromaDB at {app_settings.CHROMA_DB_PATH}")
         
+        # Imported here: chromadb takes most of a second to import
+        import chromadb
+        from chromadb.config import Settings
+        
         # Use PersistentClient to save data between restarts
         self.client = chromadb.PersistentClient(
             path=app_settings.CHROMA_DB_PATH,
             settings=Settings(anonymized_telemetry=False)
         )
         
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name=CHROMA_COLLECTION_NAME,
+        # Get or create collection (one per embedding provider: their vectors
+        # are not comparable)
+        self.collection_name = CHROMA_COLLECTION_NAME
+        if app_settings.EMBEDDING_PROVIDER != "openai":
+            self.collection_name = f"{CHROMA_COLLECTION_NAME}_{app_settings.EMBEDDING_PROVIDER}"
+        self.collection = self._open_collection(self.collection_name)
+        # Per-document summary vectors for two-stage retrieval
+        self.summaries = self._open_collection(f"{self.collection_name}_summaries")
+        
+        logger.info(f"ChromaDB collection '{self.collection_name}' ready with {self.collection.count()} existing chunks")
+    
+    def _open_collection(self, name: str):
+        return self.client.get_or_create_collection(
+            name=name,
             metadata={"hnsw:space": "cosine"}
         )
-        
-        logger.info(f"ChromaDB collection '{CHROMA_COLLECTION_NAME}' ready with {self.collection.count()} existing chunks")
+    
+    def warm(self):
+        """Load the vector indexes into memory ahead of the first query"""
+        count = self.collection.count()
+        if count and not self.summaries.count():
+            # Chunks stored before document summaries existed (or bulk-loaded)
+            self.rebuild_document_summaries()
+        probe = [[1.0] + [0.0] * (EMBEDDING_DIMENSION - 1)]
+        for collection in (self.collection, self.summaries):
+            if collection.count():
+                collection.query(query_embeddings=probe, n_results=1)
+        logger.info(f"Warmed ChromaDB index ({count} chunks)")
     
     def add_chunks(
         self,
@@ -63,19 +103,134 @@ class VectorRepository:
             for chunk in chunks
         ]
         
-        self.collection.add(
-            ids=ids,
+        # ChromaDB rejects writes larger than its max batch size
+        batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end]
+            )
+        
+        logger.info(f"Added {len(chunks)} chunks to ChromaDB for document {document_id}")
+    
+    def add_document_summaries(
+        self,
+        document_id: str,
+        document_name: str,
+        sections: List[int],
+        embeddings: List[List[float]]
+    ):
+        """
+        Store a document's summary vectors (replacing any previous ones)
+        
+        Args:
+            document_id: Document UUID
+            document_name: Original filename
+            sections: Section number of each summary vector
+            embeddings: Summary vectors (see app.utils.document_summaries)
+        """
+        self.summaries.delete(where={"document_id": str(document_id)})
+        self.write_summaries(
+            ids=[summary_id(document_id, section) for section in sections],
             embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas
+            metadatas=[
+                {"document_id": str(document_id), "document_name": document_name, "section": section}
+                for section in sections
+            ]
         )
+    
+    def route_documents(self, query_embeddings: List[List[float]], n_documents: int) -> List[List[str]]:
+        """
+        First stage of two-stage retrieval: the documents closest to each query
         
-        logger.info(f"Added {len(chunks)} chunks to ChromaDB for document {document_id}")
+        Args:
+            query_embeddings: Query embedding vectors
+            n_documents: Documents to return per query
+        
+        Returns:
+            Document IDs per query, best first (empty without summaries)
+        """
+        count = self.summaries.count()
+        if not count:
+            return [[] for _ in query_embeddings]
+        with _ROUTE_SECONDS.time():
+            results = self.summaries.query(
+                query_embeddings=query_embeddings,
+                n_results=min(count, n_documents * RAG_ROUTE_OVERSAMPLE),
+                include=["metadatas"]
+            )
+        return [
+            top_documents((metadata["document_id"] for metadata in metadatas), n_documents)
+            for metadatas in results["metadatas"]
+        ]
+    
+    def rebuild_document_summaries(self, document_ids: Optional[Iterable[str]] = None) -> int:
+        """
+        Recompute summary vectors from the stored chunk embeddings
+        
+        Args:
+            document_ids: Documents to rebuild (all documents if omitted)
+        
+        Returns:
+            Number of documents summarized
+        """
+        if document_ids is None:
+            self.client.delete_collection(self.summaries.name)
+            self.summaries = self._open_collection(f"{self.collection_name}_summaries")
+            pages = self.iter_all()
+        else:
+            document_ids = [str(document_id) for document_id in document_ids]
+            if not document_ids:
+                return 0
+            self.summaries.delete(where={"document_id": {"$in": document_ids}})
+            pages = (
+                self.collection.get(where={"document_id": document_id}, include=["embeddings", "metadatas"])
+                for document_id in document_ids
+            )
+        
+        # Running per-section sums, so the whole collection never sits in memory
+        sums: Dict[tuple, np.ndarray] = {}
+        names: Dict[str, str] = {}
+        for page in pages:
+            for metadata, embedding in zip(page["metadatas"], page["embeddings"]):
+                key = (metadata["document_id"], section_of(metadata["chunk_index"]))
+                vector = np.asarray(embedding, dtype=np.float32)
+                sums[key] = sums.get(key, 0) + vector / (np.linalg.norm(vector) or 1.0)
+                names[metadata["document_id"]] = metadata["document_name"]
+        
+        keys = sorted(sums)
+        if keys:
+            self.write_summaries(
+                ids=[summary_id(document_id, section) for document_id, section in keys],
+                embeddings=normalize_rows(np.stack([sums[key] for key in keys])),
+                metadatas=[
+                    {"document_id": document_id, "document_name": names[document_id], "section": section}
+                    for document_id, section in keys
+                ]
+            )
+        logger.info(f"Rebuilt summary vectors for {len(names)} documents")
+        return len(names)
+    
+    def write_summaries(self, ids: List[str], embeddings, metadatas: List[Dict]):
+        """Add summary vectors given as parallel lists (in max-size batches)"""
+        batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.summaries.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=metadatas[start:end]
+            )
     
     def query(
         self,
         query_embeddings: List[List[float]],
-        n_results: int = 5
+        n_results: int = 5,
+        include: Optional[List[str]] = None,
+        where: Optional[Dict] = None
     ) -> Dict:
         """
         Query ChromaDB for similar chunks
@@ -83,18 +238,202 @@ class VectorRepository:
         Args:
             query_embeddings: Query embedding vector
             n_results: Number of results to return
+            include: Fields to include (defaults to documents, metadatas and
+                distances; ids are always returned)
+            where: Metadata filter (e.g. the documents chosen by route_documents)
         
         Returns:
             ChromaDB query results
         """
-        results = self.collection.query(
-            query_embeddings=query_embeddings,
-            n_results=n_results
-        )
+        with _QUERY_SECONDS.time():
+            results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                include=include or ["documents", "metadatas", "distances"]
+            )
         
         logger.info(f"Retrieved {len(results['ids'][0])} chunks from ChromaDB")
         return results
     
+    def lexical_search(
+        self,
+        query: str,
+        n_results: int = 5
+    ) -> Dict:
+        """
+        Keyword search over stored chunks (no embedding needed)
+        
+        Used as a degraded fallback when the query embedding is unavailable.
+        Candidates containing the longest query terms are ranked by how many
+        distinct terms they contain.
+        
+        Args:
+            query: Query text
+            n_results: Number of results to return
+        
+        Returns:
+            Results in the same shape as `query` (without distances)
+        """
+        terms = sorted(
+            set(re.findall(r"\w{4,}", query.lower())),
+            key=len,
+            reverse=True
+        )[:LEXICAL_FALLBACK_MAX_TERMS]
+        
+        if not terms:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        
+        # $contains is case-sensitive, so match lower and capitalized forms
+        filters = [{"$contains": variant} for term in terms for variant in (term, term.capitalize())]
+        with _LEXICAL_SECONDS.time():
+            results = self.collection.get(
+                where_document={"$or": filters},
+                limit=LEXICAL_FALLBACK_CANDIDATES,
+                include=["documents", "metadatas"]
+            )
+        
+        scored = sorted(
+            zip(results['ids'], results['documents'], results['metadatas']),
+            key=lambda item: sum(term in item[1].lower() for term in terms),
+            reverse=True
+        )[:n_results]
+        
+        logger.info(f"Lexical search matched {len(results['ids'])} chunks for {len(terms)} terms")
+        return {
+            "ids": [[item[0] for item in scored]],
+            "documents": [[item[1] for item in scored]],
+            "metadatas": [[item[2] for item in scored]],
+            "distances": [[None for _ in scored]]
+        }
+    
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Get stored chunks by ID and/or metadata filter
+        
+        Args:
+            ids: Chunk IDs to fetch (all chunks if omitted)
+            where: Metadata filter
+            include: Fields to include (documents, metadatas, embeddings)
+        
+        Returns:
+            ChromaDB get results
+        """
+        with _GET_SECONDS.time():
+            return self.collection.get(
+                ids=ids,
+                where=where,
+                include=include or ["documents", "metadatas"]
+            )
+    
+    def count(self) -> int:
+        """Number of stored chunks"""
+        return self.collection.count()
+    
+    def write_records(
+        self,
+        ids: List[str],
+        embeddings,
+        documents: List[str],
+        metadatas: List[Dict],
+        upsert: bool = True
+    ):
+        """
+        Store chunks given as parallel lists (bulk loads)
+        
+        Args:
+            ids: Chunk IDs
+            embeddings: 2D array or list of vectors
+            documents: Chunk texts
+            metadatas: Chunk metadata dicts
+            upsert: Overwrite existing IDs; pass False when every ID is new
+                (skips the existence lookup, faster for loads into an empty collection)
+        """
+        self._write(self.collection.upsert if upsert else self.collection.add, ids, embeddings, documents, metadatas)
+    
+    def _write(self, write, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        """Call a collection's add or upsert in max-size batches"""
+        batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            write(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end]
+            )
+    
+    def delete_ids(self, ids: List[str]):
+        """Delete chunks by ID"""
+        batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            self.collection.delete(ids=ids[start:start + batch_size])
+    
+    def replace_records(
+        self,
+        ids: List[str],
+        embeddings,
+        documents: List[str],
+        metadatas: List[Dict]
+    ):
+        """
+        Replace every chunk with the given records (bulk loads)
+        
+        The records are loaded into a staging collection, which replaces the
+        current collection only once it is complete: if the load fails, the
+        current chunks are untouched. Summary vectors are rebuilt afterwards.
+        """
+        from chromadb.errors import NotFoundError
+        
+        staging_name = f"{self.collection_name}_staging"
+        try:
+            # Left over from a load that failed
+            self.client.delete_collection(staging_name)
+        except NotFoundError:
+            pass
+        staging = self._open_collection(staging_name)
+        self._write(staging.add, ids, embeddings, documents, metadatas)
+        
+        self.client.delete_collection(self.collection_name)
+        staging.modify(name=self.collection_name)
+        self.collection = self._open_collection(self.collection_name)
+        self.rebuild_document_summaries()
+        logger.info(f"Replaced ChromaDB collection '{self.collection_name}' ({len(ids)} chunks)")
+    
+    def reset(self):
+        """Delete every chunk (drops and recreates the collection)"""
+        self.client.delete_collection(self.collection_name)
+        self.client.delete_collection(self.summaries.name)
+        self.collection = self._open_collection(self.collection_name)
+        self.summaries = self._open_collection(f"{self.collection_name}_summaries")
+        logger.info(f"Reset ChromaDB collection '{self.collection_name}'")
+    
+    def iter_all(self) -> Iterator[Dict]:
+        """
+        Every stored chunk with its embedding, in pages
+        
+        Yields:
+            ChromaDB get results (ids, embeddings, documents, metadatas) of up
+            to the client's max batch size each
+        """
+        page_size = self.client.get_max_batch_size()
+        offset = 0
+        while True:
+            page = self.collection.get(
+                limit=page_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if not page["ids"]:
+                return
+            yield page
+            offset += len(page["ids"])
+    
     def delete_by_document_id(self, document_id: str):
         """Delete all chunks for a specific document"""
         # Get all IDs with this document_id in metadata
@@ -105,7 +444,30 @@ class VectorRepository:
         if results['ids']:
             self.collection.delete(ids=results['ids'])
             logger.info(f"Deleted {len(results['ids'])} chunks for document {document_id}")
+        self.summaries.delete(where={"document_id": str(document_id)})
+
+
+def create_vector_repository():
+    """
+    Build the repository for the configured retrieval mode
+    
+    Returns:
+        VectorRepository in "embedded" mode, a client for the retrieval
+        daemon in "sidecar" mode, or a snapshot reader that sends writes to
+        the daemon in "snapshot" mode (same interface)
+    """
+    if app_settings.RETRIEVAL_MODE == "sidecar":
+        from app.repositories.sidecar_client import SidecarVectorClient
+        return SidecarVectorClient(app_settings.RETRIEVAL_SOCKET_PATH)
+    if app_settings.RETRIEVAL_MODE == "snapshot":
+        from app.repositories.sidecar_client import SidecarVectorClient
+        from app.repositories.snapshot_repository import SnapshotVectorRepository
+        return SnapshotVectorRepository(
+            app_settings.INDEX_SNAPSHOT_DIR,
+            SidecarVectorClient(app_settings.RETRIEVAL_SOCKET_PATH)
+        )
+    return VectorRepository()
 
 
-# Create global instance
-vector_repository = VectorRepository()
+# Create global instance (opened on first use)
+vector_repository: VectorRepository = LazyProxy(create_vector_repository, "vector_repository")
@@ -0,0 +1,331 @@
+"""
+Retrieval daemon (sidecar) that owns the ChromaDB index
+
+Run this script to serve the index to API and agent processes:
+    python -m app.retrieval_daemon
+
+Then set RETRIEVAL_MODE=sidecar in every other process, or
+RETRIEVAL_MODE=snapshot to query the snapshots the daemon publishes to
+INDEX_SNAPSHOT_DIR in-process (writes still go through the daemon).
+"""
+import asyncio
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from app.config.settings import settings
+from app.config.constants import (
+    SIDECAR_BATCH_WINDOW_MS,
+    SIDECAR_MAX_BATCH,
+    EMBEDDING_DIMENSION,
+    INDEX_SNAPSHOT_KEEP,
+    INDEX_SNAPSHOT_PUBLISH_SECONDS
+)
+from app.repositories.vector_repository import VectorRepository
+from app.services.embedding_providers import embedding_identity
+from app.utils.index_snapshot import SnapshotPublisher
+from app.utils.wire_protocol import (
+    encode_frame,
+    read_frame,
+    OP_QUERY,
+    OP_ADD,
+    OP_DELETE,
+    OP_GET,
+    OP_COUNT,
+    OP_LEXICAL,
+    OP_ROUTE,
+    OP_ADD_SUMMARIES,
+    OP_RESULT,
+    OP_ERROR
+)
+from app.utils.logger import setup_logging, get_logger
+from app.utils.metrics import start_textfile_writer
+
+setup_logging()
+logger = get_logger(__name__)
+load_dotenv()
+
+
+class RetrievalDaemon:
+    """
+    Serves one embedded ChromaDB index over a Unix socket
+    
+    All index access runs on a single worker thread, so writes are
+    serialized and never race each other. Queries that arrive within a
+    short window are merged into one batched ChromaDB query. With a snapshot
+    directory, the collection is published as a snapshot at startup and
+    after writes, for readers in snapshot mode: the daemon keeps a copy of
+    the chunk records that each write updates, and a publisher publishes it
+    at most every INDEX_SNAPSHOT_PUBLISH_SECONDS on its own thread, so one
+    snapshot covers every write made since the last one and queries never
+    wait for a publish.
+    """
+    
+    def __init__(self, socket_path: str, snapshot_dir: str = ""):
+        self.socket_path = socket_path
+        self.repository = VectorRepository()
+        self.publisher = (
+            SnapshotPublisher(snapshot_dir, INDEX_SNAPSHOT_KEEP, EMBEDDING_DIMENSION, embedding_identity())
+            if snapshot_dir else None
+        )
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma")
+        self._publish_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+        # Chunk records for snapshots (chunk id -> (vector, document, metadata)), updated on the index thread
+        self._records: Dict[str, Tuple[np.ndarray, str, Dict]] = {}
+        # Resolved with the version of the next publish (None when no write is waiting for one)
+        self._next_publish: Optional[asyncio.Future] = None
+        self._query_queue: Optional[asyncio.Queue] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._handlers = {
+            OP_ADD: self._add,
+            OP_DELETE: self._delete,
+            OP_GET: self._get,
+            OP_COUNT: self._count,
+            OP_LEXICAL: self._lexical,
+            OP_ROUTE: self._route,
+            OP_ADD_SUMMARIES: self._add_summaries
+        }
+    
+    async def serve(self):
+        """Warm the index and serve requests until cancelled"""
+        self._query_queue = asyncio.Queue()
+        await self._run(self.repository.warm)
+        if self.publisher is not None:
+            await self._run(self._load_records)
+            await self._publish_snapshot()
+        
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        background = [asyncio.create_task(self._batch_queries())]
+        if self.publisher is not None:
+            background.append(asyncio.create_task(self._publish_snapshots()))
+        logger.info(f"Retrieval daemon listening on {self.socket_path}")
+        
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in background:
+                task.cancel()
+            self._executor.shutdown(wait=True)
+            self._publish_executor.shutdown(wait=True)
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+    
+    async def _run(self, fn, *args):
+        """Run a blocking index call on the index thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Read pipelined requests from one client connection"""
+        write_lock = asyncio.Lock()
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                task = asyncio.create_task(self._dispatch(frame, writer, write_lock))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except Exception as e:
+            logger.error(f"Retrieval daemon connection error: {e}")
+        finally:
+            writer.close()
+    
+    async def _dispatch(self, frame, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        """Execute one request and write its response"""
+        op, request_id, meta, vectors = frame
+        try:
+            if op == OP_QUERY:
+                include = tuple(meta.get("include") or ("documents", "metadatas", "distances"))
+                where = json.dumps(meta["where"], sort_keys=True) if meta.get("where") else None
+                result = await self._enqueue_query((meta["n_results"], include, where), vectors)
+            elif op in self._handlers:
+                result = await self._run(self._handlers[op], meta, vectors)
+                # A large document arrives in several adds; only the last waits for a snapshot
+                if op in (OP_ADD, OP_DELETE) and self.publisher is not None and meta.get("publish", True):
+                    result["snapshot_version"] = await self._snapshot_including_write()
+            else:
+                raise ValueError(f"Unknown op {op}")
+            
+            embeddings = result.pop("embeddings", None) if isinstance(result, dict) else None
+            response = encode_frame(OP_RESULT, request_id, result, embeddings)
+        except Exception as e:
+            logger.error(f"Retrieval daemon request failed (op {op}): {e}")
+            response = encode_frame(OP_ERROR, request_id, {"error": str(e)})
+        
+        async with write_lock:
+            writer.write(response)
+            await writer.drain()
+    
+    async def _enqueue_query(self, params: Tuple[int, Tuple[str, ...], Optional[str]], vectors: np.ndarray) -> Dict:
+        """Queue a query (keyed by n_results, include fields and filter) and wait for its results"""
+        future = asyncio.get_running_loop().create_future()
+        await self._query_queue.put((params, vectors, future))
+        return await future
+    
+    async def _batch_queries(self):
+        """Merge queries that arrive close together into one ChromaDB call"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._query_queue.get()]
+            deadline = loop.time() + SIDECAR_BATCH_WINDOW_MS / 1000
+            while len(batch) < SIDECAR_MAX_BATCH:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._query_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # One ChromaDB call per distinct (n_results, include, where)
+            groups = defaultdict(list)
+            for item in batch:
+                groups[item[0]].append(item)
+            for params, items in groups.items():
+                await self._run_query_group(params, items)
+    
+    async def _run_query_group(self, params: Tuple[int, Tuple[str, ...], Optional[str]], items: List):
+        """Run one batched query and split the results back per request"""
+        n_results, include, where = params
+        embeddings = np.concatenate([vectors for _, vectors, _ in items]).tolist()
+        try:
+            results = await self._run(
+                self.repository.query, embeddings, n_results, list(include), json.loads(where) if where else None
+            )
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        if len(items) > 1:
+            logger.info(f"Batched {len(items)} queries into one ChromaDB call")
+        
+        row = 0
+        for _, vectors, future in items:
+            rows = slice(row, row + len(vectors))
+            row += len(vectors)
+            if not future.done():
+                future.set_result({
+                    key: results[key][rows]
+                    for key in ("ids", *include)
+                })
+    
+    def _load_records(self):
+        """Read every chunk once, as the base for snapshots (runs on the index thread)"""
+        for page in self.repository.iter_all():
+            self._store_records(page)
+        logger.info(f"Loaded {len(self._records)} chunk records for snapshots")
+    
+    def _store_records(self, results: Dict):
+        """Add or replace chunk records from ChromaDB get results"""
+        for chunk_id, vector, document, metadata in zip(
+            results["ids"], results["embeddings"], results["documents"], results["metadatas"]
+        ):
+            self._records[chunk_id] = (np.asarray(vector, dtype=np.float32), document, metadata)
+    
+    def _copy_records(self) -> List[Tuple[str, Tuple[np.ndarray, str, Dict]]]:
+        """Point-in-time view of the records (runs on the index thread, between writes)"""
+        return list(self._records.items())
+    
+    async def _publish_snapshot(self) -> int:
+        """Publish the current records as the next snapshot (written on the publisher thread)"""
+        records = await self._run(self._copy_records)
+        return await asyncio.get_running_loop().run_in_executor(self._publish_executor, self._write_snapshot, records)
+    
+    def _write_snapshot(self, records: List[Tuple[str, Tuple[np.ndarray, str, Dict]]]) -> int:
+        ids = [chunk_id for chunk_id, _ in records]
+        if records:
+            matrix = np.stack([vector for _, (vector, _, _) in records])
+        else:
+            matrix = np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        documents = [document for _, (_, document, _) in records]
+        metadatas = [metadata for _, (_, _, metadata) in records]
+        return self.publisher.publish(ids, matrix, documents, metadatas)
+    
+    async def _snapshot_including_write(self) -> int:
+        """Wait for the next publish, which includes every write applied so far"""
+        if self._next_publish is None:
+            self._next_publish = asyncio.get_running_loop().create_future()
+        return await asyncio.shield(self._next_publish)
+    
+    async def _publish_snapshots(self):
+        """Publish one snapshot per interval for all the writes waiting for one"""
+        while True:
+            await asyncio.sleep(INDEX_SNAPSHOT_PUBLISH_SECONDS)
+            if self._next_publish is None:
+                continue
+            waiting, self._next_publish = self._next_publish, None
+            try:
+                waiting.set_result(await self._publish_snapshot())
+            except Exception as e:
+                logger.error(f"Failed to publish index snapshot: {e}")
+                waiting.set_exception(e)
+    
+    def _add(self, meta: Dict, vectors: np.ndarray) -> Dict:
+        self.repository.add_chunks(
+            embeddings=vectors.tolist(),
+            chunks=meta["chunks"],
+            document_id=meta["document_id"]
+        )
+        if self.publisher is not None:
+            # Read back as stored (ids and metadata are assigned by the repository)
+            ids = [f"{meta['document_id']}_{chunk['metadata']['chunk_index']}" for chunk in meta["chunks"]]
+            self._store_records(self.repository.get(ids=ids, include=["embeddings", "documents", "metadatas"]))
+        return {"added": len(meta["chunks"]), "snapshot_version": None}
+    
+    def _delete(self, meta: Dict, vectors) -> Dict:
+        self.repository.delete_by_document_id(meta["document_id"])
+        if self.publisher is not None:
+            document_id = str(meta["document_id"])
+            for chunk_id in [
+                chunk_id for chunk_id, (_, _, metadata) in self._records.items()
+                if metadata.get("document_id") == document_id
+            ]:
+                del self._records[chunk_id]
+        return {"deleted": meta["document_id"], "snapshot_version": None}
+    
+    def _get(self, meta: Dict, vectors) -> Dict:
+        results = self.repository.get(ids=meta.get("ids"), where=meta.get("where"), include=meta.get("include"))
+        response = {
+            "ids": results["ids"],
+            "documents": results.get("documents"),
+            "metadatas": results.get("metadatas")
+        }
+        if results.get("embeddings") is not None:
+            response["embeddings"] = results["embeddings"]
+        return response
+    
+    def _count(self, meta: Dict, vectors) -> Dict:
+        return {"count": self.repository.count()}
+    
+    def _lexical(self, meta: Dict, vectors) -> Dict:
+        return self.repository.lexical_search(query=meta["query"], n_results=meta["n_results"])
+
+    def _route(self, meta: Dict, vectors: np.ndarray) -> Dict:
+        return {"documents": self.repository.route_documents(vectors.tolist(), meta["n_documents"])}
+    
+    def _add_summaries(self, meta: Dict, vectors: np.ndarray) -> Dict:
+        self.repository.add_document_summaries(
+            meta["document_id"], meta["document_name"], meta["sections"],
+            vectors.tolist() if vectors is not None else []
+        )
+        return {"summaries": len(meta["sections"])}
+
+
+if __name__ == "__main__":
+    logger.info("Starting retrieval daemon...")
+    daemon = RetrievalDaemon(settings.RETRIEVAL_SOCKET_PATH, settings.INDEX_SNAPSHOT_DIR)
+    start_textfile_writer("retrieval-daemon")
+    try:
+        asyncio.run(daemon.serve())
+    except KeyboardInterrupt:
+        logger.info("Retrieval daemon stopped")
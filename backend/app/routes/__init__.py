@@ -1,6 +1,6 @@
 """
 Routes package
 """
-from app.routes import documents, agent, livekit, chat
+from app.routes import documents, agent, livekit, chat, traces
 
-__all__ = ["documents", "agent", "livekit", "chat"]
+__all__ = ["documents", "agent", "livekit", "chat", "traces"]
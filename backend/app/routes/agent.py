@@ -1,5 +1,5 @@
 """
-Agent configuration routes (in-memory storage)
+Agent configuration routes (shared config store)
 """
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
@@ -27,7 +27,8 @@ async def get_prompt():
         return {
             "success": True,
             "data": {
-                "prompt": prompt
+                "prompt": prompt,
+                "version": config_manager.version
             }
         }
     except Exception as e:
@@ -38,9 +39,10 @@ async def get_prompt():
 @router.put("/prompt")
 async def update_prompt(update: PromptUpdate):
     """
-    Update agent system prompt (in-memory only)
+    Update agent system prompt
     
-    Note: Changes are NOT persisted. Restarting the app will reset to default.
+    The prompt is persisted and pushed to every API and agent process;
+    running voice sessions switch to it immediately.
     """
     try:
         if not update.prompt or len(update.prompt.strip()) == 0:
@@ -52,7 +54,8 @@ async def update_prompt(update: PromptUpdate):
             "success": True,
             "data": {
                 "prompt": new_prompt,
-                "message": "Prompt updated successfully (in-memory only)"
+                "version": config_manager.version,
+                "message": "Prompt updated successfully"
             }
         }
     except Exception as e:
@@ -1,31 +1,67 @@
 """
 Chat/Query routes for testing RAG (text-based)
 """
+import json
+import time
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import AsyncIterator, Awaitable, List, Dict, Optional
 from app.services.retrieval_service import retrieval_service
 from app.services.llm_service import llm_service
 from app.config.config_manager import config_manager
-from app.config.constants import RAG_TOP_K
+from app.config.constants import RAG_TOP_K, RAG_ADAPTIVE_TOP_K
 from app.utils.logger import get_logger
+from app.utils.tracing import Trace, tracer, mark, use_trace
 
 logger = get_logger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+NO_CONTEXT_ANSWER = "I don't have any relevant information in my knowledge base to answer this question."
+
 
 class QueryRequest(BaseModel):
     """Request model for text query"""
     question: str
 
 
+def _format_sources(context_chunks: List[Dict]) -> List[Dict]:
+    """Format retrieved chunks as response sources"""
+    return [
+        {
+            "document_name": chunk.get("document_name", "Unknown"),
+            "text": chunk.get("text", ""),
+            "similarity": chunk.get("similarity") or 0.0
+        }
+        for chunk in context_chunks
+    ]
+
+
+def _sse(event: str, data: Dict) -> str:
+    """Encode one server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _in_trace(trace: Optional[Trace], awaitable: Awaitable):
+    """
+    Await one step of a streamed request with its trace current
+    
+    Streaming generators are resumed once per frame, so the trace is made
+    current per step rather than across yields.
+    """
+    with use_trace(trace):
+        return await awaitable
+
+
 class QueryResponse(BaseModel):
     """Response model for query"""
     success: bool
     answer: str
     sources: List[Dict]
     chunks_used: int
+    context_tokens: int = 0
+    cached: bool = False
 
 
 @router.post("/query", response_model=QueryResponse)
@@ -42,6 +78,12 @@ async def query_rag(request: QueryRequest):
     Returns:
         Answer generated from RAG with sources
     """
+    with tracer.trace("chat_query"):
+        return await _query_rag(request)
+
+
+async def _query_rag(request: QueryRequest) -> QueryResponse:
+    """Run the RAG pipeline for /query (inside the request trace)"""
     try:
         if not request.question or len(request.question.strip()) == 0:
             raise HTTPException(status_code=400, detail="Question cannot be empty")
@@ -49,16 +91,18 @@ async def query_rag(request: QueryRequest):
         logger.info(f"RAG Query: {request.question}")
         
         # 1. Retrieve relevant context from ChromaDB (using default TOP_K from constants)
+        # Adaptive top-k drops weak hits; if nothing clears the bar we skip the LLM
         context_chunks = await retrieval_service.retrieve_context(
             query=request.question,
-            top_k=RAG_TOP_K
+            top_k=RAG_TOP_K,
+            adaptive=RAG_ADAPTIVE_TOP_K
         )
         
         if not context_chunks:
             logger.warning("No relevant documents found")
             return QueryResponse(
                 success=True,
-                answer="I don't have any relevant information in my knowledge base to answer this question.",
+                answer=NO_CONTEXT_ANSWER,
                 sources=[],
                 chunks_used=0
             )
@@ -66,30 +110,29 @@ async def query_rag(request: QueryRequest):
         # 2. Get current system prompt
         system_prompt = config_manager.get_prompt()
         
-        # 3. Generate answer using LLM with RAG context
-        answer = await llm_service.generate_response(
+        # 3. Generate answer using LLM with token-budgeted RAG context
+        result = await llm_service.generate_response(
             user_query=request.question,
             context_chunks=context_chunks,
             system_prompt=system_prompt
         )
         
-        # 4. Format sources
-        sources = [
-            {
-                "document_name": chunk.get("document_name", "Unknown"),
-                "text": chunk.get("text", ""),
-                "similarity": chunk.get("similarity", 0.0)
-            }
-            for chunk in context_chunks
-        ]
+        # 4. Format sources (only the chunks that fit the context budget)
+        sources = _format_sources(result["packed_chunks"])
+        mark("response_ready")
         
-        logger.info(f"Generated answer using {len(context_chunks)} chunks")
+        logger.info(
+            f"Generated answer using {result['chunks_packed']} chunks "
+            f"(~{result['context_tokens']} context tokens)"
+        )
         
         return QueryResponse(
             success=True,
-            answer=answer,
+            answer=result["answer"],
             sources=sources,
-            chunks_used=len(context_chunks)
+            chunks_used=result["chunks_packed"],
+            context_tokens=result["context_tokens"],
+            cached=result["cached"]
         )
         
     except HTTPException:
@@ -99,6 +142,88 @@ async def query_rag(request: QueryRequest):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/query/stream")
+async def query_rag_stream(request: QueryRequest):
+    """
+    Streaming variant of /query using server-sent events
+    
+    Events:
+    - `sources`: the sources the answer is based on (retrieved chunks that fit
+      the context budget), sent before the first token
+    - `token`: answer text deltas as the LLM generates them
+    - `done`: token usage and timings (retrieval, time to first token, total)
+    - `error`: sent instead of `done` if generation fails mid-stream
+    """
+    if not request.question or len(request.question.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    logger.info(f"RAG Stream Query: {request.question}")
+    
+    async def event_stream() -> AsyncIterator[str]:
+        started_at = time.perf_counter()
+        first_token_at = None
+        trace = tracer.start("chat_query_stream")
+        
+        try:
+            # 1. Retrieve
+            context_chunks = await _in_trace(trace, retrieval_service.retrieve_context(
+                query=request.question,
+                top_k=RAG_TOP_K,
+                adaptive=RAG_ADAPTIVE_TOP_K
+            ))
+            retrieval_ms = (time.perf_counter() - started_at) * 1000
+            
+            usage = {"chunks_packed": 0, "context_tokens": 0}
+            if not context_chunks:
+                logger.warning("No relevant documents found")
+                yield _sse("sources", {"sources": []})
+                first_token_at = time.perf_counter()
+                yield _sse("token", {"text": NO_CONTEXT_ANSWER})
+            else:
+                # 2. Stream LLM tokens
+                stream = llm_service.stream_response(
+                    user_query=request.question,
+                    context_chunks=context_chunks,
+                    system_prompt=config_manager.get_prompt()
+                )
+                while True:
+                    try:
+                        event = await _in_trace(trace, stream.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    if event["type"] == "context":
+                        # Packing happens before the LLM call, so sources still precede tokens
+                        yield _sse("sources", {"sources": _format_sources(event["packed_chunks"])})
+                    elif event["type"] == "token":
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        yield _sse("token", {"text": event["text"]})
+                    else:
+                        usage = {key: value for key, value in event.items() if key != "type"}
+            
+            # 3. Final usage/timing frame
+            finished_at = time.perf_counter()
+            yield _sse("done", {
+                **usage,
+                "retrieval_ms": round(retrieval_ms, 1),
+                "time_to_first_token_ms": round((first_token_at - started_at) * 1000, 1) if first_token_at else None,
+                "total_ms": round((finished_at - started_at) * 1000, 1)
+            })
+            
+        except Exception as e:
+            logger.error(f"Error streaming query: {e}")
+            yield _sse("error", {"detail": "Internal server error"})
+        
+        finally:
+            tracer.finish(trace)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/query/simple")
 async def simple_query(request: QueryRequest):
     """
@@ -1,7 +1,8 @@
 """
 Document management routes (simplified - no database!)
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 from typing import List
 from app.services.document_service import document_service
 from app.utils.logger import get_logger
@@ -40,7 +41,7 @@ async def list_documents():
     Get list of all uploaded documents from ChromaDB
     """
     try:
-        documents = document_service.list_documents()
+        documents = await asyncio.to_thread(document_service.list_documents)
         return {
             "success": True,
             "data": documents
@@ -50,13 +51,31 @@ async def list_documents():
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.get("/chunks")
+async def get_chunks(ids: List[str] = Query(..., max_length=50)):
+    """
+    Get full text for chunk IDs (referenced by compact rag_sources payloads)
+    
+    Example: GET /documents/chunks?ids=<chunk_id>&ids=<chunk_id>
+    """
+    try:
+        chunks = await asyncio.to_thread(document_service.get_chunks, ids)
+        return {
+            "success": True,
+            "data": chunks
+        }
+    except Exception as e:
+        logger.error(f"Error getting chunks: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.delete("/{document_id}")
 async def delete_document(document_id: str):
     """
     Delete a document and its associated chunks from ChromaDB
     """
     try:
-        success = document_service.delete_document(document_id)
+        success = await asyncio.to_thread(document_service.delete_document, document_id)
         
         if not success:
             raise HTTPException(status_code=404, detail="Document not found")
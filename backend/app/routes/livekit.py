@@ -3,7 +3,6 @@ LiveKit routes for room management and token generation
 """
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from livekit import api
 from app.config.settings import settings
 from app.utils.logger import get_logger
 
@@ -30,6 +29,9 @@ async def create_token(request: TokenRequest):
     Returns:
         Access token for LiveKit room
     """
+    # Imported here: the LiveKit SDK is slow to import and only this route needs it
+    from livekit import api
+    
     try:
         # Create token with API credentials
         token = api.AccessToken(
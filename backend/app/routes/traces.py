@@ -0,0 +1,70 @@
+"""
+Latency trace routes
+"""
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from app.utils.tracing import tracer, summarize
+from app.config.constants import TRACE_BUFFER_SIZE
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/traces", tags=["traces"])
+
+
+def _load_traces(source: str, limit: int):
+    """Traces from this process ("memory") or the export file ("file", all processes)"""
+    if source == "memory":
+        return tracer.recent()[-limit:]
+    if source == "file":
+        return tracer.exported(limit=limit)
+    raise HTTPException(status_code=400, detail="source must be 'memory' or 'file'")
+
+
+@router.get("/summary")
+async def get_trace_summary(
+    source: str = Query("memory"),
+    limit: int = Query(TRACE_BUFFER_SIZE, ge=1, le=100000)
+):
+    """
+    Per-stage latency histograms and percentiles
+    
+    Use `source=file` to include voice-agent traces, which are written by
+    the agent worker processes to the trace export file.
+    """
+    try:
+        # Reading the export file is blocking I/O
+        traces = await asyncio.to_thread(_load_traces, source, limit)
+        return {
+            "success": True,
+            "data": {
+                "traces": len(traces),
+                "stages": summarize(traces)
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error summarizing traces: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/export")
+async def export_traces(
+    source: str = Query("memory"),
+    limit: int = Query(TRACE_BUFFER_SIZE, ge=1, le=100000)
+):
+    """
+    Export raw traces (stage timestamps in ms since the trace started)
+    """
+    try:
+        traces = await asyncio.to_thread(_load_traces, source, limit)
+        return {
+            "success": True,
+            "data": traces
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting traces: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,11 +1,10 @@
 """
 Services package
+
+Exports are imported on first access (PEP 562); the singletons themselves
+are created on first use (see app.utils.lazy).
 """
-from app.services.embedding_service import EmbeddingService, embedding_service
-from app.services.ingestion_service import IngestionService, ingestion_service
-from app.services.retrieval_service import RetrievalService, retrieval_service
-from app.services.llm_service import LLMService, llm_service
-from app.services.document_service import DocumentService, document_service
+from app.utils.lazy import lazy_exports
 
 __all__ = [
     "EmbeddingService",
@@ -19,3 +18,16 @@ __all__ = [
     "DocumentService",
     "document_service"
 ]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "EmbeddingService": "embedding_service",
+    "embedding_service": "embedding_service",
+    "IngestionService": "ingestion_service",
+    "ingestion_service": "ingestion_service",
+    "RetrievalService": "retrieval_service",
+    "retrieval_service": "retrieval_service",
+    "LLMService": "llm_service",
+    "llm_service": "llm_service",
+    "DocumentService": "document_service",
+    "document_service": "document_service"
+})
@@ -0,0 +1,237 @@
+"""
+Persistent exact-match cache for LLM completions (SQLite, no server needed)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from app.config.settings import settings
+from app.config.constants import LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES
+from app.utils.logger import get_logger
+from app.utils.metrics import CACHE_REQUESTS
+
+logger = get_logger(__name__)
+
+_HITS = CACHE_REQUESTS.labels("completion", "hit")
+_MISSES = CACHE_REQUESTS.labels("completion", "miss")
+
+
+class CompletionCache:
+    """
+    Exact-match completion cache
+    
+    Keyed on (model, system prompt hash, ordered context chunk ids,
+    normalized query). Entries expire after a TTL, the least recently used
+    entries are evicted beyond a size bound, and every entry that used a
+    chunk of a document is dropped when that document changes.
+    
+    Lookups only read: hits are remembered in memory and written as
+    last_access with the next store, which is when eviction needs them.
+    Calls do blocking SQLite I/O; async callers use asyncio.to_thread.
+    """
+    
+    def __init__(
+        self,
+        path: str = settings.LLM_CACHE_PATH,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Hits not yet written to last_access (key -> time of the latest hit)
+        self._accessed: Dict[str, float] = {}
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completion_documents ("
+            "key TEXT NOT NULL, document_id TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_completion_documents_document "
+            "ON completion_documents (document_id)"
+        )
+        logger.info(f"Completion cache ready at {path}")
+    
+    @staticmethod
+    def make_key(
+        model: str,
+        system_prompt: str,
+        chunk_ids: List[str],
+        query: str
+    ) -> str:
+        """
+        Build the cache key for a completion request
+        
+        Args:
+            model: LLM model name
+            system_prompt: System prompt text
+            chunk_ids: Ordered ids of the chunks in the prompt context
+            query: User query (case and whitespace are normalized)
+        
+        Returns:
+            Hex digest key
+        """
+        prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        normalized_query = " ".join(query.lower().split())
+        payload = json.dumps([model, prompt_hash, chunk_ids, normalized_query])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached completion
+        
+        Args:
+            key: Cache key from `make_key`
+        
+        Returns:
+            Cached response dict, or None on miss/expiry
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            
+            # Expired entries are left for the next eviction
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                _MISSES.inc()
+                return None
+            
+            self._accessed[key] = now
+            self.hits += 1
+            _HITS.inc()
+        
+        return json.loads(row[0])
+    
+    def set(self, key: str, response: Dict, document_ids: List[str]):
+        """
+        Store a completion
+        
+        Args:
+            key: Cache key from `make_key`
+            response: JSON-serializable response dict
+            document_ids: Documents whose chunks were in the prompt
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response), now, now)
+            )
+            self._conn.execute("DELETE FROM completion_documents WHERE key = ?", (key,))
+            self._conn.executemany(
+                "INSERT INTO completion_documents (key, document_id) VALUES (?, ?)",
+                [(key, document_id) for document_id in set(document_ids)]
+            )
+            self._write_accesses()
+            self._evict()
+    
+    def invalidate_document(self, document_id: str) -> int:
+        """
+        Drop every cached completion that used a chunk of a document
+        
+        Args:
+            document_id: Changed or deleted document ID
+        
+        Returns:
+            Number of entries removed
+        """
+        with self._lock, self._transaction():
+            keys = [
+                row[0] for row in self._conn.execute(
+                    "SELECT DISTINCT key FROM completion_documents WHERE document_id = ?",
+                    (document_id,)
+                )
+            ]
+            self._delete_keys(keys)
+        
+        if keys:
+            logger.info(f"Invalidated {len(keys)} cached completions for document {document_id}")
+        return len(keys)
+    
+    def stats(self) -> Dict:
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+    
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that is rolled back if anything in it fails (e.g. database is locked)"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            raise
+    
+    def _write_accesses(self):
+        """Write remembered hits to last_access (inside a write transaction)"""
+        if not self._accessed:
+            return
+        accessed, self._accessed = self._accessed, {}
+        try:
+            self._conn.executemany(
+                "UPDATE completions SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(at, key) for key, at in accessed.items()]
+            )
+        except BaseException:
+            # Rolled back with the transaction: keep them for the next store
+            for key, at in accessed.items():
+                self._accessed.setdefault(key, at)
+            raise
+    
+    def _evict(self):
+        """Remove expired entries and the least recently used beyond the size bound"""
+        expired_before = time.time() - self.ttl_seconds
+        keys = [
+            row[0] for row in self._conn.execute(
+                "SELECT key FROM completions WHERE created_at < ?", (expired_before,)
+            )
+        ]
+        overflow = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0] - len(keys) - self.max_entries
+        if overflow > 0:
+            keys += [
+                row[0] for row in self._conn.execute(
+                    "SELECT key FROM completions WHERE created_at >= ? "
+                    "ORDER BY last_access ASC LIMIT ?",
+                    (expired_before, overflow)
+                )
+            ]
+        self._delete_keys(keys)
+    
+    def _delete_keys(self, keys: List[str]):
+        """Delete entries and their document references"""
+        if not keys:
+            return
+        params = [(key,) for key in keys]
+        self._conn.executemany("DELETE FROM completions WHERE key = ?", params)
+        self._conn.executemany("DELETE FROM completion_documents WHERE key = ?", params)
+
+
+# Create global instance
+completion_cache = CompletionCache() if settings.LLM_CACHE_ENABLED else None
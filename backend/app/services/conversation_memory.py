@@ -0,0 +1,164 @@
+"""
+Per-session conversation memory for voice turns
+"""
+import re
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from app.services.retrieval_gate import STOP_WORDS
+from app.config.constants import (
+    CONVERSATION_MEMORY_TURNS,
+    CONVERSATION_CONDENSE_MIN_CONTENT_WORDS,
+    CONVERSATION_QUERY_MAX_TERMS,
+    RETRIEVAL_GATE_FOLLOWUP_WORDS,
+    SESSION_CHUNK_CACHE_SIZE
+)
+from app.utils.logger import get_logger
+from app.utils.metrics import CACHE_REQUESTS
+
+logger = get_logger(__name__)
+
+_CHUNK_HITS = CACHE_REQUESTS.labels("session_chunks", "hit")
+_CHUNK_MISSES = CACHE_REQUESTS.labels("session_chunks", "miss")
+
+CONTINUATION_PREFIXES = ("and ", "what about ", "how about ", "also ", "then ", "but ")
+
+
+def topic_words(text: str) -> List[str]:
+    """Words of a transcript that carry its topic, in order"""
+    followup_words = set(RETRIEVAL_GATE_FOLLOWUP_WORDS)
+    return [
+        word for word in re.findall(r"[a-z0-9]+", text.lower())
+        if len(word) > 1 and word not in STOP_WORDS and word not in followup_words
+    ]
+
+
+class SessionChunkCache:
+    """
+    Chunks already fetched in this session, keyed by chunk id
+    
+    Retrieval asks the vector store only for ids and distances and fetches
+    the text and metadata of ids that are not cached here.
+    """
+    
+    def __init__(self, max_size: int = SESSION_CHUNK_CACHE_SIZE):
+        self.max_size = max_size
+        self._chunks: "OrderedDict[str, Dict]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+    
+    def lookup(self, chunk_ids: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
+        """
+        Split chunk ids into cached chunks and ids that must be fetched
+        
+        Args:
+            chunk_ids: Chunk ids from a vector query
+        
+        Returns:
+            (cached chunks keyed by id, missing ids)
+        """
+        cached, missing = {}, []
+        for chunk_id in chunk_ids:
+            chunk = self._chunks.get(chunk_id)
+            if chunk is None:
+                missing.append(chunk_id)
+            else:
+                self._chunks.move_to_end(chunk_id)
+                cached[chunk_id] = chunk
+        self.stats["hits"] += len(cached)
+        self.stats["misses"] += len(missing)
+        _CHUNK_HITS.inc(len(cached))
+        _CHUNK_MISSES.inc(len(missing))
+        return cached, missing
+    
+    def store(self, chunks: List[Dict]):
+        """Cache fetched chunks (text and metadata), evicting the least recently used"""
+        for chunk in chunks:
+            self._chunks[chunk["chunk_id"]] = chunk
+            self._chunks.move_to_end(chunk["chunk_id"])
+        while len(self._chunks) > self.max_size:
+            self._chunks.popitem(last=False)
+
+    def invalidate_document(self, document_id: Optional[str]) -> int:
+        """Drop cached chunks of a deleted or re-ingested document (None: every document)"""
+        stale = [
+            chunk_id for chunk_id, chunk in self._chunks.items()
+            if document_id is None or chunk["document_id"] == document_id
+        ]
+        for chunk_id in stale:
+            del self._chunks[chunk_id]
+        return len(stale)
+
+
+class ConversationMemory:
+    """
+    Recent turns of one voice session and the chunks they retrieved
+    
+    Follow-up questions ("and what about the second one?") are embedded
+    poorly on their own, so they are condensed into a retrieval query that
+    borrows topic words from the recent dialogue. This is a local rewrite:
+    an LLM rewrite would cost a full round trip before retrieval can start.
+    """
+    
+    def __init__(self, max_turns: int = CONVERSATION_MEMORY_TURNS):
+        self._turns: Deque[Tuple[str, List[str]]] = deque(maxlen=max_turns)
+        self.chunk_cache = SessionChunkCache()
+        self.stats = {"turns": 0, "condensed_queries": 0}
+    
+    def add_turn(self, user_text: str, context_chunks: List[Dict]):
+        """
+        Record a user turn and the chunk ids retrieved for it
+        
+        Args:
+            user_text: Final user transcript
+            context_chunks: Chunks used for the turn
+        """
+        self._turns.append((user_text, [chunk.get("chunk_id") for chunk in context_chunks]))
+        self.stats["turns"] += 1
+    
+    def condense_query(self, user_text: str) -> str:
+        """
+        Build the retrieval query for an utterance
+        
+        Self-contained questions are returned unchanged. Follow-ups (few topic
+        words, or opening like "and ..." / "what about ...") get topic words
+        from the most recent turns appended.
+        
+        Args:
+            user_text: Transcript text
+        
+        Returns:
+            Retrieval query text
+        """
+        if not self._turns:
+            return user_text
+        
+        own_words = topic_words(user_text)
+        normalized = " ".join(re.findall(r"[a-z0-9]+", user_text.lower())) + " "
+        is_followup = (
+            len(own_words) < CONVERSATION_CONDENSE_MIN_CONTENT_WORDS
+            or normalized.startswith(CONTINUATION_PREFIXES)
+        )
+        if not is_followup:
+            return user_text
+        
+        borrowed = []
+        for previous_text, _ in reversed(self._turns):
+            for word in topic_words(previous_text):
+                if word not in own_words and word not in borrowed:
+                    borrowed.append(word)
+        borrowed = borrowed[:CONVERSATION_QUERY_MAX_TERMS]
+        if not borrowed:
+            return user_text
+        
+        self.stats["condensed_queries"] += 1
+        condensed = f"{user_text} ({' '.join(borrowed)})"
+        logger.info(f"Condensed follow-up query: {condensed[:120]}")
+        return condensed
+    
+    def report(self) -> Dict:
+        """Turn counters and session chunk cache hit rate"""
+        lookups = self.chunk_cache.stats["hits"] + self.chunk_cache.stats["misses"]
+        return {
+            **self.stats,
+            **{f"chunk_cache_{key}": value for key, value in self.chunk_cache.stats.items()},
+            "chunk_cache_hit_rate": self.chunk_cache.stats["hits"] / lookups if lookups else 0.0
+        }
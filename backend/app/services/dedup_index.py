@@ -0,0 +1,179 @@
+"""
+Persistent near-duplicate index of stored chunks (SQLite, shared by all processes)
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+from app.config.settings import settings
+from app.config.constants import DEDUP_SIMILARITY_THRESHOLD, DEDUP_MAX_CANDIDATES
+from app.utils.dedup import band_keys, similarity
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DedupIndex:
+    """
+    LSH index over the MinHash signatures of every stored chunk
+    
+    Only canonical chunks (the first stored copy of a text) are put in LSH
+    buckets; later near-copies record the canonical chunk they alias. When a
+    document is deleted, the oldest alias of each of its canonical chunks
+    takes over, so the text stays findable while any copy is stored.
+    """
+    
+    def __init__(
+        self,
+        path: str = settings.DEDUP_INDEX_PATH,
+        threshold: float = DEDUP_SIMILARITY_THRESHOLD
+    ):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedup_chunks ("
+            "chunk_id TEXT PRIMARY KEY, document_id TEXT NOT NULL, "
+            "signature BLOB NOT NULL, canonical_id TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_chunks_document ON dedup_chunks (document_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_chunks_canonical ON dedup_chunks (canonical_id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedup_buckets ("
+            "bucket INTEGER NOT NULL, chunk_id TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_buckets_bucket ON dedup_buckets (bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_buckets_chunk ON dedup_buckets (chunk_id)")
+        logger.info(f"Dedup index ready at {path}")
+    
+    def find(self, signatures: np.ndarray) -> List[Optional[str]]:
+        """
+        Stored near-duplicates of new chunks
+        
+        Args:
+            signatures: One MinHash signature per new chunk
+        
+        Returns:
+            For each signature, the most similar canonical chunk ID at or
+            above the threshold (None if there is none)
+        """
+        matches: List[Optional[str]] = []
+        stored: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for signature in signatures:
+                candidates = []
+                for bucket in band_keys(signature):
+                    candidates.extend(
+                        row[0] for row in self._conn.execute(
+                            "SELECT chunk_id FROM dedup_buckets WHERE bucket = ? LIMIT ?",
+                            (bucket, DEDUP_MAX_CANDIDATES)
+                        )
+                    )
+                best, best_score = None, self.threshold
+                for chunk_id in dict.fromkeys(candidates):
+                    if chunk_id not in stored:
+                        row = self._conn.execute(
+                            "SELECT signature FROM dedup_chunks WHERE chunk_id = ?", (chunk_id,)
+                        ).fetchone()
+                        if row is None:
+                            continue
+                        stored[chunk_id] = np.frombuffer(row[0], dtype="<u4")
+                    score = similarity(signature, stored[chunk_id])
+                    if score >= best_score:
+                        best, best_score = chunk_id, score
+                matches.append(best)
+        return matches
+    
+    def add(
+        self,
+        document_id: str,
+        chunk_ids: List[str],
+        signatures: np.ndarray,
+        canonical_ids: List[Optional[str]]
+    ):
+        """
+        Record a document's stored chunks
+        
+        Args:
+            document_id: Document UUID
+            chunk_ids: Stored chunk IDs
+            signatures: MinHash signature per chunk
+            canonical_ids: Chunk each one aliases (None for canonical chunks)
+        """
+        with self._lock, self._transaction():
+            for chunk_id, signature, canonical_id in zip(chunk_ids, signatures, canonical_ids):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dedup_chunks (chunk_id, document_id, signature, canonical_id) "
+                    "VALUES (?, ?, ?, ?)",
+                    (chunk_id, document_id, signature.astype("<u4").tobytes(), canonical_id)
+                )
+                if canonical_id is None:
+                    self._bucket(chunk_id, signature)
+    
+    def remove_document(self, document_id: str) -> int:
+        """
+        Forget a deleted document's chunks (promoting aliases of its canonical chunks)
+        
+        Returns:
+            Number of chunks removed
+        """
+        with self._lock, self._transaction():
+            canonical = [
+                row[0] for row in self._conn.execute(
+                    "SELECT chunk_id FROM dedup_chunks WHERE document_id = ? AND canonical_id IS NULL",
+                    (document_id,)
+                )
+            ]
+            self._conn.execute(
+                "DELETE FROM dedup_buckets WHERE chunk_id IN "
+                "(SELECT chunk_id FROM dedup_chunks WHERE document_id = ?)",
+                (document_id,)
+            )
+            for chunk_id in canonical:
+                alias = self._conn.execute(
+                    "SELECT chunk_id, signature FROM dedup_chunks "
+                    "WHERE canonical_id = ? AND document_id != ? ORDER BY rowid LIMIT 1",
+                    (chunk_id, document_id)
+                ).fetchone()
+                if alias is None:
+                    continue
+                self._conn.execute("UPDATE dedup_chunks SET canonical_id = NULL WHERE chunk_id = ?", (alias[0],))
+                self._conn.execute(
+                    "UPDATE dedup_chunks SET canonical_id = ? WHERE canonical_id = ?",
+                    (alias[0], chunk_id)
+                )
+                self._bucket(alias[0], np.frombuffer(alias[1], dtype="<u4"))
+            removed = self._conn.execute(
+                "DELETE FROM dedup_chunks WHERE document_id = ?", (document_id,)
+            ).rowcount
+        
+        if removed:
+            logger.info(f"Removed {removed} chunks of document {document_id} from the dedup index")
+        return removed
+    
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that is rolled back if anything in it fails (e.g. database is locked)"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            raise
+    
+    def _bucket(self, chunk_id: str, signature: np.ndarray):
+        self._conn.executemany(
+            "INSERT INTO dedup_buckets (bucket, chunk_id) VALUES (?, ?)",
+            [(bucket, chunk_id) for bucket in band_keys(signature)]
+        )
+
+
+# Create global instance
+dedup_index = DedupIndex() if settings.DEDUP_ENABLED else None
@@ -7,10 +7,14 @@ import uuid
 from typing import List, Dict
 from fastapi import UploadFile
 from app.services.ingestion_service import ingestion_service
+from app.services.completion_cache import completion_cache
+from app.services.dedup_index import dedup_index
+from app.services.retrieval_service import retrieval_service
 from app.repositories.vector_repository import vector_repository
 from app.config.settings import settings
 from app.utils.file_utils import FileProcessor
 from app.utils.logger import get_logger
+from app.utils.metrics import UPLOAD_BYTES
 
 logger = get_logger(__name__)
 
@@ -74,6 +78,7 @@ class DocumentService:
         
         if file_size > settings.MAX_UPLOAD_SIZE:
             raise ValueError(f"File too large. Max size: {settings.MAX_UPLOAD_SIZE} bytes")
+        UPLOAD_BYTES.inc(file_size)
         
         # Generate unique document ID
         document_id = str(uuid.uuid4())
@@ -104,7 +109,9 @@ class DocumentService:
                 "filename": file.filename,
                 "file_size": file_size,
                 "total_chunks": result["total_chunks"],
-                "status": "indexed"
+                "stored_chunks": result["stored_chunks"],
+                "deduplication": result["deduplication"],
+                "status": result["status"]
             }
             
         except Exception as e:
@@ -122,11 +129,8 @@ class DocumentService:
             List of documents
         """
         try:
-            # Get all documents from ChromaDB collection
-            collection = vector_repository.collection
-            
-            # Get unique document IDs from metadata
-            all_data = collection.get()
+            # Get unique document IDs from metadata of all chunks
+            all_data = vector_repository.get(include=["metadatas"])
             
             if not all_data or not all_data['metadatas']:
                 return []
@@ -148,6 +152,33 @@ class DocumentService:
             logger.error(f"Error listing documents: {e}")
             return []
     
+    def get_chunks(self, chunk_ids: List[str]) -> List[Dict]:
+        """
+        Get full chunk text for chunk IDs (e.g. from compact rag_sources)
+        
+        Args:
+            chunk_ids: Chunk IDs to fetch
+        
+        Returns:
+            List of chunks found, in request order
+        """
+        results = vector_repository.get(ids=chunk_ids, include=["documents", "metadatas"])
+        found = {
+            chunk_id: (text, metadata)
+            for chunk_id, text, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+        }
+        return [
+            {
+                "chunk_id": chunk_id,
+                "document_id": found[chunk_id][1].get('document_id'),
+                "document_name": found[chunk_id][1].get('document_name', 'Unknown'),
+                "chunk_index": found[chunk_id][1].get('chunk_index'),
+                "text": found[chunk_id][0]
+            }
+            for chunk_id in chunk_ids
+            if chunk_id in found
+        ]
+    
     def delete_document(self, document_id: str) -> bool:
         """
         Delete document from ChromaDB
@@ -160,6 +191,11 @@ class DocumentService:
         """
         try:
             vector_repository.delete_by_document_id(document_id)
+            if completion_cache is not None:
+                completion_cache.invalidate_document(document_id)
+            retrieval_service.invalidate_document(document_id)
+            if dedup_index is not None:
+                dedup_index.remove_document(document_id)
             logger.info(f"Deleted document: {document_id}")
             return True
         except Exception as e:
@@ -0,0 +1,214 @@
+"""
+Embedding providers: OpenAI API and a local deterministic embedder
+"""
+import asyncio
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List
+import numpy as np
+from app.config.settings import settings
+from app.config.constants import (
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSION,
+    LOCAL_EMBEDDING_NONZEROS,
+    LOCAL_EMBEDDING_BIGRAM_WEIGHT,
+    LOCAL_EMBEDDING_SEED,
+    LOCAL_EMBEDDING_CACHE_SIZE,
+    LOCAL_EMBEDDING_THREAD_MIN_TEXTS
+)
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class EmbeddingProvider(ABC):
+    """
+    Interface for turning texts into embedding vectors
+    
+    Vectors from different providers are not comparable, so documents must
+    be embedded and queried with the same provider.
+    """
+    
+    name = "base"
+    
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts
+        
+        Args:
+            texts: List of text strings to embed
+        
+        Returns:
+            List of EMBEDDING_DIMENSION vectors, in input order
+        """
+    
+    async def warm(self):
+        """Open connections or load state ahead of the first request"""
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the OpenAI API"""
+    
+    name = "openai"
+    
+    def __init__(self, model: str = EMBEDDING_MODEL):
+        # Imported here: the openai package is slow to import
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+        self.model = model
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        response = await self.client.embeddings.create(
+            model=self.model,
+            input=texts
+        )
+        return [item.embedding for item in response.data]
+    
+    async def warm(self):
+        # Opens the HTTP connection pool with a cheap request
+        await self.client.models.list()
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer: scrambles uint64 values element-wise"""
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic offline embeddings (no network)
+    
+    Each word and word bigram is hashed to a sparse random projection: a few
+    dimensions with +/-1 signs. A text's vector is the sum over its features,
+    L2-normalized, so texts sharing words have a positive cosine similarity.
+    Words are hashed once (and cached); bigram hashes, projections and the
+    per-text sums are computed for the whole batch with vectorized NumPy.
+    
+    Much weaker than a trained model (no synonyms or word order beyond
+    bigrams), but fast and reproducible: suited to development, benchmarks
+    and running without the API.
+    """
+    
+    name = "local"
+    
+    def __init__(
+        self,
+        dimension: int = EMBEDDING_DIMENSION,
+        nonzeros: int = LOCAL_EMBEDDING_NONZEROS,
+        seed: int = LOCAL_EMBEDDING_SEED
+    ):
+        self.dimension = dimension
+        self.nonzeros = nonzeros
+        self._key = seed.to_bytes(8, "little")
+        # Offsets giving each feature `nonzeros` independent hashes
+        self._offsets = np.arange(1, nonzeros + 1, dtype=np.uint64) * np.uint64(0xD1B54A32D192ED03)
+        self._word_hashes: Dict[str, int] = {}
+    
+    def _word_hash(self, word: str) -> int:
+        """Seeded 64-bit hash of one word"""
+        value = self._word_hashes.get(word)
+        if value is None:
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8, key=self._key).digest()
+            value = int.from_bytes(digest, "little")
+            if len(self._word_hashes) >= LOCAL_EMBEDDING_CACHE_SIZE:
+                self._word_hashes.clear()
+            self._word_hashes[word] = value
+        return value
+    
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts on the calling thread
+        
+        Returns:
+            float32 array of shape (len(texts), dimension) with unit rows
+        """
+        words = [re.findall(r"\w+", text.lower()) for text in texts]
+        counts = np.array([len(text_words) for text_words in words], dtype=np.int64)
+        hashes = np.fromiter(
+            (self._word_hash(word) for text_words in words for word in text_words),
+            dtype=np.uint64,
+            count=int(counts.sum())
+        )
+        rows = np.repeat(np.arange(len(texts)), counts)
+        
+        # Bigrams: consecutive words of the same text
+        same_text = rows[1:] == rows[:-1]
+        bigram_hashes = _mix64(hashes[:-1][same_text] * np.uint64(31) + _mix64(hashes[1:][same_text]))
+        features = np.concatenate([hashes, bigram_hashes])
+        feature_rows = np.concatenate([rows, rows[:-1][same_text]])
+        feature_weights = np.concatenate([
+            np.ones(len(hashes), dtype=np.float32),
+            np.full(len(bigram_hashes), LOCAL_EMBEDDING_BIGRAM_WEIGHT, dtype=np.float32)
+        ])
+        
+        # Sparse projection: `nonzeros` (dimension, sign) pairs per feature
+        projected = _mix64(features[:, None] + self._offsets)
+        dimensions = ((projected >> np.uint64(1)) % np.uint64(self.dimension)).astype(np.int64)
+        signs = np.where(projected & np.uint64(1), 1.0, -1.0).astype(np.float32)
+        flat = feature_rows[:, None] * self.dimension + dimensions
+        vectors = np.bincount(
+            flat.ravel(),
+            weights=(signs * feature_weights[:, None]).ravel(),
+            minlength=len(texts) * self.dimension
+        ).reshape(len(texts), self.dimension).astype(np.float32)
+        
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        # Texts without words get a fixed unit vector instead of zeros (cosine is undefined for zeros)
+        vectors[norms[:, 0] == 0, 0] = 1.0
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        # Large batches (document ingestion) would stall the event loop
+        if len(texts) >= LOCAL_EMBEDDING_THREAD_MIN_TEXTS:
+            return (await asyncio.to_thread(self.embed_sync, texts)).tolist()
+        return self.embed_sync(texts).tolist()
+
+
+def embedding_identity(name: str = settings.EMBEDDING_PROVIDER) -> Dict[str, str]:
+    """
+    Provider and model that a provider's vectors come from
+    
+    Recorded in index snapshots, so vectors are never loaded into an index
+    that is queried with a different embedder.
+    
+    Args:
+        name: "openai" or "local"
+    
+    Returns:
+        {"embedding_provider", "embedding_model"}
+    """
+    if name == LocalEmbeddingProvider.name:
+        model = (
+            f"hashed-{EMBEDDING_DIMENSION}d-{LOCAL_EMBEDDING_NONZEROS}nz-"
+            f"bigram{LOCAL_EMBEDDING_BIGRAM_WEIGHT}-seed{LOCAL_EMBEDDING_SEED}"
+        )
+    else:
+        model = EMBEDDING_MODEL
+    return {"embedding_provider": name, "embedding_model": model}
+
+
+def create_embedding_provider(name: str = settings.EMBEDDING_PROVIDER) -> EmbeddingProvider:
+    """
+    Build the configured embedding provider
+    
+    Args:
+        name: "openai" or "local"
+    
+    Returns:
+        EmbeddingProvider instance
+    
+    Raises:
+        ValueError: If the provider name is unknown
+    """
+    if name == OpenAIEmbeddingProvider.name:
+        return OpenAIEmbeddingProvider()
+    if name == LocalEmbeddingProvider.name:
+        logger.info("Using local embedding provider (offline, deterministic)")
+        return LocalEmbeddingProvider()
+    raise ValueError(f"Unknown embedding provider: {name}")
@@ -1,21 +1,33 @@
 """
-Embedding service using OpenAI embeddings
+Embedding service (OpenAI or local embeddings, see embedding_providers)
 """
-from typing import List
-from openai import AsyncOpenAI
-from app.config.settings import settings
-from app.config.constants import EMBEDDING_MODEL
+import asyncio
+import time
+from collections import deque
+from typing import Deque, List, Optional
+from app.config.constants import (
+    EMBEDDING_DEADLINE_SECONDS,
+    EMBEDDING_HEDGE_PERCENTILE,
+    EMBEDDING_HEDGE_MIN_DELAY_SECONDS,
+    EMBEDDING_LATENCY_WINDOW
+)
+from app.services.embedding_providers import EmbeddingProvider, create_embedding_provider
+from app.utils.lazy import LazyProxy
 from app.utils.logger import get_logger
+from app.utils.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_SECONDS
 
 logger = get_logger(__name__)
 
 
 class EmbeddingService:
-    """Service for generating embeddings using OpenAI"""
+    """Service for generating embeddings with the configured provider"""
     
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model = EMBEDDING_MODEL
+    def __init__(self, provider: Optional[EmbeddingProvider] = None):
+        self.provider = provider or create_embedding_provider()
+        self._batch_sizes = EMBEDDING_BATCH_SIZE.labels(self.provider.name)
+        self._latency = EMBEDDING_SECONDS.labels(self.provider.name)
+        # Recent call latencies (seconds) used to pick the hedge delay
+        self._latency_samples: Deque[float] = deque(maxlen=EMBEDDING_LATENCY_WINDOW)
     
     async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
@@ -27,15 +39,12 @@ class EmbeddingService:
         Returns:
             List of embedding vectors
         """
-        logger.info(f"Generating embeddings for {len(texts)} texts using {self.model}")
+        logger.info(f"Generating embeddings for {len(texts)} texts using the {self.provider.name} provider")
         
+        self._batch_sizes.observe(len(texts))
         try:
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=texts
-            )
-            
-            embeddings = [item.embedding for item in response.data]
+            with self._latency.time():
+                embeddings = await self.provider.embed(texts)
             logger.info(f"Generated {len(embeddings)} embeddings successfully")
             return embeddings
             
@@ -43,6 +52,105 @@ class EmbeddingService:
             logger.error(f"Error generating embeddings: {e}")
             raise
 
+    async def warm(self):
+        """Warm the provider (e.g. open the OpenAI connection pool)"""
+        await self.provider.warm()
+    
+    def hedge_delay(self) -> float:
+        """
+        Delay after which a second (hedged) request is sent
+        
+        Uses the configured percentile of recent call latencies. Until enough
+        samples exist, hedges at half the deadline.
+        
+        Returns:
+            Delay in seconds
+        """
+        if len(self._latency_samples) < 20:
+            return max(EMBEDDING_HEDGE_MIN_DELAY_SECONDS, EMBEDDING_DEADLINE_SECONDS / 2)
+        
+        samples = sorted(self._latency_samples)
+        index = int(EMBEDDING_HEDGE_PERCENTILE * (len(samples) - 1))
+        return max(EMBEDDING_HEDGE_MIN_DELAY_SECONDS, samples[index])
+    
+    async def _timed_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings and record the latency of a successful call
+        
+        Failed and cancelled calls are not recorded: fast failures would pull
+        the hedge delay down, and a request cancelled because the other one
+        won says nothing about its latency. Requests still running at the
+        deadline are recorded by the caller.
+        """
+        start = time.perf_counter()
+        embeddings = await self.generate_embeddings(texts)
+        self._latency_samples.append(time.perf_counter() - start)
+        return embeddings
+    
+    async def generate_embeddings_with_deadline(
+        self,
+        texts: List[str],
+        deadline: float = EMBEDDING_DEADLINE_SECONDS
+    ) -> Optional[List[List[float]]]:
+        """
+        Generate embeddings within a deadline, hedging slow requests
+        
+        A second identical request is sent when the first one is slower than
+        the hedge delay (or fails early). The first successful response wins
+        and the other request is cancelled.
+        
+        Args:
+            texts: List of text strings to embed
+            deadline: Maximum time to wait in seconds
+        
+        Returns:
+            List of embedding vectors, or None if the deadline was missed
+        """
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        first = asyncio.create_task(self._timed_embeddings(texts))
+        pending = {first}
+        hedged = False
+        
+        try:
+            while pending:
+                remaining = deadline - (loop.time() - started_at)
+                if remaining <= 0:
+                    break
+                
+                timeout = remaining if hedged else min(self.hedge_delay(), remaining)
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    logger.warning(f"Embedding request failed: {task.exception()}")
+                
+                if not hedged:
+                    logger.info(f"Hedging embedding request after {loop.time() - started_at:.3f}s")
+                    pending.add(asyncio.create_task(self._timed_embeddings(texts)))
+                    hedged = True
+            
+            if not pending:
+                logger.warning("Embedding requests failed")
+                return None
+            
+            # The first request took at least the deadline, which keeps slow
+            # tails visible in the percentile (a hedge sent later ran too
+            # briefly to say anything)
+            if first in pending:
+                self._latency_samples.append(deadline)
+            logger.warning(f"Embedding request missed its {deadline:.2f}s deadline")
+            return None
+        
+        finally:
+            for task in pending:
+                task.cancel()
+
 
-# Create global instance
-embedding_service = EmbeddingService()
+# Create global instance (created on first use)
+embedding_service: EmbeddingService = LazyProxy(EmbeddingService, "embedding_service")
@@ -1,13 +1,24 @@
 """
 Document ingestion service for RAG pipeline (no database!)
 """
+import asyncio
 import os
-from typing import Dict
+from typing import Dict, List, Optional
+import numpy as np
+from app.config.constants import DEDUP_ACROSS_DOCUMENTS
 from app.services.embedding_service import embedding_service
+from app.services.completion_cache import completion_cache
+from app.services.dedup_index import dedup_index
+from app.services.retrieval_service import retrieval_service
 from app.repositories.vector_repository import vector_repository
 from app.utils.chunking import ChunkingStrategy
+from app.utils.dedup import MinHasher, find_duplicates
+from app.utils.document_summaries import summary_vectors
 from app.utils.file_utils import FileProcessor
+from app.utils.lazy import LazyProxy
 from app.utils.logger import get_logger
+from app.utils.metrics import DOCUMENT_CHUNKS, DUPLICATE_CHUNKS, EMBEDDING_TOKENS_SAVED
+from app.utils.token_budget import estimate_tokens
 
 logger = get_logger(__name__)
 
@@ -20,6 +31,8 @@ class IngestionService:
         self.vector_repository = vector_repository
         self.chunking_strategy = ChunkingStrategy()
         self.file_processor = FileProcessor()
+        self.dedup_index = dedup_index
+        self.min_hasher = MinHasher()
     
     async def ingest_document(
         self,
@@ -33,9 +46,12 @@ class IngestionService:
         Steps:
         1. Extract text from PDF/TXT
         2. Chunk text
-        3. Generate embeddings
-        4. Store in ChromaDB
-        5. Delete source file
+        3. Find repeated chunks (identical ones within the document are dropped;
+           near-duplicates reuse an earlier or stored copy's embedding, or are
+           skipped)
+        4. Generate embeddings for the remaining chunks
+        5. Store in ChromaDB, with document summary vectors for routing
+        6. Delete source file
         
         Args:
             file_path: Path to the uploaded file
@@ -66,21 +82,77 @@ class IngestionService:
             )
             
             logger.info(f"Created {len(chunks)} chunks")
+            DOCUMENT_CHUNKS.observe(len(chunks))
             
-            # 3. Generate embeddings
-            logger.info("Generating embeddings")
-            chunk_texts = [chunk["text"] for chunk in chunks]
-            embeddings = await self.embedding_service.generate_embeddings(chunk_texts)
+            # 3. Find repeated chunks (CPU and SQLite work: off the event loop)
+            total_chunks = len(chunks)
+            chunks, signatures, canonical_ids, embeddings, sources, deduplication = await asyncio.to_thread(
+                self._deduplicate, chunks
+            )
+            if not chunks:
+                # "skip" mode and every chunk is already stored: nothing new to index
+                logger.info(f"Document {document_id} duplicates {deduplication['matched_documents']}; nothing stored")
+                self.file_processor.delete_file(file_path)
+                return {
+                    "document_id": document_id,
+                    "filename": filename,
+                    "total_chunks": total_chunks,
+                    "stored_chunks": 0,
+                    "deduplication": deduplication,
+                    "status": "duplicate"
+                }
+            
+            # 4. Generate embeddings (aliased chunks reuse the stored or earlier copy's)
+            missing = [
+                row for row, (embedding, source) in enumerate(zip(embeddings, sources))
+                if embedding is None and source is None
+            ]
+            logger.info(f"Generating embeddings for {len(missing)} of {len(chunks)} chunks")
+            if missing:
+                generated = await self.embedding_service.generate_embeddings(
+                    [chunks[row]["text"] for row in missing]
+                )
+                for row, embedding in zip(missing, generated):
+                    embeddings[row] = embedding
+            for row, source in enumerate(sources):
+                if source is not None:
+                    embeddings[row] = embeddings[source]
             
-            # 4. Store in ChromaDB
+            # 5. Store in ChromaDB
             logger.info("Storing in ChromaDB")
-            self.vector_repository.add_chunks(
+            await asyncio.to_thread(
+                self.vector_repository.add_chunks,
                 embeddings=embeddings,
                 chunks=chunks,
                 document_id=document_id
             )
+            sections, summaries = summary_vectors(
+                embeddings,
+                [chunk["metadata"]["chunk_index"] for chunk in chunks]
+            )
+            await asyncio.to_thread(
+                self.vector_repository.add_document_summaries,
+                document_id=document_id,
+                document_name=filename,
+                sections=sections,
+                embeddings=summaries.tolist()
+            )
+            if self.dedup_index is not None:
+                await asyncio.to_thread(
+                    self.dedup_index.add,
+                    document_id,
+                    [self._chunk_id(chunk) for chunk in chunks],
+                    signatures,
+                    canonical_ids
+                )
+            
+            # Cached completions and retrieval results that used an older
+            # version of this document are stale
+            if completion_cache is not None:
+                await asyncio.to_thread(completion_cache.invalidate_document, document_id)
+            await asyncio.to_thread(retrieval_service.invalidate_document, document_id)
             
-            # 5. Delete the file after successful ingestion
+            # 6. Delete the file after successful ingestion
             logger.info(f"Deleting source file: {file_path}")
             self.file_processor.delete_file(file_path)
             
@@ -89,7 +161,9 @@ class IngestionService:
             return {
                 "document_id": document_id,
                 "filename": filename,
-                "total_chunks": len(chunks),
+                "total_chunks": total_chunks,
+                "stored_chunks": len(chunks),
+                "deduplication": deduplication,
                 "status": "indexed"
             }
             
@@ -102,6 +176,124 @@ class IngestionService:
             
             raise
 
+    def _deduplicate(self, chunks: List[Dict]):
+        """
+        Find repeated chunks before embedding
+        
+        Within the document, chunks whose text is identical (ignoring case and
+        whitespace), such as repeated headers and footers, are dropped. Near
+        duplicates (MinHash similarity at or above the threshold) keep their
+        text but reuse the embedding of the first similar chunk. Chunks
+        matching one stored for another document are, per
+        DEDUP_ACROSS_DOCUMENTS, stored with that chunk's embedding ("alias",
+        so retrieval filtered to this document still finds them), dropped
+        ("skip") or embedded as usual ("off"). A stored match only counts if
+        the chunk is in the active collection.
+        
+        Chunks keep their chunk_index and total_chunks, so a stored document
+        can have gaps in its chunk indexes.
+        
+        Returns:
+            (kept chunks, their signatures, canonical chunk ID each one aliases,
+            reused embedding per chunk or None, position of the kept chunk whose
+            embedding each one copies or None, savings summary)
+        """
+        deduplication = {
+            "duplicate_chunks": 0,
+            "aliased_chunks": 0,
+            "skipped_chunks": 0,
+            "tokens_saved": 0,
+            "matched_documents": []
+        }
+        if self.dedup_index is None:
+            return chunks, None, None, [None] * len(chunks), [None] * len(chunks), deduplication
+        
+        # Identical text within the document: dropped
+        seen = set()
+        kept = []
+        for row, chunk in enumerate(chunks):
+            key = " ".join(chunk["text"].lower().split())
+            if key in seen:
+                deduplication["duplicate_chunks"] += 1
+                deduplication["tokens_saved"] += estimate_tokens(chunk["text"])
+            else:
+                seen.add(key)
+                kept.append(row)
+        chunks = [chunks[row] for row in kept]
+        signatures = self.min_hasher.signatures([chunk["text"] for chunk in chunks])
+        
+        # Near duplicates within the document: kept, embedding copied from the first
+        sources: List[Optional[int]] = find_duplicates(signatures)
+        canonical_ids: List[Optional[str]] = [
+            None if source is None else self._chunk_id(chunks[source]) for source in sources
+        ]
+        document_aliases = sum(source is not None for source in sources)
+        deduplication["aliased_chunks"] = document_aliases
+        deduplication["tokens_saved"] += sum(
+            estimate_tokens(chunk["text"]) for chunk, source in zip(chunks, sources) if source is not None
+        )
+        
+        # Stored near duplicates of the remaining chunks, if they are in the active collection
+        embeddings: List[Optional[List[float]]] = [None] * len(chunks)
+        skipped = set()
+        if DEDUP_ACROSS_DOCUMENTS != "off":
+            candidates = [position for position, source in enumerate(sources) if source is None]
+            matches = self.dedup_index.find(signatures[candidates])
+            matched = list(dict.fromkeys(filter(None, matches)))
+            stored_embeddings = {}
+            if matched:
+                stored = self.vector_repository.get(ids=matched, include=["embeddings"])
+                stored_embeddings = dict(zip(
+                    stored["ids"], stored["embeddings"] if stored["embeddings"] is not None else []
+                ))
+            for position, canonical_id in zip(candidates, matches):
+                # Missing: not visible yet (e.g. the snapshot lags), deleted, or
+                # stored for another embedding provider's collection
+                if canonical_id is None or canonical_id not in stored_embeddings:
+                    continue
+                embeddings[position] = np.asarray(stored_embeddings[canonical_id], dtype=np.float32).tolist()
+                canonical_ids[position] = canonical_id
+                deduplication["tokens_saved"] += estimate_tokens(chunks[position]["text"])
+                if DEDUP_ACROSS_DOCUMENTS == "skip":
+                    skipped.add(position)
+                else:
+                    deduplication["aliased_chunks"] += 1
+            # Chunk IDs are "<document_id>_<chunk_index>"
+            deduplication["matched_documents"] = sorted({
+                canonical_ids[position].rsplit("_", 1)[0] for position in candidates if embeddings[position] is not None
+            })
+        
+        if skipped:
+            deduplication["skipped_chunks"] = len(skipped)
+            # Near duplicates of a skipped chunk take its stored embedding instead
+            for position, source in enumerate(sources):
+                if source in skipped:
+                    embeddings[position] = embeddings[source]
+                    canonical_ids[position] = canonical_ids[source]
+                    sources[position] = None
+            positions = [position for position in range(len(chunks)) if position not in skipped]
+            new_position = {old: new for new, old in enumerate(positions)}
+            chunks = [chunks[position] for position in positions]
+            signatures = signatures[positions]
+            canonical_ids = [canonical_ids[position] for position in positions]
+            embeddings = [embeddings[position] for position in positions]
+            sources = [None if sources[position] is None else new_position[sources[position]] for position in positions]
+        
+        DUPLICATE_CHUNKS.labels("document", "skip").inc(deduplication["duplicate_chunks"])
+        DUPLICATE_CHUNKS.labels("document", "alias").inc(document_aliases)
+        DUPLICATE_CHUNKS.labels("corpus", "alias").inc(deduplication["aliased_chunks"] - document_aliases)
+        DUPLICATE_CHUNKS.labels("corpus", "skip").inc(deduplication["skipped_chunks"])
+        EMBEDDING_TOKENS_SAVED.inc(deduplication["tokens_saved"])
+        if deduplication["tokens_saved"]:
+            logger.info(f"Deduplication: {deduplication}")
+        
+        return chunks, signatures, canonical_ids, embeddings, sources, deduplication
+    
+    @staticmethod
+    def _chunk_id(chunk: Dict) -> str:
+        """Stored ID of a chunk (as VectorRepository.add_chunks assigns it)"""
+        return f"{chunk['metadata']['document_id']}_{chunk['metadata']['chunk_index']}"
+
 
-# Create global instance
-ingestion_service = IngestionService()
+# Create global instance (created on first use)
+ingestion_service: IngestionService = LazyProxy(IngestionService, "ingestion_service")
@@ -1,24 +1,190 @@
 """
 LiveKit Agent service with OpenAI Realtime API integration
 """
-from typing import Dict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
 import os
 import json
-from livekit.agents import AutoSubscribe, JobContext, llm, Agent, AgentSession
+import time
+import zlib
+from livekit.agents import AutoSubscribe, JobContext, JobProcess, llm, Agent, AgentSession, function_tool
 from livekit.plugins import openai
 from app.services.retrieval_service import retrieval_service
+from app.services.speculative_retrieval import SpeculativeRetriever
+from app.services.turn_manager import TurnManager
+from app.services.retrieval_gate import RetrievalGate, GATE_RETRIEVE, GATE_SKIP, GATE_REUSE
+from app.services.conversation_memory import ConversationMemory
 from app.config.config_manager import config_manager
 from app.config.constants import (
     REALTIME_MODEL,
     REALTIME_VOICE,
     REALTIME_TEMPERATURE,
-    RAG_TOP_K
+    RAG_TOP_K,
+    RAG_ADAPTIVE_TOP_K,
+    VOICE_RETRIEVAL_LATENCY_SLO,
+    SPECULATIVE_RETRIEVAL_ENABLED,
+    RETRIEVAL_GATE_ENABLED,
+    CONVERSATION_MEMORY_ENABLED,
+    RAG_SOURCES_PAYLOAD_MODE,
+    RAG_SOURCES_SNIPPET_CHARS,
+    RAG_SOURCES_COMPRESSION,
+    RAG_INJECT_CHAT_CONTEXT,
+    RAG_RETRIEVAL_TOOL_ENABLED,
+    RAG_REALTIME_CONTEXT_TOKEN_BUDGET,
+    RAG_CONTEXT_ITEM_PREFIX,
+    RAG_CONTEXT_INSTRUCTIONS,
+    RAG_TOOL_INSTRUCTIONS
 )
+from app.utils.token_budget import ContextPacker
 from app.utils.logger import get_logger
+from app.utils.metrics import AGENT_TURNS, AGENT_TURNS_DROPPED, DATA_CHANNEL_BYTES, start_textfile_writer
+from app.utils.tracing import Trace, tracer, mark, use_trace
 
 logger = get_logger(__name__)
 
 
+class RAGAgent(Agent):
+    """
+    Voice agent whose chat context carries the latest turn's document context
+    
+    Each turn's context replaces the previous turn's as a single system
+    message, and the realtime session is updated with just that change, so
+    session tokens stay bounded. The search_documents tool lets the model
+    retrieve before answering when the injected context has not arrived yet.
+    """
+    
+    context_prefix = "[RAG_CONTEXT]"
+    tool_name = "search_documents"
+    
+    def __init__(self, instructions: str, retrieve: Callable[[str], Awaitable[List[Dict]]]):
+        """
+        Args:
+            instructions: System instructions
+            retrieve: Coroutine function retrieving context for a query
+        """
+        tools = []
+        if RAG_RETRIEVAL_TOOL_ENABLED:
+            tools.append(function_tool(
+                self.search_documents,
+                name=self.tool_name,
+                description="Search the user's uploaded documents for passages relevant to a question."
+            ))
+        super().__init__(instructions=instructions, tools=tools)
+        self._retrieve = retrieve
+        self._packer = ContextPacker(RAG_REALTIME_CONTEXT_TOKEN_BUDGET)
+        self._context_item_id: Optional[str] = None
+        self._context_chunk_ids: List[str] = []
+        self._context_injected_at = 0.0
+        self._inject_lock = asyncio.Lock()
+        self.stats = {"injections": 0, "cleared": 0, "tool_calls": 0, "context_tokens": 0}
+    
+    @staticmethod
+    def build_instructions(system_prompt: str) -> str:
+        """System prompt plus how to use the injected context and the tool"""
+        parts = [system_prompt]
+        if RAG_INJECT_CHAT_CONTEXT:
+            parts.append(RAG_CONTEXT_INSTRUCTIONS)
+        if RAG_RETRIEVAL_TOOL_ENABLED:
+            parts.append(RAG_TOOL_INSTRUCTIONS)
+        return "\n\n".join(parts)
+    
+    def _format_context(self, query: str, context_chunks: List[Dict]) -> Tuple[Optional[str], int]:
+        """Pack chunks into the realtime token budget and render the context message"""
+        packed_chunks, context_tokens = self._packer.pack(context_chunks)
+        if not packed_chunks:
+            return None, 0
+        context_str = "\n\n".join(self._packer.format_chunk(chunk) for chunk in packed_chunks)
+        return (
+            f"{self.context_prefix}\n"
+            f"RELEVANT CONTEXT FROM DOCUMENTS for \"{query}\":\n{context_str}"
+        ), context_tokens
+    
+    def _is_stale_context(self, item: llm.ChatItem) -> bool:
+        """The previous context message, or a search_documents call from before it"""
+        if item.id == self._context_item_id:
+            return True
+        return (
+            item.type in ("function_call", "function_call_output")
+            and item.name == self.tool_name
+            and item.created_at < self._context_injected_at
+        )
+    
+    async def inject_context(self, turn_id: int, user_text: str, context_chunks: List[Dict]) -> int:
+        """
+        Replace the previous turn's context with this turn's
+        
+        An empty chunk list clears the previous context. Tool calls made
+        before the previous injection are pruned as well.
+        
+        Args:
+            turn_id: ID of the turn
+            user_text: Final user transcript
+            context_chunks: Chunks retrieved for the turn
+        
+        Returns:
+            Estimated context tokens now held in the session
+        """
+        chunk_ids = [chunk.get("chunk_id") for chunk in context_chunks]
+        async with self._inject_lock:
+            if chunk_ids == self._context_chunk_ids:
+                return self.stats["context_tokens"]
+            
+            chat_ctx = self.chat_ctx.copy()
+            chat_ctx.items = [item for item in chat_ctx.items if not self._is_stale_context(item)]
+            
+            message, context_tokens = self._format_context(user_text, context_chunks)
+            item_id = None
+            if message is not None:
+                item_id = f"{RAG_CONTEXT_ITEM_PREFIX}_{turn_id}"
+                chat_ctx.add_message(role="system", content=message, id=item_id)
+            
+            await self.update_chat_ctx(chat_ctx)
+            self._context_item_id = item_id
+            self._context_chunk_ids = chunk_ids
+            self._context_injected_at = time.time()
+            self.stats["injections" if item_id else "cleared"] += 1
+            self.stats["context_tokens"] = context_tokens
+            logger.info(f"Injected ~{context_tokens} context tokens into the session chat context")
+            return context_tokens
+    
+    async def search_documents(self, query: str) -> str:
+        """
+        Retrieve document passages for the model
+        
+        Args:
+            query: What to search the documents for
+        """
+        self.stats["tool_calls"] += 1
+        logger.info(f"search_documents called: {query[:100]}")
+        context_chunks = await self._retrieve(query)
+        message, _ = self._format_context(query, context_chunks)
+        return message or "No relevant passages were found in the user's documents."
+
+
+class VoiceSessionState:
+    """Per-room state shared by the session event handlers and turn tasks"""
+    
+    def __init__(
+        self,
+        ctx: JobContext,
+        retrieve: Callable[[str, Optional[ConversationMemory]], Awaitable[List[Dict]]]
+    ):
+        """
+        Args:
+            ctx: LiveKit JobContext
+            retrieve: Coroutine function retrieving context for a query
+                (with the session's conversation memory)
+        """
+        self.ctx = ctx
+        self.turns = TurnManager()
+        self.memory = ConversationMemory() if CONVERSATION_MEMORY_ENABLED else None
+        self.speculative = SpeculativeRetriever(lambda text: retrieve(text, self.memory))
+        self.gate = RetrievalGate()
+        self.payload_stats = {"turns": 0, "published_bytes": 0, "full_payload_bytes": 0}
+        # Set once the agent is created
+        self.agent: Optional[RAGAgent] = None
+
+
 class LiveKitAgentService:
     """
     LiveKit Voice Agent using OpenAI Realtime API
@@ -30,15 +196,191 @@ class LiveKitAgentService:
     def __init__(self):
         self.retrieval_service = retrieval_service
         self.config_manager = config_manager
-        self._rag_context_prefix = "[RAG_CONTEXT]"
+        self._connections_warm = False
+    
+    def warm_index(self):
+        """Load the vector index into memory (runs in the process prewarm stage)"""
+        self.retrieval_service.vector_repository.warm()
+    
+    async def warm_connections(self):
+        """
+        Open the OpenAI HTTP connection pool with a cheap request
+        
+        The async client's pool is bound to the job's event loop, which does
+        not exist yet during prewarm, so this runs once per process at job
+        start, concurrently with connecting to the room.
+        """
+        if self._connections_warm:
+            return
+        started_at = time.perf_counter()
+        try:
+            await self.retrieval_service.embedding_service.warm()
+            self._connections_warm = True
+            logger.info(f"Warmed OpenAI connection pool in {(time.perf_counter() - started_at) * 1000:.0f} ms")
+        except Exception as e:
+            logger.warning(f"OpenAI connection warm-up failed: {e}")
 
-    async def _publish_data(self, ctx: JobContext, payload: Dict):
-        """Publish JSON payload to room participants."""
+    async def _retrieve_context(self, query: str, memory: Optional[ConversationMemory] = None) -> List[Dict]:
+        """
+        Retrieve context for a voice turn
+        
+        With conversation memory, follow-ups are condensed with recent turns
+        and chunks already fetched in the session are served from its cache.
+        """
+        # Deadline-bound so a slow embedding call cannot hold up the turn
+        return await self.retrieval_service.retrieve_context(
+            query=memory.condense_query(query) if memory else query,
+            top_k=RAG_TOP_K,
+            latency_slo=VOICE_RETRIEVAL_LATENCY_SLO,
+            adaptive=RAG_ADAPTIVE_TOP_K,
+            chunk_cache=memory.chunk_cache if memory else None
+        )
+    
+    async def _publish_data(
+        self,
+        ctx: JobContext,
+        payload: Dict,
+        compress: bool = False
+    ) -> int:
+        """
+        Publish JSON payload to room participants.
+        
+        Compressed payloads are zlib-deflated and sent on the
+        "<type>.deflate" topic so clients know to inflate them.
+        
+        Returns:
+            Number of bytes published (0 on failure)
+        """
         try:
-            data = json.dumps(payload).encode("utf-8")
-            await ctx.room.local_participant.publish_data(data, reliable=True)
+            data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            topic = ""
+            if compress:
+                data = zlib.compress(data)
+                topic = f"{payload['type']}.deflate"
+            await ctx.room.local_participant.publish_data(data, reliable=True, topic=topic)
+            DATA_CHANNEL_BYTES.labels(payload["type"]).inc(len(data))
+            return len(data)
         except Exception as e:
             logger.error(f"Failed to publish data: {e}")
+            return 0
+    
+    @staticmethod
+    def _build_sources_payload(context_chunks: List[Dict], mode: str = RAG_SOURCES_PAYLOAD_MODE) -> Dict:
+        """
+        Build the rag_sources payload for the frontend panel
+        
+        Compact payloads carry chunk ids, scores and short snippets; the
+        frontend fetches full chunk text on demand from
+        GET /api/documents/chunks.
+        """
+        if mode == "full":
+            sources = [
+                {
+                    "chunk_id": chunk.get("chunk_id"),
+                    "document_name": chunk["document_name"],
+                    "text": chunk["text"],
+                    "distance": chunk.get("distance"),
+                    "similarity": chunk.get("similarity")
+                }
+                for chunk in context_chunks
+            ]
+        else:
+            sources = [
+                {
+                    "chunk_id": chunk.get("chunk_id"),
+                    "document_name": chunk["document_name"],
+                    "snippet": chunk["text"][:RAG_SOURCES_SNIPPET_CHARS],
+                    "similarity": round(chunk["similarity"], 4) if chunk.get("similarity") is not None else None
+                }
+                for chunk in context_chunks
+            ]
+        return {"type": "rag_sources", "mode": mode, "sources": sources}
+    
+    def _record_sources_bytes(self, payload_stats: Dict, context_chunks: List[Dict], published_bytes: int):
+        """Track published rag_sources bytes against what the full-text payload would cost"""
+        full_bytes = len(json.dumps(
+            self._build_sources_payload(context_chunks, mode="full"),
+            separators=(",", ":")
+        ).encode("utf-8"))
+        payload_stats["turns"] += 1
+        payload_stats["published_bytes"] += published_bytes
+        payload_stats["full_payload_bytes"] += full_bytes
+        logger.info(f"Published rag_sources: {published_bytes} bytes (full payload: {full_bytes} bytes)")
+    
+    async def _handle_turn(
+        self,
+        state: VoiceSessionState,
+        turn_id: int,
+        user_text: str,
+        trace: Optional[Trace] = None
+    ):
+        """
+        Retrieve and publish RAG context for one user turn
+        
+        Args:
+            state: Session state
+            turn_id: ID of this turn
+            user_text: Final user transcript
+            trace: Latency trace of this turn
+        """
+        # Stage marks from retrieval land on this turn's trace
+        with use_trace(trace):
+            await self._run_turn(state, turn_id, user_text)
+    
+    async def _run_turn(self, state: VoiceSessionState, turn_id: int, user_text: str):
+        """Body of `_handle_turn`"""
+        ctx = state.ctx
+        
+        # Trivial utterances skip retrieval; short follow-ups reuse the last context
+        decision = state.gate.on_final(user_text) if RETRIEVAL_GATE_ENABLED else GATE_RETRIEVE
+        AGENT_TURNS.labels(decision).inc()
+        if decision == GATE_SKIP:
+            state.speculative.cancel()
+            mark("gate_skip")
+            return
+        
+        if decision == GATE_REUSE:
+            state.speculative.cancel()
+            mark("gate_reuse")
+            context_chunks = state.gate.previous_context
+        else:
+            # Retrieve relevant context from documents
+            # (reusing the interim-transcript prefetch when it still matches)
+            if SPECULATIVE_RETRIEVAL_ENABLED:
+                context_chunks = await state.speculative.resolve(user_text)
+            else:
+                context_chunks = await self._retrieve_context(user_text, state.memory)
+            state.gate.remember(context_chunks)
+        
+        if state.memory is not None:
+            state.memory.add_turn(user_text, context_chunks)
+        
+        # Only the latest turn may publish its results
+        if state.turns.drop_if_stale(turn_id):
+            AGENT_TURNS_DROPPED.inc()
+            mark("dropped_stale")
+            return
+        
+        # Replace the previous turn's context in the realtime session
+        # (an empty result clears it so stale context does not linger)
+        if RAG_INJECT_CHAT_CONTEXT and state.agent is not None:
+            try:
+                await state.agent.inject_context(turn_id, user_text, context_chunks)
+                mark("context_injected")
+            except Exception as e:
+                logger.error(f"Failed to inject RAG context: {e}")
+        
+        if context_chunks:
+            logger.info(f"Retrieved {len(context_chunks)} relevant chunks")
+            
+            # Publish RAG sources for frontend panel
+            payload = self._build_sources_payload(context_chunks)
+            published_bytes = await self._publish_data(ctx, payload, compress=RAG_SOURCES_COMPRESSION)
+            mark("data_publish")
+            self._record_sources_bytes(state.payload_stats, context_chunks, published_bytes)
+        else:
+            # Nothing cleared the relevance bar: no context for this turn
+            logger.info("No relevant documents found")
     
     async def entrypoint(self, ctx: JobContext):
         """
@@ -47,17 +389,25 @@ class LiveKitAgentService:
         Args:
             ctx: LiveKit JobContext
         """
-        logger.info("LiveKit agent starting...")
+        job_accepted_at = time.perf_counter()
+        # Set only by livekit_agent_prewarm (a cold fallback also stores the service)
+        prewarmed = ctx.proc.userdata.get("prewarmed", False)
+        logger.info(f"LiveKit agent starting (prewarmed process: {prewarmed})...")
         if not os.getenv("OPENAI_API_KEY"):
             logger.error("OPENAI_API_KEY is not set in this process environment")
         else:
             logger.info("OPENAI_API_KEY is set for agent process")
         
-        # Connect to LiveKit room
-        await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+        # Connect to LiveKit room while the OpenAI connection pool warms up
+        await asyncio.gather(
+            ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY),
+            self.warm_connections()
+        )
         logger.info(f"Connected to room: {ctx.room.name}")
         
-        # Get current system prompt from config manager (in-memory)
+        # Get current system prompt from the shared config store, and follow
+        # changes pushed while this process is running
+        self.config_manager.watch()
         system_prompt = self.config_manager.get_prompt()
         logger.info(f"Using system prompt ({len(system_prompt)} characters)")
         
@@ -76,6 +426,46 @@ class LiveKitAgentService:
             llm=realtime_model
         )
         
+        # Per-session turn tasks, interim-transcript prefetch, gate and memory
+        state = VoiceSessionState(ctx, self._retrieve_context)
+        
+        def on_prompt_changed(prompt: str, version: int):
+            """Apply a prompt updated through the API to the running session."""
+            if state.agent is not None:
+                logger.info(f"Applying system prompt version {version} to {ctx.room.name}")
+                state.turns.spawn(state.agent.update_instructions(RAGAgent.build_instructions(prompt)))
+        
+        # Latency trace of the latest turn; it stays open until the next
+        # final transcript so speech events can still be marked on it
+        turn_trace: Optional[Trace] = None
+        
+        async def close_session_tasks():
+            state.speculative.cancel()
+            await state.turns.shutdown()
+            tracer.finish(turn_trace)
+            
+            # Export this session's counts without waiting for the next interval
+            writer = start_textfile_writer("agent")
+            if writer is not None:
+                writer.write()
+            logger.info(f"Speculative retrieval stats for {ctx.room.name}: {state.speculative.report()}")
+            logger.info(f"Turn stats for {ctx.room.name}: {state.turns.stats}")
+            if RETRIEVAL_GATE_ENABLED:
+                logger.info(f"Retrieval gate stats for {ctx.room.name}: {state.gate.report()}")
+            if state.memory is not None:
+                logger.info(f"Conversation memory stats for {ctx.room.name}: {state.memory.report()}")
+            if state.agent is not None:
+                logger.info(f"Context injection stats for {ctx.room.name}: {state.agent.stats}")
+            self.config_manager.remove_listener(on_prompt_changed)
+            if state.payload_stats["turns"]:
+                logger.info(
+                    f"rag_sources bytes per turn for {ctx.room.name}: "
+                    f"{state.payload_stats['published_bytes'] / state.payload_stats['turns']:.0f} published vs "
+                    f"{state.payload_stats['full_payload_bytes'] / state.payload_stats['turns']:.0f} full"
+                )
+        
+        ctx.add_shutdown_callback(close_session_tasks)
+        
         # Handle transcription events for RAG
         @session.on("user_input_transcribed")
         def on_user_input_transcribed(event):
@@ -85,97 +475,117 @@ class LiveKitAgentService:
             Args:
                 event: UserInputTranscribedEvent containing transcript and metadata
             """
-            async def handle_transcription():
-                # Only process final transcriptions
-                if not event.is_final:
-                    return
-                    
-                user_text = event.transcript
-                
-                # Skip empty or whitespace-only transcripts
-                if not user_text or not user_text.strip():
-                    return
-                    
-                logger.info(f"User said: {user_text}")
-
-                # Publish user transcript
-                await self._publish_data(ctx, {
-                    "type": "user_transcript",
-                    "text": user_text
-                })
-                
-                # Retrieve relevant context from documents
-                context_chunks = await self.retrieval_service.retrieve_context(
-                    query=user_text,
-                    top_k=RAG_TOP_K
-                )
-                
-                # Build per-turn RAG context message
-                if context_chunks:
-                    context_str = "\n\n".join([
-                        f"[Source: {chunk['document_name']}]\n{chunk['text']}"
-                        for chunk in context_chunks
-                    ])
-                    rag_message = (
-                        f"{self._rag_context_prefix}\n"
-                        f"RELEVANT CONTEXT FROM DOCUMENTS:\n{context_str}\n\n"
-                        f"USER QUESTION: {user_text}\n"
-                        f"Use the context above to answer the question. "
-                        f"If the context doesn't contain relevant information, say so clearly."
-                    )
-                    logger.info(f"Retrieved {len(context_chunks)} relevant chunks")
-
-                    # Publish RAG sources for frontend panel
-                    await self._publish_data(ctx, {
-                        "type": "rag_sources",
-                        "sources": [
-                            {
-                                "document_name": chunk["document_name"],
-                                "text": chunk["text"],
-                                "distance": chunk.get("distance")
-                            }
-                            for chunk in context_chunks
-                        ]
-                    })
-                    
-                    # NOTE: For Realtime API, context injection works differently
-                    # The model uses the system instructions instead of per-turn context injection
-                    # RAG context is displayed in the frontend panel for user reference
-                else:
-                    logger.info("No relevant documents found")
+            nonlocal turn_trace
+            
+            # Interim transcripts only feed the speculative prefetch
+            # (never for text the gate would not retrieve for)
+            if not event.is_final:
+                if (
+                    SPECULATIVE_RETRIEVAL_ENABLED
+                    and event.transcript
+                    and (not RETRIEVAL_GATE_ENABLED or state.gate.decide(event.transcript) == GATE_RETRIEVE)
+                ):
+                    state.speculative.on_interim(event.transcript)
+                return
+            
+            user_text = event.transcript
+            
+            # Skip empty or whitespace-only transcripts
+            if not user_text or not user_text.strip():
+                return
+            
+            logger.info(f"User said: {user_text}")
+            
+            # Start this turn's latency trace (the previous turn is complete)
+            tracer.finish(turn_trace)
+            turn_trace = tracer.start("voice_turn", room=ctx.room.name)
+            if turn_trace is not None:
+                turn_trace.mark("transcript_final")
+            trace = turn_trace
             
-            # Use asyncio.create_task to run the async handler
-            import asyncio
-            asyncio.create_task(handle_transcription())
+            # Publish user transcript (never cancelled by later turns)
+            state.turns.spawn(self._publish_data(ctx, {
+                "type": "user_transcript",
+                "text": user_text
+            }))
+            
+            # A new turn cancels the handlers of earlier ones
+            state.turns.start_turn(
+                lambda turn_id: self._handle_turn(state, turn_id, user_text, trace)
+            )
 
+        first_audio_logged = False
+        
+        @session.on("agent_state_changed")
+        def on_agent_state_changed(event):
+            """Report job-accept-to-first-audio latency once per job."""
+            nonlocal first_audio_logged
+            if event.new_state == "speaking" and turn_trace is not None:
+                turn_trace.mark("agent_speaking")
+            if event.new_state == "speaking" and not first_audio_logged:
+                first_audio_logged = True
+                logger.info(
+                    f"Job accept to first audio: {(time.perf_counter() - job_accepted_at) * 1000:.0f} ms "
+                    f"(prewarmed process: {prewarmed})"
+                )
+        
         @session.on("speech_created")
         def on_speech_created(event):
             """Called when agent speech is created."""
             # The speech_created event is emitted when agent starts speaking
             # We'll log this but the actual speech text comes from the TTS stream
             logger.info("Agent is generating speech")
+            if turn_trace is not None:
+                turn_trace.mark("speech_created")
             
 
         @session.on("error")
         def on_session_error(err: Exception):
             logger.error(f"Agent session error: {err}")
         
-        # Create the agent with system instructions
-        agent = Agent(
-            instructions=system_prompt
+        # Create the agent with system instructions; per-turn context is
+        # injected into its chat context, or fetched by its search tool
+        agent = RAGAgent(
+            instructions=RAGAgent.build_instructions(system_prompt),
+            retrieve=lambda query: self._retrieve_context(query, state.memory)
         )
+        state.agent = agent
+        
+        self.config_manager.add_listener(on_prompt_changed)
         
         # Start the session with both room and agent
         logger.info("Starting agent session...")
         await session.start(room=ctx.room, agent=agent)
 
 
-# Create service function for LiveKit worker
+# Create service functions for LiveKit worker
+def livekit_agent_prewarm(proc: JobProcess):
+    """
+    Prewarm function for LiveKit worker processes
+    
+    Runs once per process before it accepts jobs: builds the shared agent
+    service (importing the retrieval stack opens ChromaDB and the OpenAI
+    clients) and loads the vector index into memory.
+    """
+    started_at = time.perf_counter()
+    start_textfile_writer("agent")
+    agent_service = LiveKitAgentService()
+    agent_service.warm_index()
+    proc.userdata["agent_service"] = agent_service
+    proc.userdata["prewarmed"] = True
+    logger.info(f"Agent process prewarmed in {(time.perf_counter() - started_at) * 1000:.0f} ms")
+
+
 async def livekit_agent_entrypoint(ctx: JobContext):
     """
     Entrypoint function for LiveKit worker
     
     This is the function that LiveKit will call when a new room is created
     """
-    agent_service = LiveKitAgentService()
+    # Reuse the process-wide service built during prewarm
+    agent_service = ctx.proc.userdata.get("agent_service")
+    if agent_service is None:
+        start_textfile_writer("agent")
+        agent_service = LiveKitAgentService()
+        ctx.proc.userdata["agent_service"] = agent_service
     await agent_service.entrypoint(ctx)
@@ -1,31 +1,84 @@
 """
 LLM service for generating responses with RAG
 """
-from typing import List, Dict, Optional
-from openai import AsyncOpenAI
+import asyncio
+import time
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from app.config.settings import settings
 from app.config.constants import LLM_MODEL
 from app.config.prompt import RAG_SYSTEM_PROMPT
+from app.services.completion_cache import completion_cache
+from app.utils.token_budget import ContextPacker
+from app.utils.lazy import LazyProxy
 from app.utils.logger import get_logger
+from app.utils.metrics import LLM_SECONDS, LLM_TOKENS
+from app.utils.tracing import mark
 
 logger = get_logger(__name__)
 
+_COMPLETE_SECONDS = LLM_SECONDS.labels("complete")
+_STREAM_SECONDS = LLM_SECONDS.labels("stream")
+_PROMPT_TOKENS = LLM_TOKENS.labels("prompt")
+_COMPLETION_TOKENS = LLM_TOKENS.labels("completion")
+
 
 class LLMService:
     """Service for LLM-powered responses with RAG integration"""
     
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        # Imported here: the openai package is slow to import
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
         self.model = LLM_MODEL
+        self.context_packer = ContextPacker()
+        self.completion_cache = completion_cache
     
-    async def generate_response(
+    def _cache_key(self, user_query: str, messages: List[Dict], packed_chunks: List[Dict]) -> Optional[str]:
+        """Completion cache key for a request (None when caching is disabled)"""
+        if self.completion_cache is None:
+            return None
+        return self.completion_cache.make_key(
+            model=self.model,
+            system_prompt=messages[0]["content"],
+            chunk_ids=[chunk.get("chunk_id") for chunk in packed_chunks],
+            query=user_query
+        )
+    
+    async def _cache_lookup(self, key: Optional[str]) -> Optional[Dict]:
+        """Cached completion for a key (SQLite read, off the event loop)"""
+        if key is None:
+            return None
+        return await asyncio.to_thread(self.completion_cache.get, key)
+    
+    async def _cache_store(self, key: Optional[str], response: Dict, packed_chunks: List[Dict]):
+        """Store a completion, tagged with the documents it used (off the event loop)"""
+        if key is None:
+            return
+        try:
+            await asyncio.to_thread(
+                self.completion_cache.set,
+                key,
+                response,
+                document_ids=[chunk["document_id"] for chunk in packed_chunks if chunk.get("document_id")]
+            )
+        except Exception as e:
+            logger.error(f"Failed to cache completion: {e}")
+    
+    @staticmethod
+    def _record_usage(usage):
+        """Token counts of a completion (when the API reported them)"""
+        if usage is not None:
+            _PROMPT_TOKENS.observe(usage.prompt_tokens)
+            _COMPLETION_TOKENS.observe(usage.completion_tokens)
+    
+    def build_messages(
         self,
         user_query: str,
         context_chunks: List[Dict],
         system_prompt: Optional[str] = None
-    ) -> str:
+    ) -> Tuple[List[Dict], List[Dict], int]:
         """
-        Generate response using GPT-4o-mini with RAG context
+        Build chat messages with token-budgeted RAG context
         
         Args:
             user_query: User's question
@@ -33,18 +86,19 @@ class LLMService:
             system_prompt: Optional custom system prompt
         
         Returns:
-            Generated response text
+            Tuple of (messages, packed chunks, estimated context tokens)
         """
-        logger.info(f"Generating response for query: {user_query[:100]}...")
-        
         # Use provided prompt or default
         prompt = system_prompt or RAG_SYSTEM_PROMPT
         
-        # Build context string from retrieved chunks
-        if context_chunks:
+        # Fit retrieved chunks into the context token budget
+        packed_chunks, context_tokens = self.context_packer.pack(context_chunks)
+        
+        # Build context string from packed chunks
+        if packed_chunks:
             context_str = "\n\n".join([
-                f"[Document: {chunk['document_name']}]\n{chunk['text']}"
-                for chunk in context_chunks
+                self.context_packer.format_chunk(chunk)
+                for chunk in packed_chunks
             ])
             
             user_message = f"""Context from uploaded documents:
@@ -57,25 +111,166 @@ Please answer the question based on the context above. If the context doesn't co
         else:
             user_message = f"{user_query}\n\nNote: No relevant documents were found in the knowledge base."
         
+        logger.info(
+            f"Packed {len(packed_chunks)}/{len(context_chunks)} chunks "
+            f"into ~{context_tokens} context tokens (budget {self.context_packer.token_budget})"
+        )
+        
         messages = [
             {"role": "system", "content": prompt},
             {"role": "user", "content": user_message}
         ]
+        return messages, packed_chunks, context_tokens
+    
+    async def generate_response(
+        self,
+        user_query: str,
+        context_chunks: List[Dict],
+        system_prompt: Optional[str] = None
+    ) -> Dict:
+        """
+        Generate response using GPT-4o-mini with RAG context
+        
+        Args:
+            user_query: User's question
+            context_chunks: Retrieved chunks from RAG
+            system_prompt: Optional custom system prompt
+        
+        Returns:
+            Dict with the answer text, the packed chunks (the ones the model
+            saw, for citing sources), their count, context tokens and whether
+            it was served from the completion cache
+        """
+        logger.info(f"Generating response for query: {user_query[:100]}...")
+        
+        messages, packed_chunks, context_tokens = self.build_messages(
+            user_query=user_query,
+            context_chunks=context_chunks,
+            system_prompt=system_prompt
+        )
+        
+        cache_key = self._cache_key(user_query, messages, packed_chunks)
+        cached = await self._cache_lookup(cache_key)
+        if cached is not None:
+            mark("completion_cache_hit")
+            logger.info("Serving response from completion cache")
+            return {**cached, "packed_chunks": packed_chunks, "cached": True}
         
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages
-            )
+            mark("llm_start")
+            with _COMPLETE_SECONDS.time():
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages
+                )
+            mark("llm_end")
+            self._record_usage(response.usage)
             
             answer = response.choices[0].message.content
             logger.info(f"Generated response ({len(answer)} characters)")
-            return answer
+            result = {
+                "answer": answer,
+                "chunks_packed": len(packed_chunks),
+                "context_tokens": context_tokens
+            }
+            await self._cache_store(cache_key, result, packed_chunks)
+            return {**result, "packed_chunks": packed_chunks, "cached": False}
             
         except Exception as e:
             logger.error(f"Error generating LLM response: {e}")
             raise
+    
+    async def stream_response(
+        self,
+        user_query: str,
+        context_chunks: List[Dict],
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Stream a response with RAG context, token by token
+        
+        Args:
+            user_query: User's question
+            context_chunks: Retrieved chunks from RAG
+            system_prompt: Optional custom system prompt
+        
+        Yields:
+            First {"type": "context", "packed_chunks": [...]} with the chunks
+            the model sees (before any LLM call), then {"type": "token",
+            "text": ...} for each content delta, then one {"type": "usage", ...}
+            with token usage and context size
+        """
+        logger.info(f"Streaming response for query: {user_query[:100]}...")
+        
+        messages, packed_chunks, context_tokens = self.build_messages(
+            user_query=user_query,
+            context_chunks=context_chunks,
+            system_prompt=system_prompt
+        )
+        yield {"type": "context", "packed_chunks": packed_chunks}
+        
+        cache_key = self._cache_key(user_query, messages, packed_chunks)
+        cached = await self._cache_lookup(cache_key)
+        if cached is not None:
+            mark("completion_cache_hit")
+            logger.info("Serving streamed response from completion cache")
+            yield {"type": "token", "text": cached["answer"]}
+            yield {
+                "type": "usage",
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "chunks_packed": cached["chunks_packed"],
+                "context_tokens": cached["context_tokens"],
+                "cached": True
+            }
+            return
+        
+        try:
+            mark("llm_start")
+            started_at = time.perf_counter()
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            
+            usage = None
+            parts = []
+            async for chunk in stream:
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not parts:
+                            mark("llm_first_token")
+                        parts.append(delta)
+                        yield {"type": "token", "text": delta}
+                if chunk.usage:
+                    usage = chunk.usage
+            
+            mark("llm_end")
+            _STREAM_SECONDS.observe(time.perf_counter() - started_at)
+            self._record_usage(usage)
+            answer = "".join(parts)
+            logger.info(f"Streamed response ({len(answer)} characters)")
+            await self._cache_store(cache_key, {
+                "answer": answer,
+                "chunks_packed": len(packed_chunks),
+                "context_tokens": context_tokens
+            }, packed_chunks)
+            yield {
+                "type": "usage",
+                "prompt_tokens": usage.prompt_tokens if usage else None,
+                "completion_tokens": usage.completion_tokens if usage else None,
+                "chunks_packed": len(packed_chunks),
+                "context_tokens": context_tokens,
+                "cached": False
+            }
+            
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {e}")
+            raise
 
 
-# Create global instance
-llm_service = LLMService()
+# Create global instance (created on first use)
+llm_service: LLMService = LazyProxy(LLMService, "llm_service")
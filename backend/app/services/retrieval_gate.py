@@ -0,0 +1,173 @@
+"""
+Local gate that decides whether a voice turn needs document retrieval
+"""
+import math
+import re
+from typing import Dict, List, Optional
+from app.config.constants import (
+    RETRIEVAL_GATE_STOP_PHRASES,
+    RETRIEVAL_GATE_FOLLOWUP_WORDS,
+    RETRIEVAL_GATE_MAX_FOLLOWUP_WORDS,
+    RETRIEVAL_GATE_WEIGHTS,
+    RETRIEVAL_GATE_BIAS,
+    RETRIEVAL_GATE_THRESHOLD
+)
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Decisions
+GATE_RETRIEVE = "retrieve"
+GATE_SKIP = "skip"
+GATE_REUSE = "reuse"
+
+QUESTION_WORDS = {
+    "what", "who", "where", "when", "which", "why", "how", "does", "do", "is", "are", "can", "could", "should",
+    "tell", "explain", "describe", "list", "show", "give", "compare"
+}
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "but", "if", "of", "to", "in", "on", "at", "for", "with",
+    "is", "are", "was", "were", "be", "been", "am", "do", "does", "did", "i", "you", "we",
+    "me", "my", "your", "our", "it", "that", "this", "they", "them", "so", "just", "please",
+    "can", "could", "would", "will", "about", "tell", "say", "what", "how", "why", "more",
+    "yes", "no", "ok", "okay", "oh", "um", "uh", "well", "like", "know", "think", "there",
+    "good", "great", "fine", "sure", "sounds", "really", "basically", "yeah", "alright", "got",
+    "see", "go", "get", "want", "need", "mean", "give", "show", "thing", "things", "some", "any",
+    "thanks", "thank", "hello", "hi", "hey", "again", "now", "then", "too", "very", "much", "lot"
+}
+
+
+class RetrievalGate:
+    """
+    Per-session decision of whether a final transcript is worth retrieving for
+    
+    1. Stop phrases ("okay", "thanks", "can you repeat that") skip retrieval.
+    2. Short follow-ups leaning on the previous turn ("why is that?",
+       "tell me more") reuse the previous turn's context.
+    3. Everything else is scored by a small logistic classifier over cheap
+       text features; low scores skip retrieval.
+    
+    Each skipped or reused turn saves one embedding call and one vector search.
+    """
+    
+    def __init__(
+        self,
+        weights: Dict[str, float] = RETRIEVAL_GATE_WEIGHTS,
+        bias: float = RETRIEVAL_GATE_BIAS,
+        threshold: float = RETRIEVAL_GATE_THRESHOLD
+    ):
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+        self._stop_phrases = {self._normalize(phrase) for phrase in RETRIEVAL_GATE_STOP_PHRASES}
+        self._followup_words = set(RETRIEVAL_GATE_FOLLOWUP_WORDS)
+        self._previous_context: Optional[List[Dict]] = None
+        self.stats = {
+            "final_turns": 0,
+            "retrieved": 0,
+            "skipped": 0,
+            "reused": 0
+        }
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Lowercase words only, single-spaced"""
+        return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+    
+    def _content_words(self, words: List[str]) -> List[str]:
+        """Words that carry topic (neither stop words nor follow-up words)"""
+        return [
+            word for word in words
+            if len(word) > 1 and word not in STOP_WORDS and word not in self._followup_words
+        ]
+    
+    def features(self, text: str) -> Dict[str, float]:
+        """
+        Cheap text features for the classifier
+        
+        Args:
+            text: Transcript text
+        
+        Returns:
+            Feature values keyed like RETRIEVAL_GATE_WEIGHTS
+        """
+        words = self._normalize(text).split()
+        content_words = self._content_words(words)
+        raw_words = text.split()
+        return {
+            "content_words": float(min(len(content_words), 4)),
+            "question": float(bool(words) and (words[0] in QUESTION_WORDS or text.rstrip().endswith("?"))),
+            "entity": float(
+                any(any(c.isdigit() for c in word) for word in raw_words)
+                or any(word[:1].isupper() for word in raw_words[1:])
+            ),
+            "stopword_ratio": (len(words) - len(content_words)) / len(words) if words else 1.0,
+            "followup": float(any(word in self._followup_words for word in words)),
+        }
+    
+    def score(self, text: str) -> float:
+        """Probability-like score that the text needs retrieval (0.0 - 1.0)"""
+        features = self.features(text)
+        z = self.bias + sum(self.weights.get(name, 0.0) * value for name, value in features.items())
+        return 1.0 / (1.0 + math.exp(-z))
+    
+    def decide(self, text: str) -> str:
+        """
+        Classify a transcript without recording it
+        
+        Args:
+            text: Transcript text
+        
+        Returns:
+            GATE_RETRIEVE, GATE_SKIP or GATE_REUSE
+        """
+        normalized = self._normalize(text)
+        if not normalized or normalized in self._stop_phrases:
+            return GATE_SKIP
+        
+        words = normalized.split()
+        is_followup = (
+            len(words) <= RETRIEVAL_GATE_MAX_FOLLOWUP_WORDS
+            and any(word in self._followup_words for word in words)
+            and not self._content_words(words)
+        )
+        if is_followup and self._previous_context:
+            return GATE_REUSE
+        
+        return GATE_RETRIEVE if self.score(text) >= self.threshold else GATE_SKIP
+    
+    def on_final(self, text: str) -> str:
+        """
+        Classify a final transcript and count the decision
+        
+        Args:
+            text: Final transcript text
+        
+        Returns:
+            GATE_RETRIEVE, GATE_SKIP or GATE_REUSE
+        """
+        decision = self.decide(text)
+        self.stats["final_turns"] += 1
+        self.stats[{GATE_RETRIEVE: "retrieved", GATE_SKIP: "skipped", GATE_REUSE: "reused"}[decision]] += 1
+        logger.info(f"Retrieval gate: {decision} for '{text[:60]}'")
+        return decision
+    
+    @property
+    def previous_context(self) -> List[Dict]:
+        """Context of the last turn that retrieved"""
+        return self._previous_context or []
+    
+    def remember(self, context_chunks: List[Dict]):
+        """Keep a retrieving turn's context for follow-ups"""
+        self._previous_context = context_chunks
+    
+    def report(self) -> Dict:
+        """Decision counters, skip rate and API calls saved"""
+        finals = self.stats["final_turns"]
+        saved = self.stats["skipped"] + self.stats["reused"]
+        return {
+            **self.stats,
+            "skip_rate": saved / finals if finals else 0.0,
+            "embedding_calls_saved": saved,
+            "vector_searches_saved": saved
+        }
@@ -1,14 +1,32 @@
 """
 RAG retrieval service for querying document knowledge base
 """
-from typing import List, Dict
+import asyncio
+import weakref
+from collections import OrderedDict
+from typing import List, Dict, Optional
 from app.services.embedding_service import embedding_service
+from app.services.conversation_memory import SessionChunkCache
 from app.repositories.vector_repository import vector_repository
-from app.config.constants import RAG_TOP_K
+from app.config.config_manager import config_manager
+from app.config.constants import (
+    RAG_TOP_K,
+    RAG_MIN_SIMILARITY,
+    RAG_RELEVANCE_MARGIN,
+    RAG_TWO_STAGE_RETRIEVAL,
+    RAG_ROUTE_TOP_DOCUMENTS,
+    RETRIEVAL_CACHE_SIZE
+)
 from app.utils.logger import get_logger
+from app.utils.metrics import CACHE_REQUESTS
+from app.utils.tracing import mark
 
 logger = get_logger(__name__)
 
+# Recent-result cache consulted when the embedding deadline is missed
+_FALLBACK_HITS = CACHE_REQUESTS.labels("retrieval_fallback", "hit")
+_FALLBACK_MISSES = CACHE_REQUESTS.labels("retrieval_fallback", "miss")
+
 
 class RetrievalService:
     """Service for retrieving relevant context from ChromaDB"""
@@ -16,11 +34,20 @@ class RetrievalService:
     def __init__(self):
         self.embedding_service = embedding_service
         self.vector_repository = vector_repository
+        # Recent query results, used as a fallback when the embedding deadline is missed
+        self._result_cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        # Session chunk caches seen by this process, for document changes
+        self._chunk_caches: "weakref.WeakSet[SessionChunkCache]" = weakref.WeakSet()
+        config_manager.add_document_listener(self._drop_document)
     
     async def retrieve_context(
         self,
         query: str,
-        top_k: int = RAG_TOP_K
+        top_k: int = RAG_TOP_K,
+        latency_slo: bool = False,
+        adaptive: bool = False,
+        chunk_cache: Optional[SessionChunkCache] = None,
+        two_stage: bool = RAG_TWO_STAGE_RETRIEVAL
     ) -> List[Dict]:
         """
         Retrieve relevant chunks for a query
@@ -28,40 +55,275 @@ class RetrievalService:
         Args:
             query: User query text
             top_k: Number of chunks to retrieve
+            latency_slo: Bound the query embedding by a deadline (with hedging)
+                and degrade to cached or lexical results instead of waiting
+            adaptive: Keep only chunks within the relevance margin of the best
+                hit, and nothing at all if the best hit is below the threshold
+            chunk_cache: Session chunk cache; when given, the vector query
+                returns only ids and distances and just the uncached chunks
+                are fetched
+            two_stage: Route the query to the RAG_ROUTE_TOP_DOCUMENTS closest
+                documents first and search only their chunks
         
         Returns:
-            List of retrieved chunks with metadata
+            List of retrieved chunks with metadata, `distance` and `similarity`
         """
         logger.info(f"Retrieving context for query: {query[:100]}...")
         
         try:
             # 1. Generate query embedding
-            query_embeddings = await self.embedding_service.generate_embeddings([query])
-            
-            # 2. Query ChromaDB
-            results = self.vector_repository.query(
-                query_embeddings=query_embeddings,
-                n_results=top_k
-            )
+            mark("embedding_start")
+            if latency_slo:
+                query_embeddings = await self.embedding_service.generate_embeddings_with_deadline([query])
+                if query_embeddings is None:
+                    mark("embedding_deadline_missed")
+                    return await self._degraded_context(query, top_k, adaptive)
+            else:
+                query_embeddings = await self.embedding_service.generate_embeddings([query])
+            mark("embedding_end")
             
-            # 3. Format results
-            retrieved_chunks = []
+            # 2. Query ChromaDB (blocking store calls run off the event loop)
+            where = await self._route(query_embeddings) if two_stage else None
+            if chunk_cache is None:
+                results = await asyncio.to_thread(
+                    self.vector_repository.query,
+                    query_embeddings=query_embeddings,
+                    n_results=top_k,
+                    where=where
+                )
+                mark("chroma_query")
+                
+                # 3. Format results
+                retrieved_chunks = self._format_results(results)
+            else:
+                self._chunk_caches.add(chunk_cache)
+                results = await asyncio.to_thread(
+                    self.vector_repository.query,
+                    query_embeddings=query_embeddings,
+                    n_results=top_k,
+                    include=["distances"],
+                    where=where
+                )
+                mark("chroma_query")
+                
+                # 3. Fill in chunk text from the session cache, fetching the rest
+                retrieved_chunks = await self._resolve_chunks(results, chunk_cache)
+            self._cache_results(query, retrieved_chunks)
             
-            if results['ids'] and len(results['ids'][0]) > 0:
-                for i in range(len(results['ids'][0])):
-
-                    retrieved_chunks.append({
-                        "text": results['documents'][0][i],
-                        "document_name": results['metadatas'][0][i]['document_name'],
-                        "document_id": results['metadatas'][0][i]['document_id'],
-                        "chunk_index": results['metadatas'][0][i]['chunk_index'],
-                    })
+            # 4. Adaptive top-k: drop weak hits
+            if adaptive:
+                retrieved_chunks = self.filter_by_relevance(retrieved_chunks)
             
             logger.info(f"Retrieved {len(retrieved_chunks)} chunks")
             return retrieved_chunks
             
         except Exception as e:
             logger.error(f"Error retrieving context: {e}")
+            if latency_slo:
+                return await self._degraded_context(query, top_k, adaptive)
+            return []
+    
+    def invalidate_document(self, document_id: str):
+        """
+        Drop cached results and session chunks of a deleted or re-ingested document
+        
+        The change is recorded in the shared config store, which pushes it
+        to every process following it (API and agent workers, this one
+        included), so each drops the entries of its own caches.
+        """
+        config_manager.record_document_change(document_id)
+    
+    def _drop_document(self, document_id: Optional[str]) -> int:
+        """
+        Drop this process's cached entries of a changed document
+        
+        Args:
+            document_id: Changed document (None: any document may have changed)
+        
+        Returns:
+            Number of cached query results dropped
+        """
+        stale = [
+            key for key, chunks in self._result_cache.items()
+            if document_id is None or any(chunk["document_id"] == document_id for chunk in chunks)
+        ]
+        for key in stale:
+            del self._result_cache[key]
+        for chunk_cache in list(self._chunk_caches):
+            chunk_cache.invalidate_document(document_id)
+        if stale:
+            logger.info(f"Dropped {len(stale)} cached retrieval results for document {document_id or '(all)'}")
+        return len(stale)
+    
+    async def _route(self, query_embeddings: List[List[float]]) -> Optional[Dict]:
+        """
+        First stage of two-stage retrieval
+        
+        Returns:
+            Filter restricting the chunk search to the routed documents, or
+            None (search everything) when no document has summary vectors
+        """
+        routed = await asyncio.to_thread(
+            self.vector_repository.route_documents, query_embeddings, RAG_ROUTE_TOP_DOCUMENTS
+        )
+        document_ids = routed[0]
+        mark("document_routing")
+        if not document_ids:
+            return None
+        return {"document_id": {"$in": document_ids}}
+    
+    def _format_results(self, results: Dict) -> List[Dict]:
+        """Convert ChromaDB query results into chunk dicts"""
+        retrieved_chunks = []
+        
+        if results['ids'] and len(results['ids'][0]) > 0:
+            distances = (results.get('distances') or [[]])[0]
+            for i in range(len(results['ids'][0])):
+                # Cosine distance from ChromaDB; lexical fallback results have none
+                distance = distances[i] if i < len(distances) else None
+                retrieved_chunks.append({
+                    "chunk_id": results['ids'][0][i],
+                    "text": results['documents'][0][i],
+                    "document_name": results['metadatas'][0][i]['document_name'],
+                    "document_id": results['metadatas'][0][i]['document_id'],
+                    "chunk_index": results['metadatas'][0][i]['chunk_index'],
+                    "distance": distance,
+                    "similarity": 1.0 - distance if distance is not None else None,
+                })
+        
+        return retrieved_chunks
+    
+    async def _resolve_chunks(self, results: Dict, chunk_cache: SessionChunkCache) -> List[Dict]:
+        """Build chunk dicts for an ids-and-distances query result"""
+        chunk_ids = results['ids'][0] if results['ids'] else []
+        distances = (results.get('distances') or [[]])[0]
+        cached, missing = chunk_cache.lookup(chunk_ids)
+        
+        if missing:
+            fetched = await asyncio.to_thread(
+                self.vector_repository.get, ids=missing, include=["documents", "metadatas"]
+            )
+            fetched_chunks = [
+                {
+                    "chunk_id": chunk_id,
+                    "text": text,
+                    "document_name": metadata['document_name'],
+                    "document_id": metadata['document_id'],
+                    "chunk_index": metadata['chunk_index'],
+                }
+                for chunk_id, text, metadata in zip(fetched['ids'], fetched['documents'], fetched['metadatas'])
+            ]
+            chunk_cache.store(fetched_chunks)
+            cached.update({chunk["chunk_id"]: chunk for chunk in fetched_chunks})
+            mark("chunk_fetch")
+        
+        logger.info(f"Session chunk cache: {len(chunk_ids) - len(missing)} hits, {len(missing)} fetched")
+        return [
+            {**cached[chunk_id], "distance": distance, "similarity": 1.0 - distance}
+            for chunk_id, distance in zip(chunk_ids, distances)
+            if chunk_id in cached
+        ]
+    
+    async def _still_stored(self, chunks: List[Dict]) -> List[Dict]:
+        """
+        Cached chunks that are still in the store
+        
+        The document may have been deleted through another process since the
+        result was cached. If the store cannot be reached the chunks are served
+        unchecked (this is the degraded path).
+        """
+        if not chunks:
+            return chunks
+        try:
+            stored = set((await asyncio.to_thread(
+                self.vector_repository.get,
+                ids=[chunk["chunk_id"] for chunk in chunks],
+                include=["metadatas"]
+            ))["ids"])
+        except Exception as e:
+            logger.warning(f"Could not check cached chunks against the store: {e}")
+            return chunks
+        return [chunk for chunk in chunks if chunk["chunk_id"] in stored]
+    
+    @staticmethod
+    def filter_by_relevance(
+        chunks: List[Dict],
+        min_similarity: float = RAG_MIN_SIMILARITY,
+        relevance_margin: float = RAG_RELEVANCE_MARGIN
+    ) -> List[Dict]:
+        """
+        Keep only chunks that are relevant enough to send to the model
+        
+        Args:
+            chunks: Retrieved chunks, best first
+            min_similarity: Similarity the best hit must reach
+            relevance_margin: Maximum similarity gap to the best hit
+        
+        Returns:
+            Filtered chunks (empty when nothing clears the bar)
+        """
+        scores = [chunk["similarity"] for chunk in chunks if chunk.get("similarity") is not None]
+        if not scores:
+            # Unscored (lexical) results cannot be thresholded
+            return chunks
+        
+        best = max(scores)
+        if best < min_similarity:
+            logger.info(f"Best similarity {best:.3f} below threshold {min_similarity}; dropping context")
+            return []
+        
+        cutoff = max(min_similarity, best - relevance_margin)
+        kept = [
+            chunk for chunk in chunks
+            if chunk.get("similarity") is not None and chunk["similarity"] >= cutoff
+        ]
+        logger.info(f"Kept {len(kept)}/{len(chunks)} chunks (best {best:.3f}, cutoff {cutoff:.3f})")
+        return kept
+    
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        """Normalize a query for the result cache"""
+        return " ".join(query.lower().split())
+    
+    def _cache_results(self, query: str, chunks: List[Dict]):
+        """Remember results for a query, evicting the least recently used entry"""
+        key = self._cache_key(query)
+        self._result_cache[key] = chunks
+        self._result_cache.move_to_end(key)
+        while len(self._result_cache) > RETRIEVAL_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+    
+    async def _degraded_context(self, query: str, top_k: int, adaptive: bool = False) -> List[Dict]:
+        """
+        Best-effort context when the query embedding is unavailable
+        
+        Serves a cached result for the same query if there is one, otherwise
+        falls back to lexical search over the stored chunks.
+        
+        Args:
+            query: User query text
+            top_k: Number of chunks to retrieve
+            adaptive: Apply the relevance filter to cached results
+        
+        Returns:
+            List of retrieved chunks (possibly empty)
+        """
+        cached: Optional[List[Dict]] = self._result_cache.get(self._cache_key(query))
+        if cached is not None:
+            _FALLBACK_HITS.inc()
+            cached = await self._still_stored(cached[:top_k])
+            logger.info(f"Serving {len(cached)} cached chunks (embedding deadline missed)")
+            return self.filter_by_relevance(cached) if adaptive else cached
+        
+        _FALLBACK_MISSES.inc()
+        try:
+            results = await asyncio.to_thread(self.vector_repository.lexical_search, query=query, n_results=top_k)
+            retrieved_chunks = self._format_results(results)
+            mark("lexical_fallback")
+            logger.info(f"Lexical fallback retrieved {len(retrieved_chunks)} chunks")
+            return retrieved_chunks
+        except Exception as e:
+            logger.error(f"Lexical fallback failed: {e}")
             return []
 
 
@@ -0,0 +1,136 @@
+"""
+Speculative retrieval on interim transcripts for voice turns
+"""
+import asyncio
+import re
+from difflib import SequenceMatcher
+from typing import Awaitable, Callable, Dict, List, Optional
+from app.config.constants import (
+    SPECULATIVE_MIN_WORDS,
+    SPECULATIVE_STABILITY_RATIO,
+    SPECULATIVE_REUSE_RATIO
+)
+from app.utils.logger import get_logger
+from app.utils.metrics import CACHE_REQUESTS
+from app.utils.tracing import mark
+
+logger = get_logger(__name__)
+
+_PREFETCH_HITS = CACHE_REQUESTS.labels("speculative_prefetch", "hit")
+_PREFETCH_MISSES = CACHE_REQUESTS.labels("speculative_prefetch", "miss")
+
+
+def transcript_similarity(a: str, b: str) -> float:
+    """Word-level similarity ratio between two transcripts (0.0 - 1.0), ignoring punctuation"""
+    return SequenceMatcher(None, re.findall(r"\w+", a.lower()), re.findall(r"\w+", b.lower())).ratio()
+
+
+class SpeculativeRetriever:
+    """
+    Per-session prefetch of RAG context while the user is still speaking
+    
+    Retrieval starts as soon as an interim transcript is stable (long enough
+    and barely changed since the previous interim). When the final transcript
+    arrives, the prefetch is reused if the final text is close to the text it
+    was started for; otherwise it is cancelled and a fresh query is run.
+    """
+    
+    def __init__(self, retrieve: Callable[[str], Awaitable[List[Dict]]]):
+        """
+        Args:
+            retrieve: Coroutine function that retrieves context for a query
+        """
+        self._retrieve = retrieve
+        self._last_interim = ""
+        self._prefetch_text: Optional[str] = None
+        self._prefetch_task: Optional[asyncio.Task] = None
+        self.stats = {
+            "interim_events": 0,
+            "prefetches_started": 0,
+            "final_turns": 0,
+            "reused": 0,
+            "discarded": 0
+        }
+    
+    def on_interim(self, text: str):
+        """
+        Handle an interim transcript, starting a prefetch once it is stable
+        
+        Args:
+            text: Interim transcript text
+        """
+        self.stats["interim_events"] += 1
+        text = text.strip()
+        
+        stable = transcript_similarity(text, self._last_interim) >= SPECULATIVE_STABILITY_RATIO
+        self._last_interim = text
+        if not stable or len(text.split()) < SPECULATIVE_MIN_WORDS:
+            return
+        
+        # The running prefetch already covers this text
+        if self._prefetch_text and transcript_similarity(text, self._prefetch_text) >= SPECULATIVE_REUSE_RATIO:
+            return
+        
+        self._cancel_prefetch()
+        self._prefetch_text = text
+        self._prefetch_task = asyncio.create_task(self._retrieve(text))
+        self.stats["prefetches_started"] += 1
+        logger.info(f"Speculative retrieval started for interim: {text[:100]}")
+    
+    async def resolve(self, final_text: str) -> List[Dict]:
+        """
+        Get context for a final transcript, reusing the prefetch when possible
+        
+        Args:
+            final_text: Final transcript text
+        
+        Returns:
+            Retrieved chunks
+        """
+        self.stats["final_turns"] += 1
+        task, prefetch_text = self._prefetch_task, self._prefetch_text
+        self._prefetch_task, self._prefetch_text = None, None
+        self._last_interim = ""
+        
+        if task is not None:
+            similarity = transcript_similarity(final_text, prefetch_text)
+            if similarity >= SPECULATIVE_REUSE_RATIO:
+                try:
+                    chunks = await task
+                    self.stats["reused"] += 1
+                    _PREFETCH_HITS.inc()
+                    mark("speculative_reused")
+                    logger.info(f"Reusing speculative retrieval (similarity {similarity:.2f})")
+                    return chunks
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Speculative retrieval failed, retrying with final text: {e}")
+            else:
+                task.cancel()
+            self.stats["discarded"] += 1
+            _PREFETCH_MISSES.inc()
+        
+        return await self._retrieve(final_text)
+    
+    def cancel(self):
+        """Cancel any in-flight prefetch (e.g. on session shutdown or a gated turn)"""
+        self._cancel_prefetch()
+        self._prefetch_text = None
+        self._last_interim = ""
+    
+    def report(self) -> Dict:
+        """Prefetch counters plus the share of final turns that reused a prefetch"""
+        finals = self.stats["final_turns"]
+        return {
+            **self.stats,
+            "reuse_rate": self.stats["reused"] / finals if finals else 0.0
+        }
+    
+    def _cancel_prefetch(self):
+        """Drop the current prefetch, cancelling it if still running"""
+        if self._prefetch_task is not None:
+            if not self._prefetch_task.done():
+                self._prefetch_task.cancel()
+            self.stats["discarded"] += 1
+        self._prefetch_task = None
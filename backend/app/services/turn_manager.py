@@ -0,0 +1,113 @@
+"""
+Turn-scoped task management for agent RAG handlers
+"""
+import asyncio
+from typing import Awaitable, Callable, Coroutine, Dict, Set
+from app.config.constants import MAX_CONCURRENT_TURNS_PER_ROOM
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TurnManager:
+    """
+    Per-session owner of turn handler tasks
+    
+    Each final transcript starts a new turn. Starting a turn cancels every
+    in-flight handler for earlier turns, a semaphore bounds how many
+    handlers run at once, and `is_current` lets handlers check that their
+    results are still the latest before publishing them.
+    """
+    
+    def __init__(self, max_concurrent_turns: int = MAX_CONCURRENT_TURNS_PER_ROOM):
+        self._semaphore = asyncio.Semaphore(max_concurrent_turns)
+        self._current_turn = 0
+        self._turn_tasks: Dict[int, asyncio.Task] = {}
+        self._background_tasks: Set[asyncio.Task] = set()
+        self.stats = {
+            "turns_started": 0,
+            "turns_cancelled": 0,
+            "stale_results_dropped": 0
+        }
+    
+    @property
+    def current_turn(self) -> int:
+        """ID of the latest turn"""
+        return self._current_turn
+    
+    def is_current(self, turn_id: int) -> bool:
+        """Check whether a turn is still the latest one"""
+        return turn_id == self._current_turn
+    
+    def drop_if_stale(self, turn_id: int) -> bool:
+        """
+        Check whether a turn's results should be dropped
+        
+        Args:
+            turn_id: Turn that produced the results
+        
+        Returns:
+            True (and counts it) if a newer turn has started
+        """
+        if self.is_current(turn_id):
+            return False
+        self.stats["stale_results_dropped"] += 1
+        logger.info(f"Dropping results of stale turn {turn_id} (current: {self._current_turn})")
+        return True
+    
+    def start_turn(self, handler: Callable[[int], Awaitable[None]]) -> int:
+        """
+        Start a new turn, cancelling the handlers of earlier turns
+        
+        Args:
+            handler: Coroutine function called with the new turn ID
+        
+        Returns:
+            The new turn ID
+        """
+        self._current_turn += 1
+        turn_id = self._current_turn
+        self.stats["turns_started"] += 1
+        
+        for stale_id, task in list(self._turn_tasks.items()):
+            self._turn_tasks.pop(stale_id, None)
+            if not task.done():
+                task.cancel()
+                self.stats["turns_cancelled"] += 1
+                logger.info(f"Cancelled in-flight handler for turn {stale_id}")
+        
+        task = asyncio.create_task(self._run_turn(turn_id, handler))
+        self._turn_tasks[turn_id] = task
+        task.add_done_callback(lambda _: self._turn_tasks.pop(turn_id, None))
+        return turn_id
+    
+    def spawn(self, coro: Coroutine):
+        """
+        Run a short background task that must not be cancelled by newer turns
+        
+        The task is still tracked, so it is not garbage-collected early and
+        is cancelled on shutdown.
+        """
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def shutdown(self):
+        """Cancel all turn and background tasks and wait for them to finish"""
+        tasks = list(self._turn_tasks.values()) + list(self._background_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _run_turn(self, turn_id: int, handler: Callable[[int], Awaitable[None]]):
+        """Run a turn handler under the concurrency limit"""
+        try:
+            async with self._semaphore:
+                # A newer turn may have started while this one was waiting
+                if not self.is_current(turn_id):
+                    return
+                await handler(turn_id)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error handling turn {turn_id}: {e}")
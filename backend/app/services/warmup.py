@@ -0,0 +1,112 @@
+"""
+API warmup: build the lazy singletons and warm connections after startup
+
+Importing the app no longer opens ChromaDB or creates OpenAI clients; the
+API starts serving immediately and this phase runs in the background. It
+does the expensive work once (slow imports, opening the collection,
+loading its index, the first HTTPS connection) so the first real request
+does not pay for it. /ready reports when it has finished, and stays
+unready while a required step keeps failing.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from app.config.constants import WARMUP_RETRY_SECONDS
+from app.services.embedding_service import embedding_service
+from app.services.ingestion_service import ingestion_service
+from app.services.llm_service import llm_service
+from app.repositories.vector_repository import vector_repository
+from app.utils.file_utils import FileProcessor
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class WarmupService:
+    """Runs the warmup steps once and tracks their outcome for /ready"""
+    
+    # Steps whose failure only costs first-request latency; any other failed
+    # step means the API cannot serve requests
+    OPTIONAL_STEPS = frozenset({"embedding_connection", "pdf_loader"})
+    
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Step name -> {"status": "ok" | "failed", "seconds": float, "error": str}
+        self.steps: Dict[str, Dict] = {}
+    
+    def _steps(self) -> List[Tuple[str, Callable[[], Awaitable[None]]]]:
+        """Steps in order; blocking work runs in a thread to keep the event loop free"""
+        return [
+            ("vector_repository", lambda: asyncio.to_thread(vector_repository.warm)),
+            ("embedding_service", lambda: asyncio.to_thread(embedding_service.lazy_resolve)),
+            ("embedding_connection", lambda: embedding_service.warm()),
+            ("llm_service", lambda: asyncio.to_thread(llm_service.lazy_resolve)),
+            ("ingestion_service", lambda: asyncio.to_thread(ingestion_service.lazy_resolve)),
+            ("pdf_loader", lambda: asyncio.to_thread(FileProcessor.pdf_loader_class))
+        ]
+    
+    @property
+    def failed_required_steps(self) -> List[str]:
+        """Required steps whose last attempt failed"""
+        return [
+            name for name, step in self.steps.items()
+            if step["status"] == "failed" and name not in self.OPTIONAL_STEPS
+        ]
+    
+    @property
+    def ready(self) -> bool:
+        """Whether warmup has finished and every required step succeeded"""
+        return self.finished_at is not None and not self.failed_required_steps
+    
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[None]]):
+        """Run one step and record its outcome"""
+        step_started_at = time.perf_counter()
+        try:
+            await step()
+            self.steps[name] = {"status": "ok"}
+        except Exception as e:
+            logger.warning(f"Warmup step {name} failed: {e}")
+            self.steps[name] = {"status": "failed", "error": str(e)}
+        self.steps[name]["seconds"] = round(time.perf_counter() - step_started_at, 4)
+    
+    async def run(self):
+        """
+        Run all steps, then retry failed required steps until they succeed
+        
+        A failed step is logged and recorded but does not stop the others:
+        the component is then created on first use, as without warmup.
+        Optional steps are not retried.
+        """
+        self.started_at = time.perf_counter()
+        steps = self._steps()
+        for name, step in steps:
+            await self._run_step(name, step)
+        self.finished_at = time.perf_counter()
+        logger.info(f"Warmup finished in {(self.finished_at - self.started_at) * 1000:.0f} ms")
+        
+        while self.failed_required_steps:
+            logger.warning(
+                f"Not ready: warmup steps {self.failed_required_steps} failed "
+                f"(retrying in {WARMUP_RETRY_SECONDS}s)"
+            )
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+            failed = set(self.failed_required_steps)
+            for name, step in steps:
+                if name in failed:
+                    await self._run_step(name, step)
+            if not self.failed_required_steps:
+                logger.info("Ready: failed warmup steps succeeded on retry")
+    
+    def status(self) -> Dict:
+        """Readiness summary for /ready"""
+        status = {"ready": self.ready, "steps": self.steps}
+        if self.failed_required_steps:
+            status["failed_required_steps"] = self.failed_required_steps
+        if self.finished_at is not None:
+            status["warmup_seconds"] = round(self.finished_at - self.started_at, 4)
+        return status
+
+
+# Create global instance
+warmup_service = WarmupService()
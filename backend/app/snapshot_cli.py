@@ -0,0 +1,264 @@
+"""
+Export and import the vector index as snapshot files
+
+Bootstraps a new node from a compact file instead of copying chroma_db or
+re-embedding every document through OpenAI:
+
+    python -m app.snapshot_cli export index.snap
+    python -m app.snapshot_cli import index.snap            # on the new node
+
+Keeps a replica in sync with small delta snapshots (only the chunks added
+or changed since a base snapshot, plus deletions). The base is the full
+snapshot followed by the deltas already exported from it:
+
+    python -m app.snapshot_cli export delta-1.snap --base index.snap
+    python -m app.snapshot_cli export delta-2.snap --base index.snap delta-1.snap
+    python -m app.snapshot_cli import delta-1.snap delta-2.snap   # on the replica
+    
+    python -m app.snapshot_cli info index.snap
+
+Export and import open CHROMA_DB_PATH directly. Stop the retrieval daemon
+(or API processes in embedded mode) on the target node before importing:
+the index has a single writer. Files the daemon publishes to
+INDEX_SNAPSHOT_DIR are full snapshots and can be imported as well.
+
+Snapshots record the embedding provider and model of their vectors, and
+import refuses a snapshot made with a different one than EMBEDDING_PROVIDER.
+A full import with --replace loads into a staging collection and swaps it
+in when complete, so a failed import leaves the current index as it was.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from app.config.settings import settings
+from app.config.constants import EMBEDDING_DIMENSION
+from app.repositories.vector_repository import VectorRepository
+from app.services.completion_cache import completion_cache
+from app.services.embedding_providers import embedding_identity
+from app.utils.index_snapshot import (
+    IndexSnapshot,
+    diff_against,
+    embedding_mismatch,
+    read_snapshot,
+    replay_chain,
+    write_snapshot
+)
+from app.utils.logger import setup_logging, get_logger
+
+setup_logging()
+logger = get_logger(__name__)
+load_dotenv()
+
+# Which snapshot the local index matches, so deltas are applied in order
+STATE_FILE = "snapshot_state.json"
+
+
+def _state_path() -> str:
+    return os.path.join(settings.CHROMA_DB_PATH, STATE_FILE)
+
+
+def load_state() -> Dict:
+    """Last snapshot imported into (or exported from) the local index"""
+    try:
+        with open(_state_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(snapshot_id: str, version: int):
+    os.makedirs(settings.CHROMA_DB_PATH, exist_ok=True)
+    with open(_state_path(), "w", encoding="utf-8") as f:
+        json.dump({"snapshot_id": snapshot_id, "version": version, "updated_at": time.time()}, f)
+
+
+def export_snapshot(repository: VectorRepository, path: str, base_paths: Optional[List[str]] = None) -> Dict:
+    """
+    Write the collection (or its changes since a base snapshot) to a file
+    
+    Args:
+        repository: Source repository
+        path: Destination file
+        base_paths: For a delta, the full snapshot and its later deltas, in order
+    
+    Returns:
+        Summary of what was written
+    """
+    ids, vectors, documents, metadatas = [], [], [], []
+    for page in repository.iter_all():
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+    matrix = np.concatenate(vectors) if vectors else np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+    
+    if not base_paths:
+        snapshot_id = write_snapshot(
+            path, 1, ids, matrix, documents, metadatas, EMBEDDING_DIMENSION, embedding=embedding_identity()
+        )
+        summary = {"type": "full", "version": 1, "chunks": len(ids)}
+    else:
+        fingerprints, base = replay_chain([read_snapshot(base_path) for base_path in base_paths])
+        changed, deleted = diff_against(fingerprints, ids, documents, metadatas)
+        snapshot_id = write_snapshot(
+            path, base.version + 1,
+            [ids[row] for row in changed], matrix[changed],
+            [documents[row] for row in changed], [metadatas[row] for row in changed],
+            EMBEDDING_DIMENSION,
+            base_snapshot_id=base.snapshot_id,
+            deleted_ids=deleted,
+            embedding=embedding_identity()
+        )
+        summary = {"type": "delta", "version": base.version + 1, "chunks": len(changed), "deleted": len(deleted)}
+    
+    summary.update(snapshot_id=snapshot_id, bytes=os.path.getsize(path))
+    return summary
+
+
+def _invalidate_cached_answers(document_ids):
+    """Drop cached LLM answers that cited documents the import changed"""
+    if completion_cache is None:
+        return
+    for document_id in document_ids:
+        completion_cache.invalidate_document(document_id)
+
+
+def import_snapshot(repository: VectorRepository, snapshot: IndexSnapshot, replace: bool = False, force: bool = False) -> Dict:
+    """
+    Bulk-load a snapshot into the collection
+    
+    Args:
+        repository: Target repository
+        snapshot: Full or delta snapshot
+        replace: For a full snapshot, replace existing chunks (loaded into a
+            staging collection first, so a failed import keeps them)
+        force: Apply a delta even if the index is not at its base snapshot,
+            and skip the embedding model check
+    
+    Raises:
+        ValueError: If the import would leave the index inconsistent
+    """
+    mismatch = embedding_mismatch(snapshot.header, embedding_identity())
+    if mismatch is not None and not force:
+        raise ValueError(f"{mismatch} (use --force to import anyway)")
+    
+    state = load_state()
+    touched = {entry["document_id"] for entry in snapshot.header.get("catalog", [])}
+    
+    if snapshot.is_delta:
+        base_id = snapshot.header["base_snapshot_id"]
+        if state.get("snapshot_id") != base_id and not force:
+            raise ValueError(
+                f"Delta applies to snapshot {base_id}, but the index is at "
+                f"{state.get('snapshot_id') or 'an unknown snapshot'} (use --force to apply anyway)"
+            )
+        repository.delete_ids(snapshot.deleted_ids)
+        # Chunk ids are "<document_id>_<chunk_index>"
+        touched.update(chunk_id.rsplit("_", 1)[0] for chunk_id in snapshot.deleted_ids)
+    else:
+        existing = repository.count()
+        if existing and not replace:
+            raise ValueError(f"The collection already has {existing} chunks (use --replace to overwrite it)")
+        if existing:
+            touched.update(
+                metadata["document_id"]
+                for metadata in repository.get(include=["metadatas"])["metadatas"]
+            )
+    
+    if snapshot.is_delta:
+        repository.write_records(
+            snapshot.ids, np.asarray(snapshot.vectors), snapshot.documents, snapshot.metadatas
+        )
+        # Summary vectors for two-stage retrieval are derived from the chunks
+        repository.rebuild_document_summaries(touched)
+    else:
+        # Also rebuilds the summary vectors
+        repository.replace_records(
+            snapshot.ids, np.asarray(snapshot.vectors), snapshot.documents, snapshot.metadatas
+        )
+    _invalidate_cached_answers(touched)
+    save_state(snapshot.snapshot_id, snapshot.version)
+    return {
+        "type": "delta" if snapshot.is_delta else "full",
+        "version": snapshot.version,
+        "chunks": len(snapshot),
+        "deleted": len(snapshot.deleted_ids),
+        "collection_chunks": repository.count()
+    }
+
+
+def describe(snapshot: IndexSnapshot, path: str) -> Dict:
+    """Header details and catalog of a snapshot file"""
+    catalog = snapshot.header.get("catalog", [])
+    return {
+        "path": path,
+        "bytes": os.path.getsize(path),
+        "snapshot_id": snapshot.snapshot_id,
+        "version": snapshot.version,
+        "type": "delta" if snapshot.is_delta else "full",
+        "base_snapshot_id": snapshot.header.get("base_snapshot_id"),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(snapshot.created_at)),
+        "chunks": len(snapshot),
+        "dimension": snapshot.vectors.shape[1],
+        "embedding_provider": snapshot.header.get("embedding_provider"),
+        "embedding_model": snapshot.header.get("embedding_model"),
+        "deleted": len(snapshot.deleted_ids),
+        "documents": len(catalog),
+        "catalog": catalog
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    export_parser = commands.add_parser("export", help="Write the index to a snapshot file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--base", nargs="+",
+                               help="Write a delta against this full snapshot (and its later deltas, in order)")
+    
+    import_parser = commands.add_parser("import", help="Bulk-load snapshot files (in order)")
+    import_parser.add_argument("paths", nargs="+")
+    import_parser.add_argument("--replace", action="store_true",
+                               help="Replace a non-empty collection (swapped in once the import is complete)")
+    import_parser.add_argument("--force", action="store_true",
+                               help="Apply deltas without checking their base, and skip the embedding model check")
+    
+    info_parser = commands.add_parser("info", help="Show a snapshot's header and catalog")
+    info_parser.add_argument("path")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    
+    if args.command == "info":
+        print(json.dumps(describe(read_snapshot(args.path), args.path), indent=2))
+        return
+    
+    repository = VectorRepository()
+    try:
+        if args.command == "export":
+            started_at = time.perf_counter()
+            summary = export_snapshot(repository, args.path, args.base)
+            if args.base is None:
+                # A full export describes this index exactly; deltas can build on it
+                save_state(summary["snapshot_id"], summary["version"])
+            logger.info(f"Exported {summary} in {time.perf_counter() - started_at:.2f}s")
+        else:
+            for path in args.paths:
+                started_at = time.perf_counter()
+                summary = import_snapshot(repository, read_snapshot(path), args.replace, args.force)
+                logger.info(f"Imported {path}: {summary} in {time.perf_counter() - started_at:.2f}s")
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
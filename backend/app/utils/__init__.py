@@ -1,8 +1,25 @@
 """
 Utilities package
+
+Exports are imported on first access (PEP 562), so importing one utility
+module does not pull in the heavy dependencies of the others.
 """
-from app.utils.logger import get_logger, setup_logging
-from app.utils.chunking import ChunkingStrategy
-from app.utils.file_utils import FileProcessor
+from app.utils.lazy import lazy_exports
+
+__all__ = [
+    "get_logger",
+    "setup_logging",
+    "ChunkingStrategy",
+    "FileProcessor",
+    "ContextPacker",
+    "estimate_tokens"
+]
 
-__all__ = ["get_logger", "setup_logging", "ChunkingStrategy", "FileProcessor"]
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "get_logger": "logger",
+    "setup_logging": "logger",
+    "ChunkingStrategy": "chunking",
+    "FileProcessor": "file_utils",
+    "ContextPacker": "token_budget",
+    "estimate_tokens": "token_budget"
+})
@@ -1,8 +1,6 @@
 """
 Text chunking utilities for RAG
 """
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
 from typing import List, Dict
 from app.config.constants import CHUNK_SIZE, CHUNK_OVERLAP
 
@@ -18,6 +16,8 @@ class ChunkingStrategy:
     """
     
     def __init__(self):
+        # Imported here: langchain_text_splitters is slow to import
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=CHUNK_SIZE,
             chunk_overlap=CHUNK_OVERLAP,
@@ -0,0 +1,136 @@
+"""
+Near-duplicate detection for chunks: MinHash signatures and LSH banding
+
+Texts are lowercased and split into word shingles. Digits are kept: chunks
+that differ only in their numbers (prices, dosages, table rows) are not
+duplicates. A MinHash signature
+estimates the Jaccard similarity of two shingle sets as the share of equal
+signature entries. LSH splits a signature into DEDUP_BANDS bands: texts
+sharing any band become candidates, which are confirmed against
+DEDUP_SIMILARITY_THRESHOLD.
+
+Signatures use fixed hashes and a seeded permutation family, so they can be
+stored and compared across processes and restarts.
+"""
+import hashlib
+import re
+import zlib
+from typing import Dict, List, Optional
+import numpy as np
+from app.config.constants import (
+    DEDUP_NUM_PERM,
+    DEDUP_BANDS,
+    DEDUP_SHINGLE_WORDS,
+    DEDUP_SIMILARITY_THRESHOLD,
+    DEDUP_SEED
+)
+
+_WORD = re.compile(r"\w+")
+# Smallest prime above 2**32: (a * x + b) stays below 2**64 for 32-bit a, x and b
+_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer (uint64 -> well-mixed uint64)"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+class MinHasher:
+    """Computes MinHash signatures of texts"""
+
+    def __init__(
+        self,
+        num_perm: int = DEDUP_NUM_PERM,
+        shingle_words: int = DEDUP_SHINGLE_WORDS,
+        seed: int = DEDUP_SEED
+    ):
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """32-bit hashes of a text's word shingles (after normalization)"""
+        words = _WORD.findall(text.lower())
+        if not words:
+            return np.zeros(0, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+        width = min(self.shingle_words, len(words))
+        combined = np.zeros(len(words) - width + 1, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for offset in range(width):
+                combined = _mix64(combined * np.uint64(31) + hashes[offset:offset + len(combined)])
+        return np.unique(combined & np.uint64(0xFFFFFFFF))
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of one text (uint32, num_perm entries)"""
+        shingles = self.shingle_hashes(text)
+        if not len(shingles):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        permuted = (shingles[:, None] * self._a + self._b) % _PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """Signatures of several texts, one row each"""
+        if not texts:
+            return np.zeros((0, self.num_perm), dtype=np.uint32)
+        return np.stack([self.signature(text) for text in texts])
+
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(first == second)) / len(first)
+
+
+def band_keys(signature: np.ndarray, bands: int = DEDUP_BANDS) -> List[int]:
+    """LSH bucket key per band (signed 64-bit, so SQLite can store them as integers)"""
+    rows = len(signature) // bands
+    data = signature.astype("<u4")
+    return [
+        int.from_bytes(
+            hashlib.blake2b(band.to_bytes(2, "little") + data[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(),
+            "little",
+            signed=True
+        )
+        for band in range(bands)
+    ]
+
+
+def find_duplicates(
+    signatures: np.ndarray,
+    threshold: float = DEDUP_SIMILARITY_THRESHOLD
+) -> List[Optional[int]]:
+    """
+    Near-duplicates within one set of texts (e.g. one document's chunks)
+
+    Args:
+        signatures: One signature per text, in order
+        threshold: Minimum estimated Jaccard similarity
+
+    Returns:
+        For each row, the earlier row it duplicates (None for rows that are kept)
+    """
+    buckets: Dict[int, List[int]] = {}
+    duplicate_of: List[Optional[int]] = []
+    for row, signature in enumerate(signatures):
+        keys = band_keys(signature)
+        match = None
+        for key in keys:
+            for candidate in buckets.get(key, ()):
+                if similarity(signature, signatures[candidate]) >= threshold:
+                    match = candidate
+                    break
+            if match is not None:
+                break
+        duplicate_of.append(match)
+        if match is None:
+            # Only kept rows are indexed, so every duplicate points at a kept row
+            for key in keys:
+                buckets.setdefault(key, []).append(row)
+    return duplicate_of
@@ -0,0 +1,103 @@
+"""
+Document summary vectors for two-stage (document-routed) retrieval
+
+A document is summarized by the centroids of its chunk embeddings, one per
+section of DOCUMENT_SUMMARY_SECTION_CHUNKS consecutive chunks, so a long
+document that covers several topics can be routed to by any of them.
+Centroids need no extra embedding calls and can be rebuilt from the stored
+chunks at any time.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.config.constants import DOCUMENT_SUMMARY_SECTION_CHUNKS, RAG_ROUTE_OVERSAMPLE
+from app.utils.index_snapshot import normalize_rows
+
+
+def section_of(chunk_index: int) -> int:
+    """Summary section a chunk belongs to"""
+    return chunk_index // DOCUMENT_SUMMARY_SECTION_CHUNKS
+
+
+def summary_id(document_id: str, section: int) -> str:
+    """ID of one summary vector in the summaries collection"""
+    return f"{document_id}#{section}"
+
+
+def summary_vectors(
+    embeddings,
+    chunk_indexes: Optional[Iterable[int]] = None
+) -> Tuple[List[int], np.ndarray]:
+    """
+    Section centroids of one document's chunk embeddings
+    
+    Args:
+        embeddings: Chunk embeddings, one row per chunk
+        chunk_indexes: Chunk index of each row (defaults to row order)
+    
+    Returns:
+        (section numbers, unit-length centroid per section)
+    """
+    vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    if chunk_indexes is None:
+        chunk_indexes = range(len(vectors))
+    rows_by_section: Dict[int, List[int]] = {}
+    for row, chunk_index in enumerate(chunk_indexes):
+        rows_by_section.setdefault(section_of(chunk_index), []).append(row)
+    sections = sorted(rows_by_section)
+    if not sections:
+        return [], np.zeros((0, vectors.shape[1] if vectors.ndim == 2 else 0), dtype=np.float32)
+    centroids = np.stack([vectors[rows_by_section[section]].sum(axis=0) for section in sections])
+    return sections, normalize_rows(centroids)
+
+
+def top_documents(ranked_document_ids: Iterable[str], n_documents: int) -> List[str]:
+    """First `n_documents` distinct documents of ranked summary hits"""
+    documents: List[str] = []
+    for document_id in ranked_document_ids:
+        if document_id not in documents:
+            documents.append(document_id)
+            if len(documents) >= n_documents:
+                break
+    return documents
+
+
+class SummaryIndex:
+    """
+    Summary vectors derived from a set of unit chunk vectors (e.g. a snapshot)
+    
+    Attributes:
+        document_ids: Document of each summary row
+        vectors: (summaries, dimension) unit centroids
+        rows: Document ID -> its chunk rows in the source vectors
+    """
+    
+    def __init__(self, vectors: np.ndarray, metadatas: List[Dict]):
+        groups: Dict[Tuple[str, int], List[int]] = {}
+        rows: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            document_id = metadata["document_id"]
+            groups.setdefault((document_id, section_of(metadata["chunk_index"])), []).append(row)
+            rows.setdefault(document_id, []).append(row)
+        keys = sorted(groups)
+        self.document_ids = [document_id for document_id, _ in keys]
+        self.rows = {document_id: np.asarray(document_rows) for document_id, document_rows in rows.items()}
+        if keys:
+            self.vectors = normalize_rows(np.stack([
+                np.asarray(vectors[groups[key]]).sum(axis=0) for key in keys
+            ]))
+        else:
+            self.vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+    
+    def route(self, queries: np.ndarray, n_documents: int) -> List[List[str]]:
+        """Best documents per (unit) query row, by their closest summary vector"""
+        if not len(self.document_ids):
+            return [[] for _ in queries]
+        scores = self.vectors @ queries.T
+        k = min(len(self.document_ids), n_documents * RAG_ROUTE_OVERSAMPLE)
+        routed = []
+        for column in range(scores.shape[1]):
+            column_scores = scores[:, column]
+            top = np.argpartition(-column_scores, k - 1)[:k]
+            top = top[np.argsort(-column_scores[top])]
+            routed.append(top_documents((self.document_ids[row] for row in top), n_documents))
+        return routed
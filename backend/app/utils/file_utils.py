@@ -3,7 +3,6 @@ File processing utilities
 """
 import os
 from typing import Optional
-from langchain_community.document_loaders import PyMuPDFLoader
 from app.config.constants import SUPPORTED_FILE_TYPES
 from app.utils.logger import get_logger
 
@@ -19,6 +18,17 @@ class FileProcessor:
         ext = os.path.splitext(filename)[1].lower()
         return ext in SUPPORTED_FILE_TYPES
     
+    @staticmethod
+    def pdf_loader_class():
+        """
+        LangChain's PyMuPDFLoader, imported on first use
+        
+        langchain_community takes about half a second to import, so it is
+        kept off the startup path (the API imports it during warmup).
+        """
+        from langchain_community.document_loaders import PyMuPDFLoader
+        return PyMuPDFLoader
+    
     @staticmethod
     async def extract_text(file_path: str) -> str:
         """
@@ -39,7 +49,7 @@ class FileProcessor:
         
         if file_extension == '.pdf':
             # Use LangChain's PyMuPDF loader for PDF extraction
-            loader = PyMuPDFLoader(file_path)
+            loader = FileProcessor.pdf_loader_class()(file_path)
             documents = loader.load()
             text = "\n\n".join([doc.page_content for doc in documents])
             logger.info(f"Extracted {len(text)} characters from PDF")
@@ -0,0 +1,357 @@
+"""
+Index snapshots: one-file copies of the vector collection
+
+The retrieval daemon (single writer) publishes the whole collection as an
+immutable snapshot file after every change; API and agent workers in
+snapshot mode serve queries from the newest one. The same files export an
+index and bulk-load it on another node (python -m app.snapshot_cli).
+A snapshot is one file:
+
+    preamble (fixed, little-endian):
+        magic (8s) | format version (u32) | flags (u32) | count (u64) |
+        dimension (u32) | reserved (u32) | header length (u64) |
+        vectors offset (u64) | records offset (u64) | records length (u64)
+    header: JSON (snapshot id and version, creation time, records codec,
+        embedding provider and model, catalog of the documents in the file,
+        base snapshot id for deltas)
+    vectors: float32 rows (count x dimension, unit length), 64-byte aligned
+    records: zlib-compressed JSON {"ids", "documents", "metadatas"}, plus
+        "deleted_ids" in delta snapshots
+
+A delta snapshot (flag FLAG_DELTA) holds only the chunks added or changed
+since its base snapshot and the ids removed since then.
+
+Vectors are memory-mapped, so every worker on a host shares one copy in
+the page cache. The directory's CURRENT file names the newest snapshot and
+is replaced atomically, so readers always see a complete file.
+"""
+import hashlib
+import json
+import os
+import struct
+import time
+import uuid
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b"VAISNAP\x00"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sIIQIIQQQQ")
+ALIGNMENT = 64
+POINTER_FILE = "CURRENT"
+FLAG_DELTA = 1
+
+
+class IndexSnapshot:
+    """
+    One loaded snapshot (immutable)
+    
+    Attributes:
+        version: Publication counter (increases with every publish)
+        created_at: Unix time of publication
+        ids, documents, metadatas: Per-chunk records, in row order
+        vectors: (count, dimension) float32 array of unit rows (memory-mapped)
+        header: The file's JSON header (snapshot_id, catalog, ...)
+        deleted_ids: Chunk ids removed since the base snapshot (deltas only)
+    """
+    
+    def __init__(
+        self,
+        version: int,
+        created_at: float,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict],
+        vectors: np.ndarray,
+        header: Optional[Dict] = None,
+        deleted_ids: Optional[List[str]] = None
+    ):
+        self.version = version
+        self.created_at = created_at
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.vectors = vectors
+        self.header = header or {}
+        self.deleted_ids = deleted_ids or []
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+    
+    @property
+    def snapshot_id(self) -> Optional[str]:
+        return self.header.get("snapshot_id")
+    
+    @property
+    def is_delta(self) -> bool:
+        return self.header.get("base_snapshot_id") is not None
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length (zero rows stay zero)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def build_catalog(metadatas: List[Dict]) -> List[Dict]:
+    """Documents in a set of chunks: id, name and chunk count, in first-seen order"""
+    catalog: Dict[str, Dict] = {}
+    for metadata in metadatas:
+        document_id = metadata.get("document_id")
+        entry = catalog.get(document_id)
+        if entry is None:
+            entry = catalog[document_id] = {
+                "document_id": document_id,
+                "document_name": metadata.get("document_name"),
+                "chunks": 0
+            }
+        entry["chunks"] += 1
+    return list(catalog.values())
+
+
+def _record_digest(document: str, metadata: Dict) -> bytes:
+    """Fingerprint of a chunk's text and metadata"""
+    payload = json.dumps([document, metadata], sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def replay_chain(snapshots: List[IndexSnapshot]) -> Tuple[Dict[str, bytes], IndexSnapshot]:
+    """
+    Chunk fingerprints after applying a full snapshot and its deltas in order
+    
+    Returns:
+        ({chunk id: fingerprint}, the last snapshot of the chain)
+    
+    Raises:
+        ValueError: If the chain does not start with a full snapshot or a
+            delta does not apply to the snapshot before it
+    """
+    if not snapshots or snapshots[0].is_delta:
+        raise ValueError("A snapshot chain must start with a full snapshot")
+    fingerprints: Dict[str, bytes] = {}
+    previous = None
+    for snapshot in snapshots:
+        if previous is not None and snapshot.header.get("base_snapshot_id") != previous.snapshot_id:
+            raise ValueError(f"Snapshot {snapshot.snapshot_id} does not apply to {previous.snapshot_id}")
+        for chunk_id in snapshot.deleted_ids:
+            fingerprints.pop(chunk_id, None)
+        for row, chunk_id in enumerate(snapshot.ids):
+            fingerprints[chunk_id] = _record_digest(snapshot.documents[row], snapshot.metadatas[row])
+        previous = snapshot
+    return fingerprints, previous
+
+
+def diff_against(
+    base: Dict[str, bytes],
+    ids: List[str],
+    documents: List[str],
+    metadatas: List[Dict]
+) -> Tuple[List[int], List[str]]:
+    """
+    Changes from a base state (see replay_chain) to the current records
+    
+    Returns:
+        (rows of `ids` that are new or whose text/metadata changed,
+        ids in the base that no longer exist)
+    """
+    changed = [
+        row for row, chunk_id in enumerate(ids)
+        if base.get(chunk_id) != _record_digest(documents[row], metadatas[row])
+    ]
+    current = set(ids)
+    deleted = [chunk_id for chunk_id in base if chunk_id not in current]
+    return changed, deleted
+
+
+def embedding_mismatch(header: Dict, expected: Dict[str, str]) -> Optional[str]:
+    """
+    Why a snapshot's vectors do not fit an index (None if they do)
+    
+    Args:
+        header: Snapshot header
+        expected: The index's embedding_provider and embedding_model
+    """
+    recorded = {key: header.get(key) for key in expected}
+    if recorded == expected:
+        return None
+    if not any(recorded.values()):
+        return "Snapshot does not record its embedding model"
+    return (
+        f"Snapshot vectors come from {recorded['embedding_provider']}/{recorded['embedding_model']}, "
+        f"but this index uses {expected['embedding_provider']}/{expected['embedding_model']}"
+    )
+
+
+def write_snapshot(
+    path: str,
+    version: int,
+    ids: List[str],
+    vectors: np.ndarray,
+    documents: List[str],
+    metadatas: List[Dict],
+    dimension: int,
+    base_snapshot_id: Optional[str] = None,
+    deleted_ids: Optional[List[str]] = None,
+    embedding: Optional[Dict[str, str]] = None
+) -> str:
+    """
+    Write a snapshot file atomically (temp file, then rename)
+    
+    Args:
+        path: Destination file
+        version: Snapshot version to record
+        ids, documents, metadatas: Per-chunk records
+        vectors: Embeddings, one row per chunk (normalized here)
+        dimension: Embedding dimension (needed when there are no rows)
+        base_snapshot_id: For a delta snapshot, the snapshot it applies to
+        deleted_ids: For a delta snapshot, ids removed since the base
+        embedding: embedding_provider and embedding_model of the vectors
+    
+    Returns:
+        The new snapshot's id
+    """
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), dimension))
+    snapshot_id = uuid.uuid4().hex
+    header = json.dumps({
+        "snapshot_id": snapshot_id,
+        "version": version,
+        "created_at": time.time(),
+        "records_codec": "zlib+json",
+        **(embedding or {}),
+        "base_snapshot_id": base_snapshot_id,
+        "catalog": build_catalog(metadatas)
+    }).encode("utf-8")
+    record_fields = {"ids": ids, "documents": documents, "metadatas": metadatas}
+    if base_snapshot_id is not None:
+        record_fields["deleted_ids"] = deleted_ids or []
+    records = zlib.compress(json.dumps(record_fields, ensure_ascii=False).encode("utf-8"))
+    vectors_offset = _align(PREAMBLE.size + len(header))
+    records_offset = vectors_offset + vectors.nbytes
+    
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(PREAMBLE.pack(
+            MAGIC, FORMAT_VERSION, FLAG_DELTA if base_snapshot_id is not None else 0, len(ids), dimension, 0,
+            len(header), vectors_offset, records_offset, len(records)
+        ))
+        f.write(header)
+        f.write(b"\x00" * (vectors_offset - PREAMBLE.size - len(header)))
+        f.write(vectors.astype("<f4", copy=False).tobytes())
+        f.write(records)
+    os.replace(temp_path, path)
+    return snapshot_id
+
+
+def read_snapshot(path: str) -> IndexSnapshot:
+    """
+    Load a snapshot file (vectors memory-mapped, records decompressed)
+    
+    Raises:
+        ValueError: If the file is not a snapshot or has an unknown format version
+    """
+    with open(path, "rb") as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) != PREAMBLE.size:
+            raise ValueError(f"Truncated index snapshot: {path}")
+        (magic, format_version, _, count, dimension, _,
+         header_length, vectors_offset, records_offset, records_length) = PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f"Not an index snapshot: {path}")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index snapshot format {format_version}: {path}")
+        header = json.loads(f.read(header_length))
+        f.seek(records_offset)
+        records = json.loads(zlib.decompress(f.read(records_length)))
+    
+    if count:
+        vectors = np.memmap(path, dtype="<f4", mode="r", offset=vectors_offset, shape=(count, dimension))
+    else:
+        vectors = np.zeros((0, dimension), dtype=np.float32)
+    return IndexSnapshot(
+        version=header["version"],
+        created_at=header["created_at"],
+        ids=records["ids"],
+        documents=records["documents"],
+        metadatas=records["metadatas"],
+        vectors=vectors,
+        header=header,
+        deleted_ids=records.get("deleted_ids")
+    )
+
+
+def current_snapshot_path(directory: str) -> Optional[str]:
+    """Path of the newest published snapshot (None if nothing is published yet)"""
+    try:
+        with open(os.path.join(directory, POINTER_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(directory, name) if name else None
+
+
+class SnapshotPublisher:
+    """
+    Writes numbered snapshots into a directory and moves CURRENT to the newest
+    
+    Only one process (the retrieval daemon) may publish into a directory.
+    """
+    
+    def __init__(self, directory: str, keep: int, dimension: int, embedding: Optional[Dict[str, str]] = None):
+        self.directory = directory
+        self.keep = keep
+        self.dimension = dimension
+        self.embedding = embedding
+        os.makedirs(directory, exist_ok=True)
+        self.version = self._latest_version()
+    
+    def _snapshot_names(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith("index-") and name.endswith(".snap")
+        )
+    
+    def _latest_version(self) -> int:
+        names = self._snapshot_names()
+        return int(names[-1][len("index-"):-len(".snap")]) if names else 0
+    
+    def publish(self, ids: List[str], vectors: np.ndarray, documents: List[str], metadatas: List[Dict]) -> int:
+        """
+        Publish the full collection as the next snapshot
+        
+        Returns:
+            The new snapshot version
+        """
+        started_at = time.perf_counter()
+        version = self.version + 1
+        name = f"index-{version:012d}.snap"
+        write_snapshot(
+            os.path.join(self.directory, name), version, ids, vectors, documents, metadatas, self.dimension,
+            embedding=self.embedding
+        )
+        
+        pointer_path = os.path.join(self.directory, POINTER_FILE)
+        with open(f"{pointer_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(f"{pointer_path}.tmp", pointer_path)
+        self.version = version
+        
+        # Readers still holding an older snapshot keep their mapping after unlink
+        for old_name in self._snapshot_names()[:-self.keep]:
+            os.remove(os.path.join(self.directory, old_name))
+        
+        logger.info(
+            f"Published index snapshot {version} ({len(ids)} chunks) "
+            f"in {(time.perf_counter() - started_at) * 1000:.0f} ms"
+        )
+        return version
@@ -0,0 +1,99 @@
+"""
+Lazy singletons and lazy package exports
+
+Module-level service instances used to be built at import time, so merely
+importing the app opened ChromaDB and created OpenAI clients. A LazyProxy
+takes the place of such an instance and builds it on first attribute
+access (or during the API's warmup phase), so `from x import service`
+keeps working while imports stay cheap.
+"""
+import importlib
+import threading
+import time
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class LazyProxy(Generic[T]):
+    """
+    Stand-in for a singleton that is created on first use
+    
+    Attribute reads, writes and deletes are forwarded to the instance.
+    Creation is thread-safe (the API warms singletons in a worker thread
+    while requests may already arrive on the event loop).
+    """
+    
+    __slots__ = ("_factory", "_name", "_instance", "_lock", "_seconds")
+    
+    def __init__(self, factory: Callable[[], T], name: str):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_seconds", None)
+    
+    def lazy_resolve(self) -> T:
+        """Instance behind the proxy (created on the first call)"""
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                started_at = time.perf_counter()
+                instance = self._factory()
+                seconds = time.perf_counter() - started_at
+                object.__setattr__(self, "_seconds", seconds)
+                object.__setattr__(self, "_instance", instance)
+                logger.info(f"Initialized {self._name} in {seconds * 1000:.0f} ms")
+            return self._instance
+    
+    @property
+    def lazy_loaded(self) -> bool:
+        """Whether the instance has been created"""
+        return self._instance is not None
+    
+    @property
+    def lazy_seconds(self) -> Optional[float]:
+        """Time the factory took (None until created)"""
+        return self._seconds
+    
+    def __getattr__(self, name: str):
+        return getattr(self.lazy_resolve(), name)
+    
+    def __setattr__(self, name: str, value):
+        setattr(self.lazy_resolve(), name, value)
+    
+    def __delattr__(self, name: str):
+        delattr(self.lazy_resolve(), name)
+    
+    def __repr__(self) -> str:
+        if self._instance is None:
+            return f"<LazyProxy {self._name} (not created)>"
+        return repr(self._instance)
+
+
+def lazy_exports(package: str, exports: Dict[str, str]):
+    """
+    Module `__getattr__` and `__dir__` for a package with lazy re-exports (PEP 562)
+    
+    Args:
+        package: The package's `__name__`
+        exports: Exported name -> submodule (relative to the package) defining it
+    
+    Returns:
+        (__getattr__, __dir__) to assign at the package's module level
+    """
+    def __getattr__(name: str):
+        submodule = exports.get(name)
+        if submodule is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        return getattr(importlib.import_module(f"{package}.{submodule}"), name)
+    
+    def __dir__() -> List[str]:
+        return sorted(exports)
+    
+    return __getattr__, __dir__
@@ -1,29 +1,177 @@
 """
 Logging configuration with file output
+
+In queue mode (LOG_QUEUE_ENABLED) the root logger only has a QueueHandler:
+callers enqueue records and a background QueueListener thread does the
+formatting and the console/file writes, so no log I/O runs on the event
+loop. Hot-path INFO logs are sampled and rate limited per logger before
+they are enqueued; warnings and errors are never dropped.
 """
+import atexit
+import copy
+import json
 import logging
+import queue
 import sys
 import os
-from logging.handlers import RotatingFileHandler
-from app.config.settings import settings
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
 
+_listener: Optional[QueueListener] = None
 
-def setup_logging():
-    """Setup application logging with file output"""
-    # Create logs directory
-    os.makedirs("logs", exist_ok=True)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line (for log shippers)"""
     
-    # Configure root logger
-    logger = logging.getLogger()
-    logger.setLevel(getattr(logging, settings.LOG_LEVEL))
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _OncePerRecordFilter(logging.Filter, ABC):
+    """
+    Filter that decides once per record
+    
+    Without the queue the same filter sits on every handler; caching the
+    decision on the record keeps counters from advancing once per handler.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._attribute = f"_keep_{id(self)}"
+    
+    @abstractmethod
+    def _decide(self, record: logging.LogRecord) -> bool:
+        """Whether to keep an INFO/DEBUG record (called once per record)"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        keep = record.__dict__.get(self._attribute)
+        if keep is None:
+            keep = record.levelno > logging.INFO or self._decide(record)
+            record.__dict__[self._attribute] = keep
+        return keep
+
+
+class SamplingFilter(_OncePerRecordFilter):
+    """
+    Keep every Nth INFO/DEBUG record of selected loggers
+    
+    Deterministic (a counter, not random), so a rate of 0.1 keeps exactly one
+    record in ten. Loggers match by name prefix.
+    """
+    
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first so specific loggers override their parents
+        self._intervals = sorted(
+            ((prefix, max(1, round(1 / rate)) if rate > 0 else 0) for prefix, rate in rates.items()),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        self._counters: Dict[str, int] = {}
+        self.dropped = 0
+    
+    def _interval(self, name: str) -> int:
+        for prefix, interval in self._intervals:
+            if name == prefix or name.startswith(prefix + "."):
+                return interval
+        return 1
+    
+    def _decide(self, record: logging.LogRecord) -> bool:
+        interval = self._interval(record.name)
+        if interval == 1:
+            return True
+        count = self._counters.get(record.name, 0)
+        self._counters[record.name] = count + 1
+        if interval and count % interval == 0:
+            return True
+        self.dropped += 1
+        return False
+
+
+class RateLimitFilter(_OncePerRecordFilter):
+    """
+    Token bucket per logger for INFO/DEBUG records
+    
+    Each logger may emit `burst` records at once and `rate` records per
+    second sustained. When a logger recovers, its next record notes how many
+    were suppressed.
+    """
+    
+    def __init__(self, rate: float, burst: int):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        # Logger name -> [tokens, last refill time, suppressed since last emit]
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+    
+    def _decide(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.dropped += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.msg = f"{record.msg} [{int(suppressed)} similar messages suppressed]"
+        return True
+
+
+class _LocalQueueHandler(QueueHandler):
+    """
+    QueueHandler for an in-process queue
+    
+    The stock prepare() formats the record on the calling thread and drops
+    exc_info, so the listener's formatter never sees the exception (JSON
+    output would put the traceback inside "message"). The queue never leaves
+    the process, so records need not be picklable: only the message is
+    merged with its args here (they may change after the call), and
+    tracebacks are formatted by the listener's handlers.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _build_handlers(json_output: bool) -> List[logging.Handler]:
+    """Console, all-logs file and error file handlers"""
+    formatter = JsonFormatter() if json_output else logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
     
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    console_handler.setFormatter(console_formatter)
+    console_handler.setFormatter(formatter)
     
     # File handler for all logs
     file_handler = RotatingFileHandler(
@@ -32,10 +180,7 @@ def setup_logging():
         backupCount=5
     )
     file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    file_handler.setFormatter(file_formatter)
+    file_handler.setFormatter(formatter)
     
     # Error file handler
     error_handler = RotatingFileHandler(
@@ -44,15 +189,60 @@ def setup_logging():
         backupCount=5
     )
     error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(file_formatter)
+    error_handler.setFormatter(formatter)
+    
+    return [console_handler, file_handler, error_handler]
+
+
+def setup_logging():
+    """Setup application logging with file output"""
+    global _listener
+    # Imported here: app.config modules use get_logger, so importing settings
+    # at module level would be circular when app.utils is imported first
+    from app.config.settings import settings
+    from app.config.constants import LOG_SAMPLE_RATES, LOG_RATE_LIMIT_PER_SECOND, LOG_RATE_LIMIT_BURST
+    
+    # Create logs directory
+    os.makedirs("logs", exist_ok=True)
+    
+    # Configure root logger
+    logger = logging.getLogger()
+    logger.setLevel(getattr(logging, settings.LOG_LEVEL))
+    
+    handlers = _build_handlers(settings.LOG_FORMAT == "json")
+    filters = [
+        SamplingFilter(LOG_SAMPLE_RATES),
+        RateLimitFilter(LOG_RATE_LIMIT_PER_SECOND, LOG_RATE_LIMIT_BURST)
+    ]
+    
+    if not settings.LOG_QUEUE_ENABLED:
+        for handler in handlers:
+            for log_filter in filters:
+                handler.addFilter(log_filter)
+            logger.addHandler(handler)
+        return
+    
+    # Records are filtered before they are queued, so dropped records cost
+    # only the filter check on the calling thread
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _LocalQueueHandler(log_queue)
+    for log_filter in filters:
+        queue_handler.addFilter(log_filter)
+    logger.addHandler(queue_handler)
     
-    # Add handlers
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    logger.addHandler(error_handler)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread (queue mode)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 
 def get_logger(name: str) -> logging.Logger:
     """Get logger instance"""
     return logging.getLogger(name)
-
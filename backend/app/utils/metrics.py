@@ -0,0 +1,347 @@
+"""
+Process metrics (counters and histograms) in Prometheus text format
+
+Updates are plain in-place arithmetic on per-label-set children with no
+locks: the event loop (and the GIL) serializes them, so recording a sample
+costs about a microsecond. Children are created once per label set and can
+be bound ahead of time (`COUNTER.labels("x")`) on the hottest paths.
+
+The API process serves its registry at /metrics. Agent worker processes
+have no HTTP server, so they write theirs to a textfile (one per process)
+for the node_exporter textfile collector.
+"""
+import atexit
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from app.config.settings import settings
+from app.config.constants import (
+    METRICS_LATENCY_BUCKETS_SECONDS,
+    METRICS_SIZE_BUCKETS,
+    METRICS_TOKEN_BUCKETS,
+    METRICS_TEXTFILE_INTERVAL_SECONDS
+)
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+    
+    def __init__(self):
+        self.value = 0.0
+    
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+    
+    def __init__(self, upper_bounds: List[float]):
+        self.upper_bounds = upper_bounds
+        # One slot per bucket plus +Inf; made cumulative only when rendered
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+    
+    def time(self) -> "_Timer":
+        """Context manager observing the duration of the block in seconds"""
+        return _Timer(self)
+
+
+class _Timer:
+    """Times a block into a histogram (a plain class: cheaper than @contextmanager)"""
+    
+    __slots__ = ("histogram", "started_at")
+    
+    def __init__(self, histogram: _HistogramChild):
+        self.histogram = histogram
+    
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started_at)
+
+
+class _Metric(ABC):
+    """Base class: a named metric with one child per label set"""
+    
+    type_name = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+    
+    @abstractmethod
+    def _new_child(self):
+        """Empty child for a new label set"""
+    
+    def labels(self, *values: str):
+        """Child for one label set (created on first use)"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+    
+    @abstractmethod
+    def _samples(self, extra_names: Tuple[str, ...], extra_values: Tuple[str, ...]) -> Iterator[Tuple[str, str, float]]:
+        """(name suffix, formatted labels, value) for every sample"""
+    
+    def render(self, const_labels: Optional[Dict[str, str]] = None) -> str:
+        """Text-format lines (HELP, TYPE and samples) for this metric"""
+        extra_names = tuple(const_labels or {})
+        extra_values = tuple((const_labels or {}).values())
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+        for suffix, labels, value in self._samples(extra_names, extra_values):
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (name should end in _total)"""
+    
+    type_name = "counter"
+    
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+    
+    def inc(self, amount: float = 1.0):
+        """Increment the unlabeled counter"""
+        self._default.inc(amount)
+    
+    def _samples(self, extra_names, extra_values):
+        for values, child in list(self._children.items()):
+            yield "", _format_labels(self.labelnames + extra_names, values + extra_values), child.value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+    
+    type_name = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = METRICS_LATENCY_BUCKETS_SECONDS,
+        labelnames: Sequence[str] = ()
+    ):
+        self.upper_bounds = sorted(float(bound) for bound in buckets)
+        super().__init__(name, documentation, labelnames)
+    
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+    
+    def observe(self, value: float):
+        """Observe a value on the unlabeled histogram"""
+        self._default.observe(value)
+    
+    def time(self):
+        """Time a block on the unlabeled histogram"""
+        return self._default.time()
+    
+    def _samples(self, extra_names, extra_values):
+        names = self.labelnames + extra_names
+        for values, child in list(self._children.items()):
+            values = values + extra_values
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + [float("inf")], child.counts):
+                cumulative += count
+                yield "_bucket", _format_labels(names + ("le",), values + (_format_value(bound),)), cumulative
+            yield "_sum", _format_labels(names, values), child.sum
+            yield "_count", _format_labels(names, values), cumulative
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = METRICS_LATENCY_BUCKETS_SECONDS,
+        labelnames: Sequence[str] = ()
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets, labelnames))
+    
+    def render(self, const_labels: Optional[Dict[str, str]] = None) -> str:
+        """
+        All metrics in the Prometheus text exposition format
+        
+        Args:
+            const_labels: Labels added to every sample (e.g. the process)
+        """
+        return "\n".join(metric.render(const_labels) for metric in self._metrics.values()) + "\n"
+    
+    def write_textfile(self, path: str, const_labels: Optional[Dict[str, str]] = None):
+        """Atomically write the rendered metrics to a file"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.render(const_labels))
+        os.replace(temp_path, path)
+
+
+class TextfileWriter:
+    """
+    Background thread that periodically writes a registry to a textfile
+    
+    Used by processes without an HTTP endpoint (agent workers).
+    """
+    
+    def __init__(self, registry: Registry, path: str, interval: float, const_labels: Optional[Dict[str, str]] = None):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.const_labels = const_labels
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-textfile", daemon=True)
+            self._thread.start()
+            logger.info(f"Writing metrics to {self.path} every {self.interval:.0f}s")
+    
+    def write(self):
+        try:
+            self.registry.write_textfile(self.path, self.const_labels)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics textfile: {e}")
+    
+    def stop(self):
+        """Stop the thread and remove the file (a stopped process exports nothing)"""
+        self._stop.set()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+
+# Create global instance
+registry = Registry()
+_textfile_writer: Optional[TextfileWriter] = None
+
+
+def start_textfile_writer(role: str) -> Optional[TextfileWriter]:
+    """
+    Export this process's metrics to METRICS_TEXTFILE_DIR/<role>-<pid>.prom
+    
+    Idempotent per process. Samples carry a process="<role>-<pid>" label so
+    files from several workers can be collected side by side.
+    
+    Args:
+        role: Process kind, e.g. "agent"
+    
+    Returns:
+        The writer, or None when METRICS_TEXTFILE_DIR is empty
+    """
+    global _textfile_writer
+    if _textfile_writer is None and settings.METRICS_TEXTFILE_DIR:
+        process = f"{role}-{os.getpid()}"
+        _textfile_writer = TextfileWriter(
+            registry,
+            os.path.join(settings.METRICS_TEXTFILE_DIR, f"{process}.prom"),
+            METRICS_TEXTFILE_INTERVAL_SECONDS,
+            const_labels={"process": process}
+        )
+        _textfile_writer.start()
+        atexit.register(_textfile_writer.stop)
+    return _textfile_writer
+
+# Application metrics
+UPLOAD_BYTES = registry.counter(
+    "voice_ai_upload_bytes_total", "Bytes received by document uploads"
+)
+DOCUMENT_CHUNKS = registry.histogram(
+    "voice_ai_document_chunks", "Chunks created per ingested document", buckets=METRICS_SIZE_BUCKETS
+)
+EMBEDDING_BATCH_SIZE = registry.histogram(
+    "voice_ai_embedding_batch_size", "Texts per embedding request",
+    buckets=METRICS_SIZE_BUCKETS, labelnames=("provider",)
+)
+EMBEDDING_SECONDS = registry.histogram(
+    "voice_ai_embedding_seconds", "Embedding request latency", labelnames=("provider",)
+)
+VECTOR_QUERY_SECONDS = registry.histogram(
+    "voice_ai_vector_query_seconds", "Vector store call latency", labelnames=("backend", "operation")
+)
+LLM_SECONDS = registry.histogram(
+    "voice_ai_llm_seconds", "LLM completion latency (until the last token)", labelnames=("mode",)
+)
+LLM_TOKENS = registry.histogram(
+    "voice_ai_llm_tokens", "Tokens per LLM completion", buckets=METRICS_TOKEN_BUCKETS, labelnames=("kind",)
+)
+CACHE_REQUESTS = registry.counter(
+    "voice_ai_cache_requests_total", "Cache lookups by cache and result", labelnames=("cache", "result")
+)
+DUPLICATE_CHUNKS = registry.counter(
+    "voice_ai_duplicate_chunks_total", "Near-duplicate chunks found at ingestion by action",
+    labelnames=("scope", "action")
+)
+EMBEDDING_TOKENS_SAVED = registry.counter(
+    "voice_ai_embedding_tokens_saved_total", "Estimated embedding tokens not spent on duplicate chunks"
+)
+AGENT_TURNS = registry.counter(
+    "voice_ai_agent_turns_total", "Final voice turns by retrieval gate decision", labelnames=("decision",)
+)
+AGENT_TURNS_DROPPED = registry.counter(
+    "voice_ai_agent_turns_dropped_total", "Voice turns whose results were dropped as stale"
+)
+DATA_CHANNEL_BYTES = registry.counter(
+    "voice_ai_data_channel_bytes_total", "Bytes published on the LiveKit data channel", labelnames=("type",)
+)
@@ -0,0 +1,104 @@
+"""
+Token estimation and budgeted context packing for LLM prompts
+"""
+import math
+import re
+from typing import List, Dict, Tuple
+from app.config.constants import LLM_CONTEXT_TOKEN_BUDGET, CHARS_PER_TOKEN
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local token estimate (no tokenizer needed)
+    
+    Takes the larger of a characters-per-token and a words-per-token
+    estimate, which stays close to BPE counts for English prose and
+    does not under-count short, word-heavy text.
+    
+    Args:
+        text: Text to estimate
+    
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+    return math.ceil(max(len(text) / CHARS_PER_TOKEN, len(text.split()) * 1.3))
+
+
+def truncate_to_sentences(text: str, max_tokens: int) -> str:
+    """
+    Truncate text to whole sentences that fit in a token budget
+    
+    Args:
+        text: Text to truncate
+        max_tokens: Token budget
+    
+    Returns:
+        Leading sentences that fit (empty if not even the first one does)
+    """
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_BOUNDARY.split(text):
+        cost = estimate_tokens(sentence)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    return " ".join(kept)
+
+
+class ContextPacker:
+    """
+    Fits retrieved chunks into a token budget
+    
+    Chunks are ranked by similarity (retrieval order for unscored chunks),
+    added whole while they fit, and the first chunk that does not fit is
+    truncated at sentence boundaries to use the remaining budget.
+    """
+    
+    def __init__(self, token_budget: int = LLM_CONTEXT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+    
+    @staticmethod
+    def format_chunk(chunk: Dict) -> str:
+        """Format a chunk the way it appears in the prompt"""
+        return f"[Document: {chunk['document_name']}]\n{chunk['text']}"
+    
+    def pack(self, chunks: List[Dict]) -> Tuple[List[Dict], int]:
+        """
+        Select and truncate chunks to fit the budget
+        
+        Args:
+            chunks: Retrieved chunks (with optional `similarity`)
+        
+        Returns:
+            Tuple of (packed chunks, estimated context tokens)
+        """
+        ranked = sorted(
+            chunks,
+            key=lambda chunk: chunk.get("similarity") if chunk.get("similarity") is not None else float("-inf"),
+            reverse=True
+        )
+        
+        packed = []
+        used = 0
+        for chunk in ranked:
+            cost = estimate_tokens(self.format_chunk(chunk))
+            if used + cost <= self.token_budget:
+                packed.append(chunk)
+                used += cost
+                continue
+            
+            # Lowest-ranked chunk that still gets in: keep its leading sentences
+            header_cost = estimate_tokens(self.format_chunk({**chunk, "text": ""}))
+            truncated = truncate_to_sentences(chunk["text"], self.token_budget - used - header_cost)
+            if truncated:
+                packed_chunk = {**chunk, "text": truncated, "truncated": True}
+                packed.append(packed_chunk)
+                used += estimate_tokens(self.format_chunk(packed_chunk))
+            break
+        
+        return packed, used
@@ -0,0 +1,315 @@
+"""
+Per-request latency tracing for the voice and chat pipelines
+
+A trace records a timestamp for each stage a request passes through.
+Code deep in the pipeline calls `mark("stage")`, which records against the
+trace of the current task (a no-op when nothing is being traced).
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Deque, Dict, Iterator, List, Optional
+from app.config.settings import settings
+from app.config.constants import (
+    TRACE_BUFFER_SIZE,
+    TRACE_HISTOGRAM_BUCKETS_MS,
+    TRACE_EXPORT_MAX_BYTES,
+    TRACE_EXPORT_BACKUPS,
+    TRACE_EXPORT_RETENTION_SECONDS
+)
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Timestamps for the stages of one request"""
+    
+    def __init__(self, kind: str, **attributes):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.attributes = attributes
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.marks: List[List] = []
+        self.finished = False
+    
+    def mark(self, stage: str):
+        """Record that a stage was reached now"""
+        if not self.finished:
+            self.marks.append([stage, round((time.perf_counter() - self._start) * 1000, 3)])
+    
+    def stage_durations(self) -> Dict[str, float]:
+        """Milliseconds between consecutive marks, keyed "previous->stage\""""
+        durations = {}
+        previous, previous_ms = "start", 0.0
+        for stage, at_ms in self.marks:
+            durations[f"{previous}->{stage}"] = round(at_ms - previous_ms, 3)
+            previous, previous_ms = stage, at_ms
+        durations["total"] = previous_ms
+        return durations
+    
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "pid": os.getpid(),
+            "attributes": self.attributes,
+            "marks": self.marks,
+            "durations_ms": self.stage_durations()
+        }
+
+
+def mark(stage: str):
+    """Mark a stage on the current task's trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(stage)
+
+
+@contextmanager
+def use_trace(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Make a trace current for the enclosed code (and tasks it creates)"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def summarize(traces: List[Dict]) -> Dict:
+    """
+    Aggregate traces into per-stage latency histograms
+    
+    Args:
+        traces: Trace dicts (as produced by `Trace.to_dict`)
+    
+    Returns:
+        {kind: {stage: {count, mean_ms, p50_ms, p90_ms, p99_ms, histogram}}}
+    """
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    for trace in traces:
+        stages = samples.setdefault(trace["kind"], {})
+        for stage, duration in trace["durations_ms"].items():
+            stages.setdefault(stage, []).append(duration)
+    
+    def percentile(values: List[float], q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))]
+    
+    summary = {}
+    for kind, stages in samples.items():
+        summary[kind] = {}
+        for stage, values in stages.items():
+            values.sort()
+            counts = [0] * (len(TRACE_HISTOGRAM_BUCKETS_MS) + 1)
+            for value in values:
+                counts[bisect_left(TRACE_HISTOGRAM_BUCKETS_MS, value)] += 1
+            summary[kind][stage] = {
+                "count": len(values),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": percentile(values, 0.5),
+                "p90_ms": percentile(values, 0.9),
+                "p99_ms": percentile(values, 0.99),
+                "histogram": {
+                    **{f"le_{bound}": count for bound, count in zip(TRACE_HISTOGRAM_BUCKETS_MS, counts)},
+                    "le_inf": counts[-1]
+                }
+            }
+    return summary
+
+
+class _TraceLineFormatter(logging.Formatter):
+    """Serializes the trace dict carried by a record (on the writer thread)"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg)
+
+
+def _process_export_path(export_path: str, pid: int) -> str:
+    """Export file of one process ("traces.jsonl" -> "traces.<pid>.jsonl")"""
+    root, extension = os.path.splitext(export_path)
+    return f"{root}.{pid}{extension}"
+
+
+def _export_files(export_path: str) -> List[str]:
+    """Current export file of every process that has written traces"""
+    root, extension = os.path.splitext(export_path)
+    pattern = f"{glob.escape(root)}.*{glob.escape(extension)}"
+    return [path for path in glob.glob(pattern) if path[len(root) + 1:len(path) - len(extension)].isdigit()]
+
+
+def _tail_lines(path: str, limit: int, block_size: int = 65536) -> List[bytes]:
+    """Last `limit` non-empty lines of a file, read backwards from the end"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = b""
+        lines: List[bytes] = []
+        while position > 0 and len(lines) <= limit:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            buffer = f.read(read_size) + buffer
+            lines = buffer.split(b"\n")
+        # The first piece may be a partial line unless the start of the file was reached
+        if position > 0:
+            lines = lines[1:]
+    return [line for line in lines if line.strip()][-limit:]
+
+
+class Tracer:
+    """
+    Collects finished traces
+    
+    Keeps the most recent traces in memory and, when an export path is
+    configured, appends each finished trace as a JSON line to a file of its
+    own process ("traces.<pid>.jsonl" next to the configured path), so traces
+    from every process (API and agent workers) can be analyzed offline.
+    Processes never write or rotate each other's files. Export goes through
+    a queue to a background writer thread (as logging does in queue mode),
+    and each file rolls over at TRACE_EXPORT_MAX_BYTES.
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = settings.TRACING_ENABLED,
+        export_path: Optional[str] = settings.TRACE_EXPORT_PATH,
+        max_traces: int = TRACE_BUFFER_SIZE
+    ):
+        self.enabled = enabled
+        self.export_path = export_path
+        self._traces: Deque[Dict] = deque(maxlen=max_traces)
+        self._export_queue: Optional["queue.SimpleQueue[logging.LogRecord]"] = None
+        self._listener: Optional[QueueListener] = None
+        self._export_lock = threading.Lock()
+    
+    def start(self, kind: str, **attributes) -> Optional[Trace]:
+        """Start a trace (None when tracing is disabled)"""
+        if not self.enabled:
+            return None
+        return Trace(kind, **attributes)
+    
+    @contextmanager
+    def trace(self, kind: str, **attributes) -> Iterator[Optional[Trace]]:
+        """Start a trace, make it current and finish it when the block exits"""
+        trace = self.start(kind, **attributes)
+        try:
+            with use_trace(trace):
+                yield trace
+        finally:
+            self.finish(trace)
+    
+    def finish(self, trace: Optional[Trace]):
+        """Record a finished trace (idempotent)"""
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        record = trace.to_dict()
+        self._traces.append(record)
+        
+        if self.export_path:
+            export_queue = self._export_queue or self._start_export()
+            if export_queue is not None:
+                export_queue.put_nowait(logging.makeLogRecord({"msg": record}))
+    
+    def _start_export(self) -> Optional["queue.SimpleQueue[logging.LogRecord]"]:
+        """Start the background writer for the export file (on first export)"""
+        with self._export_lock:
+            if self._export_queue is None:
+                try:
+                    os.makedirs(os.path.dirname(self.export_path) or ".", exist_ok=True)
+                    self._prune_exports()
+                    handler = RotatingFileHandler(
+                        _process_export_path(self.export_path, os.getpid()),
+                        maxBytes=TRACE_EXPORT_MAX_BYTES,
+                        backupCount=TRACE_EXPORT_BACKUPS,
+                        encoding="utf-8",
+                        delay=True
+                    )
+                except OSError as e:
+                    logger.error(f"Failed to export traces: {e}")
+                    self.export_path = None
+                    return None
+                handler.setFormatter(_TraceLineFormatter())
+                export_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+                self._listener = QueueListener(export_queue, handler)
+                self._listener.start()
+                self._export_queue = export_queue
+                atexit.register(self.close)
+            return self._export_queue
+    
+    def _prune_exports(self):
+        """Delete export files of processes that stopped writing long ago"""
+        cutoff = time.time() - TRACE_EXPORT_RETENTION_SECONDS
+        for path in _export_files(self.export_path):
+            for stale in [path] + [f"{path}.{number}" for number in range(1, TRACE_EXPORT_BACKUPS + 1)]:
+                try:
+                    if os.path.getmtime(stale) < cutoff:
+                        os.remove(stale)
+                except OSError:
+                    pass
+    
+    def close(self):
+        """Write queued traces and stop the export thread"""
+        with self._export_lock:
+            if self._listener is not None:
+                self._listener.stop()
+                for handler in self._listener.handlers:
+                    handler.close()
+                self._listener = None
+                self._export_queue = None
+    
+    def recent(self) -> List[Dict]:
+        """Traces finished in this process (most recent last)"""
+        return list(self._traces)
+    
+    def clear(self):
+        """Drop the traces kept in memory"""
+        self._traces.clear()
+    
+    def exported(self, limit: int = TRACE_BUFFER_SIZE) -> List[Dict]:
+        """
+        Most recent traces from the export files and their rolled-over files (all processes)
+        
+        Only the tail of each file is read, newest file first. Lines that do
+        not decode (e.g. one still being written) are skipped.
+        """
+        if not self.export_path:
+            return []
+        traces: List[Dict] = []
+        for export_file in _export_files(self.export_path):
+            lines: List[bytes] = []
+            paths = [export_file] + [f"{export_file}.{number}" for number in range(1, TRACE_EXPORT_BACKUPS + 1)]
+            for path in paths:
+                if len(lines) >= limit:
+                    break
+                try:
+                    lines = _tail_lines(path, limit - len(lines)) + lines
+                except FileNotFoundError:
+                    # Not rolled over yet, or rolled over while being read
+                    continue
+            for line in lines:
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    continue
+        traces.sort(key=lambda trace: trace.get("started_at", 0))
+        return traces[-limit:]
+
+
+# Create global instance
+tracer = Tracer()
@@ -0,0 +1,139 @@
+"""
+Compact binary framing for the retrieval daemon (Unix socket)
+
+Frame layout (network byte order):
+    op (u8) | request id (u32) | payload length (u32) | payload
+
+Payload layout:
+    meta length (u32) | meta (compact JSON) | vectors (little-endian float32, row-major)
+
+Vectors travel as raw float32 (4 bytes per dimension instead of ~20 as JSON
+text); everything else is small structured metadata.
+"""
+import asyncio
+import json
+import socket
+import struct
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config.constants import SIDECAR_MAX_FRAME_BYTES
+
+HEADER = struct.Struct("!BII")
+META_LENGTH = struct.Struct("!I")
+
+# Request ops
+OP_QUERY = 1
+OP_ADD = 2
+OP_DELETE = 3
+OP_GET = 4
+OP_COUNT = 5
+OP_LEXICAL = 6
+OP_ROUTE = 7
+OP_ADD_SUMMARIES = 8
+
+# Response ops
+OP_RESULT = 0x80
+OP_ERROR = 0x81
+
+Frame = Tuple[int, int, Dict, Optional[np.ndarray]]
+
+
+def encode_frame(
+    op: int,
+    request_id: int,
+    meta: Dict,
+    vectors: Optional[List[List[float]]] = None
+) -> bytes:
+    """
+    Encode one frame
+    
+    Args:
+        op: Operation code
+        request_id: Request ID echoed back in the response
+        meta: JSON-serializable metadata
+        vectors: Optional 2D list/array of floats
+    
+    Returns:
+        Encoded frame bytes
+    """
+    vector_bytes = b""
+    if vectors is not None and len(vectors) > 0:
+        array = np.ascontiguousarray(vectors, dtype="<f4")
+        meta = {**meta, "_shape": list(array.shape)}
+        vector_bytes = array.tobytes()
+    
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    payload_length = META_LENGTH.size + len(meta_bytes) + len(vector_bytes)
+    return b"".join([
+        HEADER.pack(op, request_id, payload_length),
+        META_LENGTH.pack(len(meta_bytes)),
+        meta_bytes,
+        vector_bytes
+    ])
+
+
+def decode_payload(payload: bytes) -> Tuple[Dict, Optional[np.ndarray]]:
+    """
+    Decode a frame payload
+    
+    Args:
+        payload: Payload bytes (without header)
+    
+    Returns:
+        Tuple of (meta, vectors or None)
+    """
+    (meta_length,) = META_LENGTH.unpack_from(payload)
+    meta_end = META_LENGTH.size + meta_length
+    meta = json.loads(payload[META_LENGTH.size:meta_end])
+    
+    shape = meta.pop("_shape", None)
+    vectors = None
+    if shape:
+        vectors = np.frombuffer(payload, dtype="<f4", offset=meta_end).reshape(shape)
+    return meta, vectors
+
+
+def _check_length(payload_length: int):
+    if payload_length > SIDECAR_MAX_FRAME_BYTES:
+        raise ValueError(f"Frame too large: {payload_length} bytes")
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Frame]:
+    """
+    Read one frame from an asyncio stream
+    
+    Returns:
+        Tuple of (op, request id, meta, vectors), or None on clean EOF
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    
+    op, request_id, payload_length = HEADER.unpack(header)
+    _check_length(payload_length)
+    meta, vectors = decode_payload(await reader.readexactly(payload_length))
+    return op, request_id, meta, vectors
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("Retrieval daemon closed the connection")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def recv_frame(sock: socket.socket) -> Frame:
+    """
+    Read one frame from a blocking socket
+    
+    Returns:
+        Tuple of (op, request id, meta, vectors)
+    """
+    op, request_id, payload_length = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    _check_length(payload_length)
+    meta, vectors = decode_payload(_recv_exactly(sock, payload_length))
+    return op, request_id, meta, vectors
@@ -0,0 +1,3 @@
+"""
+Benchmarks and load tests (not imported by the application)
+"""
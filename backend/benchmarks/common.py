@@ -0,0 +1,67 @@
+"""
+Shared helpers for benchmarks and load tests
+"""
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+
+def isolated_environment(prefix: str, **overrides: str) -> str:
+    """
+    Point the app's storage settings at a fresh temp directory
+    
+    Must run before any `app` module is imported (settings are read once).
+    
+    Args:
+        prefix: Temp directory prefix
+        **overrides: Extra environment variables to set
+    
+    Returns:
+        The temp directory
+    """
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ.update({
+        "CHROMA_DB_PATH": os.path.join(workdir, "chroma"),
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+        "DEDUP_INDEX_PATH": os.path.join(workdir, "dedup_index.sqlite3"),
+        "CONFIG_STORE_PATH": os.path.join(workdir, "agent_config.json"),
+        "CONFIG_NOTIFY_DIR": os.path.join(workdir, "config_subscribers"),
+        "METRICS_TEXTFILE_DIR": os.path.join(workdir, "metrics"),
+        "RETRIEVAL_MODE": "embedded",
+        "TRACE_EXPORT_PATH": "",
+        **overrides
+    })
+    os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+    return workdir
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no values)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+
+def run_metadata() -> Dict:
+    """Commit, interpreter and host details stored with every result file"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
@@ -0,0 +1,108 @@
+"""
+Fake OpenAI-compatible server for load tests
+
+Serves /v1/embeddings, /v1/chat/completions and /v1/models with a
+configurable latency, so the agent pipeline can be driven without the real
+API. Embeddings are hashed bags of words: deterministic, and texts sharing
+words are similar, which keeps retrieval results meaningful.
+
+Usage:
+    python -m benchmarks.fake_openai --port 8089 --latency-ms 120 --jitter-ms 40
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+import time
+from typing import List, Union
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+app = FastAPI(title="Fake OpenAI")
+LATENCY = {"mean_ms": 100.0, "jitter_ms": 30.0}
+EMBEDDING_DIMENSION = 1536  # text-embedding-3-small
+
+
+def hashed_embedding(text: str, dimension: int = EMBEDDING_DIMENSION) -> List[float]:
+    """Unit vector of hashed word counts"""
+    vector = np.zeros(dimension, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        bucket = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        vector[bucket % dimension] += 1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        norm = 1.0
+    return (vector / norm).tolist()
+
+
+async def simulated_latency():
+    """Sleep for the configured latency (normal jitter, never negative)"""
+    delay_ms = max(0.0, random.gauss(LATENCY["mean_ms"], LATENCY["jitter_ms"]))
+    await asyncio.sleep(delay_ms / 1000)
+
+
+class EmbeddingRequest(BaseModel):
+    model: str
+    input: Union[str, List[str]]
+
+
+class ChatRequest(BaseModel):
+    model: str
+    messages: List[dict]
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "fake", "object": "model", "created": 0, "owned_by": "fake"}]}
+
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: EmbeddingRequest):
+    await simulated_latency()
+    texts = [request.input] if isinstance(request.input, str) else request.input
+    return {
+        "object": "list",
+        "model": request.model,
+        "data": [
+            {"object": "embedding", "index": i, "embedding": hashed_embedding(text)}
+            for i, text in enumerate(texts)
+        ],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0}
+    }
+
+
+@app.post("/v1/chat/completions")
+async def create_chat_completion(request: ChatRequest):
+    await simulated_latency()
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "This is a simulated answer."},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY["mean_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=LATENCY["jitter_ms"])
+    args = parser.parse_args()
+    
+    LATENCY.update(mean_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Ingestion and retrieval benchmarks on generated corpora
+
+Measures, per corpus size:
+- extract_text: FileProcessor.extract_text on TXT (and PDF up to --pdf-max-size)
+- chunk_text: ChunkingStrategy.chunk_text on the extracted text
+- ingest_document: IngestionService.ingest_document end to end
+- vector_query: VectorRepository.query latency against the growing collection
+- chat_query: POST /api/chat/query through the FastAPI app
+
+Embeddings come from the local provider (EMBEDDING_PROVIDER=local) and the
+LLM client is replaced in-process by a stub with fixed completions, so runs
+are reproducible and measure this code rather than the network. Corpora are generated from a fixed seed.
+
+Results are written as JSON (one record per benchmark and corpus). Pass
+--baseline with an earlier result file to compare against another commit.
+
+Usage (from backend/):
+    python -m benchmarks.ingest_retrieval --sizes 1MB,10MB,100MB --output bench.json
+    python -m benchmarks.ingest_retrieval --sizes 1MB,10MB --baseline bench.json
+    python -m benchmarks.ingest_retrieval --sizes 1MB,1GB --ingest-max-size 1GB   # needs several GB of RAM
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from benchmarks.common import isolated_environment, percentile, run_metadata
+
+SIZE_UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+VOCABULARY_SIZE = 5000
+BLOCK_BYTES = 1024 ** 2  # Corpora are generated in independently seeded 1 MB blocks
+PDF_PAGE_CHARS = 3000
+QUERY_WORDS = 20
+
+
+def parse_size(value: str) -> int:
+    """Parse sizes like "500KB", "10MB" or "1GB" into bytes"""
+    value = value.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def format_size(size: int) -> str:
+    for unit, factor in reversed(list(SIZE_UNITS.items())):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return f"{size}B"
+
+
+def build_vocabulary(seed: int) -> List[str]:
+    """Pronounceable pseudo-words (so chunking sees realistic word lengths)"""
+    rng = random.Random(seed)
+    syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+
+def generate_block(vocabulary: List[str], weights: List[float], seed: int, size: int) -> str:
+    """One block of paragraphs with a Zipf-like word distribution"""
+    rng = random.Random(seed)
+    paragraphs, length = [], 0
+    while length < size:
+        sentences = []
+        for _ in range(rng.randint(3, 7)):
+            words = rng.choices(vocabulary, weights=weights, k=rng.randint(8, 20))
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:size]
+
+
+def generate_corpus(path: str, size: int, seed: int) -> str:
+    """Write a TXT corpus of `size` bytes (ASCII, so bytes == characters)"""
+    vocabulary = build_vocabulary(seed)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    with open(path, "w", encoding="utf-8") as f:
+        for block, start in enumerate(range(0, size, BLOCK_BYTES)):
+            f.write(generate_block(vocabulary, weights, seed + block, min(BLOCK_BYTES, size - start)))
+    return path
+
+
+def generate_pdf(txt_path: str, pdf_path: str) -> str:
+    """Render a TXT corpus into a PDF (one text box per page)"""
+    import pymupdf
+    
+    with open(txt_path, encoding="utf-8") as f:
+        text = f.read()
+    document = pymupdf.open()
+    for start in range(0, len(text), PDF_PAGE_CHARS):
+        page = document.new_page()
+        page.insert_textbox(page.rect + (36, 36, -36, -36), text[start:start + PDF_PAGE_CHARS], fontsize=6)
+    document.save(pdf_path)
+    document.close()
+    return pdf_path
+
+
+def generate_queries(text: str, count: int, seed: int) -> List[str]:
+    """Question-shaped queries built from phrases that occur in the corpus"""
+    rng = random.Random(seed)
+    words = text[:BLOCK_BYTES].split()
+    queries = []
+    for _ in range(count):
+        # Long enough to clear RAG_MIN_SIMILARITY against a ~1000 character chunk
+        start = rng.randrange(len(words) - QUERY_WORDS)
+        queries.append(f"What does the document say about {' '.join(words[start:start + QUERY_WORDS])}?")
+    return queries
+
+
+class StubCompletions:
+    """Stands in for AsyncOpenAI().chat.completions (deterministic answers)"""
+    
+    async def create(self, model: str, messages: List[Dict], stream: bool = False, **kwargs):
+        digest = hashlib.blake2b(messages[-1]["content"].encode("utf-8"), digest_size=4).hexdigest()
+        answer = f"Stub answer {digest}."
+        if not stream:
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=answer))],
+                usage=SimpleNamespace(prompt_tokens=0, completion_tokens=0)
+            )
+        
+        async def chunks():
+            for token in answer.split(" "):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token + " "))], usage=None)
+            yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=0, completion_tokens=0))
+        return chunks()
+
+
+def install_stubs():
+    """Swap the OpenAI client of the LLM service for the local stub"""
+    from app.services.llm_service import llm_service
+    
+    llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions()))
+
+
+def timed(durations: List[float]) -> Dict:
+    """Summary of repeated wall-clock timings (seconds)"""
+    return {
+        "runs": len(durations),
+        "seconds_min": round(min(durations), 4),
+        "seconds_median": round(statistics.median(durations), 4)
+    }
+
+
+def latency_summary(durations_ms: List[float]) -> Dict:
+    return {
+        "requests": len(durations_ms),
+        "p50_ms": percentile(durations_ms, 0.5),
+        "p90_ms": percentile(durations_ms, 0.9),
+        "p99_ms": percentile(durations_ms, 0.99),
+        "throughput_per_s": round(len(durations_ms) / (sum(durations_ms) / 1000), 2)
+    }
+
+
+async def bench_extract(path: str, size: int, repeat: int):
+    from app.utils.file_utils import FileProcessor
+    
+    durations, text = [], ""
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        text = await FileProcessor.extract_text(path)
+        durations.append(time.perf_counter() - started_at)
+    result = timed(durations)
+    result["mb_per_s"] = round(size / SIZE_UNITS["MB"] / min(durations), 2)
+    result["characters"] = len(text)
+    return result, text
+
+
+def bench_chunk(text: str, repeat: int) -> Dict:
+    from app.utils.chunking import ChunkingStrategy
+    
+    strategy = ChunkingStrategy()
+    durations, chunks = [], []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        chunks = strategy.chunk_text(text, metadata={"document_id": "bench", "document_name": "bench.txt"})
+        durations.append(time.perf_counter() - started_at)
+    result = timed(durations)
+    result["mb_per_s"] = round(len(text) / SIZE_UNITS["MB"] / min(durations), 2)
+    result["chunks"] = len(chunks)
+    return result
+
+
+async def bench_ingest(path: str, size: int, upload_dir: str) -> Dict:
+    from app.services.ingestion_service import ingestion_service
+    
+    # Ingestion deletes its source file, so ingest a copy
+    upload_path = os.path.join(upload_dir, os.path.basename(path))
+    shutil.copyfile(path, upload_path)
+    started_at = time.perf_counter()
+    ingested = await ingestion_service.ingest_document(upload_path, str(uuid.uuid4()), os.path.basename(path))
+    elapsed = time.perf_counter() - started_at
+    return {
+        **timed([elapsed]),
+        "mb_per_s": round(size / SIZE_UNITS["MB"] / elapsed, 2),
+        "chunks": ingested["total_chunks"],
+        "chunks_per_s": round(ingested["total_chunks"] / elapsed, 1)
+    }
+
+
+def bench_vector_query(queries: List[str], n_results: int) -> Dict:
+    from app.repositories.vector_repository import vector_repository
+    from app.services.embedding_service import embedding_service
+    
+    embeddings = embedding_service.provider.embed_sync(queries).tolist()
+    durations = []
+    for embedding in embeddings:
+        started_at = time.perf_counter()
+        vector_repository.query(query_embeddings=[embedding], n_results=n_results)
+        durations.append((time.perf_counter() - started_at) * 1000)
+    return {**latency_summary(durations), "collection_chunks": vector_repository.count()}
+
+
+def bench_chat_query(client, queries: List[str]) -> Dict:
+    from app.config.settings import settings
+    
+    durations = []
+    for query in queries:
+        started_at = time.perf_counter()
+        response = client.post(f"{settings.API_V1_PREFIX}/chat/query", json={"question": query})
+        durations.append((time.perf_counter() - started_at) * 1000)
+        response.raise_for_status()
+    return latency_summary(durations)
+
+
+def record(results: List[Dict], benchmark: str, corpus: str, size: int, values: Dict):
+    results.append({"benchmark": benchmark, "corpus": corpus, "bytes": size, **values})
+    headline = values.get("mb_per_s", values.get("p50_ms"))
+    unit = "MB/s" if "mb_per_s" in values else "ms p50"
+    print(f"{benchmark:>16} {corpus:>12} {headline!s:>12} {unit}", flush=True)
+
+
+async def run(args) -> List[Dict]:
+    from fastapi.testclient import TestClient
+    from app.config.constants import RAG_TOP_K
+    from app.main import app
+    
+    install_stubs()
+    corpus_dir = os.path.join(args.workdir, "corpora")
+    os.makedirs(corpus_dir, exist_ok=True)
+    results: List[Dict] = []
+    
+    with TestClient(app) as client:
+        for size in sorted(args.sizes):
+            name = format_size(size)
+            txt_path = generate_corpus(os.path.join(corpus_dir, f"corpus_{name}.txt"), size, args.seed)
+            
+            extracted, text = await bench_extract(txt_path, size, args.repeat)
+            record(results, "extract_text", f"{name}.txt", size, extracted)
+            queries = generate_queries(text, args.queries, args.seed)
+            if size <= args.pdf_max_size:
+                pdf_path = generate_pdf(txt_path, os.path.join(corpus_dir, f"corpus_{name}.pdf"))
+                extracted_pdf, _ = await bench_extract(pdf_path, size, args.repeat)
+                record(results, "extract_text", f"{name}.pdf", size, extracted_pdf)
+            
+            record(results, "chunk_text", f"{name}.txt", size, bench_chunk(text, args.repeat))
+            del text
+            
+            if size > args.ingest_max_size:
+                continue
+            record(results, "ingest_document", f"{name}.txt", size, await bench_ingest(txt_path, size, os.environ["UPLOAD_DIR"]))
+            record(results, "vector_query", f"{name}.txt", size, bench_vector_query(queries, RAG_TOP_K))
+            record(results, "chat_query", f"{name}.txt", size, bench_chat_query(client, queries[:args.chat_queries]))
+    return results
+
+
+def headline_metric(result: Dict) -> Optional[float]:
+    """Lower-is-better number compared against the baseline"""
+    return result.get("seconds_min", result.get("p50_ms"))
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> int:
+    """Print the change against a baseline result file; returns the number of regressions"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["benchmark"], r["corpus"]): r for r in json.load(f)["results"]}
+    
+    regressions = 0
+    print(f"\n{'benchmark':>16} {'corpus':>12} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for result in results:
+        previous = baseline.get((result["benchmark"], result["corpus"]))
+        if previous is None or not headline_metric(previous):
+            continue
+        ratio = headline_metric(result) / headline_metric(previous)
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(
+            f"{result['benchmark']:>16} {result['corpus']:>12} {headline_metric(previous):>10} "
+            f"{headline_metric(result):>10} {ratio:>7.2f}{flag}"
+        )
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1MB,10MB,100MB", help="Comma-separated corpus sizes (KB/MB/GB)")
+    parser.add_argument("--ingest-max-size", default="100MB", help="Largest corpus to ingest/query (ingestion holds all chunks in memory)")
+    parser.add_argument("--pdf-max-size", default="10MB", help="Largest corpus also benchmarked as PDF")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of extract_text/chunk_text per corpus")
+    parser.add_argument("--queries", type=int, default=200, help="Vector queries per corpus")
+    parser.add_argument("--chat-queries", type=int, default=50, help="/chat/query requests per corpus")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Slowdown ratio above 1 reported as a regression")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    args.sizes = [parse_size(value) for value in args.sizes.split(",")]
+    args.ingest_max_size = parse_size(args.ingest_max_size)
+    args.pdf_max_size = parse_size(args.pdf_max_size)
+    return args
+
+
+def main():
+    args = parse_args()
+    
+    # Isolated state for this run; must be set before the app modules load settings.
+    # The completion cache is off so every /chat/query runs the full pipeline.
+    args.workdir = isolated_environment(
+        "voice-ai-bench-",
+        EMBEDDING_PROVIDER="local",
+        LLM_CACHE_ENABLED="false",
+        LOG_LEVEL=args.log_level
+    )
+    
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+    
+    config = {key: value for key, value in vars(args).items() if key != "workdir"}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": run_metadata(), "config": config, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
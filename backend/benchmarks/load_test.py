@@ -0,0 +1,321 @@
+"""
+Load test for the LiveKit agent: many concurrent fake voice sessions
+
+Drives LiveKitAgentService.entrypoint for N sessions in one process with
+stub LiveKit room/participant/session objects. Each session replays
+synthetic `user_input_transcribed` events (interim words, then the final
+transcript) against a seeded ChromaDB, with OpenAI calls served by
+benchmarks.fake_openai at a configurable latency.
+
+For each concurrency level it reports throughput, per-stage latency
+percentiles (from the voice_turn traces) and event-loop lag. LiveKit runs
+each job in its own process by default, so this measures how many rooms a
+single job process can carry (e.g. in thread executor mode or with
+several rooms per process), and how retrieval behaves under contention.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --sessions 1,10,25,50 --turns 5 --latency-ms 120
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from benchmarks.common import isolated_environment, percentile, run_metadata
+
+QUESTIONS = [
+    "What is the refund policy for annual plans",
+    "How many vacation days do new employees get",
+    "Does the premium plan include single sign on",
+    "What are the shipping times to Canada",
+    "How do I reset my account password",
+    "What is the warranty period for the headphones",
+    "Which regions does the data center cover",
+    "How long does onboarding take for enterprise customers",
+]
+FOLLOWUPS = ["and what about the second one", "why is that", "tell me more about it"]
+ACKNOWLEDGEMENTS = ["okay", "thanks", "got it", "can you repeat that"]
+
+CORPUS = {
+    "billing.txt": "Refunds for annual plans are prorated within thirty days. The premium plan includes single sign on and audit logs. Monthly plans are not refundable.",
+    "hr_handbook.txt": "New employees get twenty vacation days per year. Onboarding for enterprise customers takes two weeks. Remote work requires manager approval.",
+    "shipping.txt": "Shipping times to Canada are five to seven business days. Express shipping is available for most regions. The data center covers Europe and North America.",
+    "support.txt": "To reset your account password open settings and choose security. The warranty period for the headphones is two years. Damaged items are replaced free of charge.",
+}
+
+
+class FakeParticipant:
+    """Local participant that counts published data"""
+    
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+    
+    async def publish_data(self, payload, *, reliable: bool = True, destination_identities=None, topic: str = ""):
+        self.messages += 1
+        self.bytes += len(payload)
+
+
+class FakeRoom:
+    def __init__(self, name: str):
+        self.name = name
+        self.local_participant = FakeParticipant()
+        self.session: Optional["FakeSession"] = None
+
+
+class FakeJobContext:
+    """Just enough of livekit.agents.JobContext for the agent entrypoint"""
+    
+    def __init__(self, room_name: str, userdata: Dict):
+        self.room = FakeRoom(room_name)
+        self.proc = SimpleNamespace(userdata=userdata)
+        self._shutdown_callbacks = []
+    
+    async def connect(self, **kwargs):
+        pass
+    
+    def add_shutdown_callback(self, callback):
+        self._shutdown_callbacks.append(callback)
+    
+    async def shutdown(self):
+        for callback in self._shutdown_callbacks:
+            await callback()
+
+
+class FakeSession:
+    """AgentSession stand-in: records handlers so the test can emit events"""
+    
+    def __init__(self, **kwargs):
+        self._handlers: Dict[str, List] = {}
+    
+    def on(self, event: str):
+        def register(handler):
+            self._handlers.setdefault(event, []).append(handler)
+            return handler
+        return register
+    
+    def emit(self, event: str, payload):
+        for handler in self._handlers.get(event, []):
+            handler(payload)
+    
+    async def start(self, room: FakeRoom, agent):
+        # No realtime session behind the agent: accept context updates locally
+        async def update_chat_ctx(chat_ctx, **kwargs):
+            agent._chat_ctx = chat_ctx
+        
+        async def update_instructions(instructions):
+            agent._instructions = instructions
+        
+        agent.update_chat_ctx = update_chat_ctx
+        agent.update_instructions = update_instructions
+        room.session = self
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer fires on the event loop"""
+    
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected) * 1000)
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def start_fake_openai(port: int, latency_ms: float, jitter_ms: float) -> subprocess.Popen:
+    """Run the fake OpenAI server in a separate process and wait until it is up"""
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_openai",
+            "--port", str(port), "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms)
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/v1/models", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Fake OpenAI server did not start")
+
+
+def pick_utterance(rng: random.Random, turn: int) -> str:
+    """Mostly questions, with follow-ups and acknowledgements mixed in"""
+    roll = rng.random()
+    if turn > 0 and roll < 0.2:
+        return rng.choice(FOLLOWUPS)
+    if roll < 0.35:
+        return rng.choice(ACKNOWLEDGEMENTS)
+    return rng.choice(QUESTIONS)
+
+
+async def run_session(service, index: int, args, userdata: Dict):
+    """One fake room: connect, replay transcripts, shut down"""
+    rng = random.Random(args.seed + index)
+    ctx = FakeJobContext(f"load-{index}", userdata)
+    await service.entrypoint(ctx)
+    session = ctx.room.session
+    
+    # Stagger session starts so turns do not arrive in lockstep
+    await asyncio.sleep(rng.uniform(0, args.think_time))
+    for turn in range(args.turns):
+        words = pick_utterance(rng, turn).split()
+        for count in range(1, len(words)):
+            session.emit("user_input_transcribed", SimpleNamespace(transcript=" ".join(words[:count]), is_final=False))
+            await asyncio.sleep(args.word_interval)
+        session.emit("user_input_transcribed", SimpleNamespace(transcript=" ".join(words), is_final=True))
+        await asyncio.sleep(args.think_time)
+    
+    await ctx.shutdown()
+    return ctx.room.local_participant
+
+
+async def run_level(service, sessions: int, args, userdata: Dict) -> Dict:
+    """Run one concurrency level and aggregate its traces"""
+    from app.utils.tracing import tracer, summarize
+    
+    tracer.clear()
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started_at = time.perf_counter()
+    participants = await asyncio.gather(*(run_session(service, i, args, userdata) for i in range(sessions)))
+    elapsed = time.perf_counter() - started_at
+    await monitor.stop()
+    
+    traces = [trace for trace in tracer.recent() if trace["kind"] == "voice_turn"]
+    publish_ms = [
+        at_ms for trace in traces for stage, at_ms in trace["marks"] if stage == "data_publish"
+    ]
+    stages = summarize(traces).get("voice_turn", {})
+    return {
+        "sessions": sessions,
+        "turns": len(traces),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_turns_per_s": round(len(traces) / elapsed, 2),
+        "turn_to_publish_ms": {
+            "p50": percentile(publish_ms, 0.5),
+            "p90": percentile(publish_ms, 0.9),
+            "p99": percentile(publish_ms, 0.99)
+        },
+        "loop_lag_ms": {
+            "p50": percentile(monitor.samples, 0.5),
+            "p99": percentile(monitor.samples, 0.99),
+            "max": round(max(monitor.samples), 2) if monitor.samples else None
+        },
+        "published_bytes": sum(participant.bytes for participant in participants),
+        "stages": {
+            stage: {"count": values["count"], "p50_ms": values["p50_ms"], "p99_ms": values["p99_ms"]}
+            for stage, values in stages.items()
+        }
+    }
+
+
+async def seed_corpus(upload_dir: str):
+    """Ingest the synthetic corpus through the normal ingestion path"""
+    from app.services.ingestion_service import ingestion_service
+    
+    for filename, text in CORPUS.items():
+        path = os.path.join(upload_dir, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        await ingestion_service.ingest_document(path, str(uuid.uuid4()), filename)
+
+
+def print_level(result: Dict):
+    latency, lag = result["turn_to_publish_ms"], result["loop_lag_ms"]
+    print(
+        f"{result['sessions']:>8} {result['turns']:>6} {result['throughput_turns_per_s']:>10} "
+        f"{latency['p50']!s:>9} {latency['p99']!s:>9} {lag['p50']!s:>9} {lag['p99']!s:>9} {lag['max']!s:>9}"
+    )
+
+
+async def run(args):
+    from app.services import livekit_agent_service as agent_module
+    
+    # Stub out LiveKit/OpenAI realtime objects the entrypoint creates
+    agent_module.AgentSession = FakeSession
+    agent_module.openai = SimpleNamespace(realtime=SimpleNamespace(RealtimeModel=lambda **kwargs: None))
+    
+    await seed_corpus(os.environ["UPLOAD_DIR"])
+    service = agent_module.LiveKitAgentService()
+    service.warm_index()
+    userdata = {"agent_service": service}
+    
+    print(f"{'sessions':>8} {'turns':>6} {'turns/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'lag p50':>9} {'lag p99':>9} {'lag max':>9}")
+    results = []
+    for sessions in args.sessions:
+        result = await run_level(service, sessions, args, userdata)
+        print_level(result)
+        results.append(result)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="1,5,10,25,50", help="Comma-separated concurrency levels")
+    parser.add_argument("--turns", type=int, default=5, help="User turns per session")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Seconds between turns")
+    parser.add_argument("--word-interval", type=float, default=0.08, help="Seconds between interim transcripts")
+    parser.add_argument("--latency-ms", type=float, default=120.0, help="Fake OpenAI mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=40.0, help="Fake OpenAI latency jitter")
+    parser.add_argument("--port", type=int, default=8089, help="Port for the fake OpenAI server")
+    parser.add_argument("--openai-base-url", help="Use an already running OpenAI-compatible server")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+    args.sessions = [int(value) for value in args.sessions.split(",")]
+    return args
+
+
+def main():
+    args = parse_args()
+    
+    # Isolated state for this run; must be set before the app modules load settings
+    isolated_environment(
+        "voice-ai-load-",
+        OPENAI_BASE_URL=args.openai_base_url or f"http://127.0.0.1:{args.port}/v1",
+        LOG_LEVEL=args.log_level
+    )
+    
+    server = None if args.openai_base_url else start_fake_openai(args.port, args.latency_ms, args.jitter_ms)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": run_metadata(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
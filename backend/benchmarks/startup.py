@@ -0,0 +1,178 @@
+"""
+Import-time and API startup benchmark
+
+Measures, in fresh interpreters (so nothing is cached in sys.modules):
+- import: wall time of `import <module>` for each --modules entry, plus the
+  slowest imports reported by `python -X importtime`
+- server: a uvicorn process serving app.main, timed from launch until
+  /health answers (serving) and until /ready answers 200 (warmup done),
+  with the per-step warmup timings reported by /ready
+
+State goes to a temp directory and embeddings use the local provider, so
+warmup does not depend on the network (the OpenAI LLM client is created
+but not contacted).
+
+Usage (from backend/):
+    python -m benchmarks.startup --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+from benchmarks.common import isolated_environment, run_metadata
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def subprocess_env() -> Dict[str, str]:
+    """Current environment with the backend importable from any working directory"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def time_import(module: str, workdir: str) -> float:
+    """Seconds to import a module in a fresh interpreter"""
+    code = (
+        "import time; started_at = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - started_at)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=workdir, env=subprocess_env(), capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, workdir: str, top: int) -> List[Dict]:
+    """Top-level packages whose modules took longest to import (self time, -X importtime)"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=workdir, env=subprocess_env(), capture_output=True, text=True, check=True
+    ).stderr
+    totals: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, _, name = line[len("import time:"):].split("|")
+        if not self_time.strip().isdigit():
+            continue  # header line
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_time)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": package, "ms": round(us / 1000, 1)} for package, us in ranked]
+
+
+def bench_import(module: str, workdir: str, repeat: int, top: int) -> Dict:
+    durations = [time_import(module, workdir) for _ in range(repeat)]
+    return {
+        "benchmark": "import",
+        "module": module,
+        "runs": repeat,
+        "seconds_min": round(min(durations), 4),
+        "seconds_median": round(statistics.median(durations), 4),
+        "slowest_imports": slowest_imports(module, workdir, top)
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def poll(url: str, deadline: float, expect_status: int = 200) -> Optional[Dict]:
+    """GET a URL until it returns `expect_status` (JSON body) or the deadline passes"""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == expect_status:
+                    return json.loads(response.read())
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def bench_server(workdir: str, timeout: float) -> Dict:
+    """Launch uvicorn and time it until serving and until ready"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=subprocess_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started_at + timeout
+        health = poll(f"{base_url}/health", deadline)
+        serving_seconds = time.perf_counter() - started_at
+        ready = poll(f"{base_url}/ready", deadline)
+        ready_seconds = time.perf_counter() - started_at
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    if health is None or ready is None:
+        raise RuntimeError(f"Server did not become {'ready' if health else 'healthy'} within {timeout:.0f}s")
+    return {
+        "benchmark": "server",
+        "seconds_to_serving": round(serving_seconds, 4),
+        "seconds_to_ready": round(ready_seconds, 4),
+        "warmup": ready["data"]
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", default="app.main",
+                        help="Comma-separated modules to time the import of")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=8, help="Slowest imported packages to report")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the server")
+    parser.add_argument("--skip-server", action="store_true", help="Only measure imports")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = isolated_environment("voice-ai-startup-", EMBEDDING_PROVIDER="local", LOG_LEVEL=args.log_level)
+    
+    results = []
+    try:
+        for module in filter(None, args.modules.split(",")):
+            result = bench_import(module, workdir, args.repeat, args.top)
+            results.append(result)
+            slowest = ", ".join(f"{item['package']} {item['ms']:.0f} ms" for item in result["slowest_imports"][:3])
+            print(f"{'import ' + module:>24}  {result['seconds_median'] * 1000:8.0f} ms median  ({slowest})")
+        
+        if not args.skip_server:
+            for run in range(args.repeat):
+                result = bench_server(workdir, args.timeout)
+                result["run"] = run
+                results.append(result)
+                print(
+                    f"{'server':>24}  {result['seconds_to_serving'] * 1000:8.0f} ms to serving"
+                    f"  {result['seconds_to_ready'] * 1000:8.0f} ms to ready"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    if args.output:
+        config = vars(args)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": run_metadata(), "config": config, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
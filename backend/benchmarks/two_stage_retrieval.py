@@ -0,0 +1,238 @@
+"""
+Two-stage (document-routed) retrieval versus flat search
+
+Builds a corpus of --documents generated documents (default 10,000) grouped
+into topics: each document mixes words of its topic, words of its own and
+common words, so neighbouring documents overlap the way real collections
+do. Queries are phrases taken from random chunks.
+
+For each backend it measures, per query (one query per call, as in
+production):
+- flat: VectorRepository.query over every chunk
+- two_stage (one row per --route value M): route_documents to the top M
+  documents by summary vector, then query only their chunks
+and reports latency percentiles, recall@k of two-stage against the flat
+results, and how often the query's source document was routed to.
+
+Backends:
+- snapshot: exact NumPy search over a published index snapshot
+  (RETRIEVAL_MODE=snapshot); summary vectors are derived from the snapshot
+- embedded: ChromaDB (HNSW); summary vectors are built by
+  rebuild_document_summaries. Loading 40k chunks takes minutes on one core.
+
+Embeddings come from the local provider, so no API key or network is needed.
+
+Usage (from backend/):
+    python -m benchmarks.two_stage_retrieval --documents 10000 --output two_stage.json
+    python -m benchmarks.two_stage_retrieval --documents 20000 --backends snapshot --route 10,20,50
+"""
+import argparse
+import json
+import random
+import shutil
+import time
+from typing import Dict, List
+from benchmarks.common import isolated_environment, percentile, run_metadata
+from benchmarks.ingest_retrieval import build_vocabulary
+
+TOPIC_WORDS = 40
+DOCUMENT_WORDS = 15
+CHUNK_WORDS = 150
+QUERY_WORDS = 12
+# Share of a chunk's words drawn from its topic, its document and common words
+WORD_MIX = (0.45, 0.25, 0.30)
+
+
+def generate_corpus(documents: int, chunks_per_document: int, topics: int, seed: int) -> List[Dict]:
+    """Chunk records ({"text", "metadata"}) for a topical document collection"""
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(seed)
+    common = vocabulary[:500]
+    topic_words = [rng.sample(vocabulary, TOPIC_WORDS) for _ in range(topics)]
+    chunks = []
+    for document in range(documents):
+        topic = topic_words[rng.randrange(topics)]
+        own = rng.sample(vocabulary, DOCUMENT_WORDS)
+        for chunk_index in range(chunks_per_document):
+            words = [
+                rng.choice(rng.choices((topic, own, common), weights=WORD_MIX)[0])
+                for _ in range(CHUNK_WORDS)
+            ]
+            chunks.append({
+                "text": " ".join(words),
+                "metadata": {
+                    "document_id": f"doc-{document:06d}",
+                    "document_name": f"document-{document}.txt",
+                    "chunk_index": chunk_index,
+                    "total_chunks": chunks_per_document
+                }
+            })
+    return chunks
+
+
+def generate_queries(chunks: List[Dict], count: int, seed: int) -> List[Dict]:
+    """Phrases from random chunks, with the document they came from"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for chunk in rng.sample(chunks, count):
+        words = chunk["text"].split()
+        start = rng.randrange(len(words) - QUERY_WORDS)
+        queries.append({
+            "text": " ".join(words[start:start + QUERY_WORDS]),
+            "document_id": chunk["metadata"]["document_id"]
+        })
+    return queries
+
+
+def latency_summary(durations_ms: List[float]) -> Dict:
+    return {
+        "p50_ms": percentile(durations_ms, 0.5),
+        "p95_ms": percentile(durations_ms, 0.95),
+        "p99_ms": percentile(durations_ms, 0.99),
+        "mean_ms": round(sum(durations_ms) / len(durations_ms), 3)
+    }
+
+
+def bench_backend(repository, query_vectors, queries: List[Dict], top_k: int, routes: List[int]) -> List[Dict]:
+    """Flat and two-stage latency and recall for one repository"""
+    # First calls build lazy state (snapshot summary index, HNSW pages)
+    repository.query(query_embeddings=[query_vectors[0]], n_results=top_k, include=["distances"])
+    repository.route_documents([query_vectors[0]], max(routes))
+    
+    flat_ids, durations = [], []
+    for vector in query_vectors:
+        started_at = time.perf_counter()
+        results = repository.query(query_embeddings=[vector], n_results=top_k, include=["distances"])
+        durations.append((time.perf_counter() - started_at) * 1000)
+        flat_ids.append(results["ids"][0])
+    results = [{"strategy": "flat", **latency_summary(durations)}]
+    
+    for route in routes:
+        durations, route_durations, recalls, routed_hits = [], [], [], 0
+        for vector, query, expected in zip(query_vectors, queries, flat_ids):
+            started_at = time.perf_counter()
+            document_ids = repository.route_documents([vector], route)[0]
+            routed_at = time.perf_counter()
+            found = repository.query(
+                query_embeddings=[vector],
+                n_results=top_k,
+                include=["distances"],
+                where={"document_id": {"$in": document_ids}}
+            )["ids"][0]
+            durations.append((time.perf_counter() - started_at) * 1000)
+            route_durations.append((routed_at - started_at) * 1000)
+            recalls.append(len(set(found) & set(expected)) / max(1, len(expected)))
+            routed_hits += query["document_id"] in document_ids
+        results.append({
+            "strategy": "two_stage",
+            "route_documents": route,
+            **latency_summary(durations),
+            "route_p50_ms": percentile(route_durations, 0.5),
+            f"recall_at_{top_k}": round(sum(recalls) / len(recalls), 4),
+            "source_document_routed": round(routed_hits / len(queries), 4)
+        })
+    return results
+
+
+def build_snapshot_repository(workdir: str, chunks: List[Dict], vectors):
+    from app.config.constants import EMBEDDING_DIMENSION
+    from app.repositories.snapshot_repository import SnapshotVectorRepository
+    from app.services.embedding_providers import embedding_identity
+    from app.utils.index_snapshot import SnapshotPublisher
+    
+    snapshot_dir = f"{workdir}/snapshots"
+    SnapshotPublisher(
+        snapshot_dir, keep=1, dimension=EMBEDDING_DIMENSION, embedding=embedding_identity()
+    ).publish(
+        ids=[f"{chunk['metadata']['document_id']}_{chunk['metadata']['chunk_index']}" for chunk in chunks],
+        vectors=vectors,
+        documents=[chunk["text"] for chunk in chunks],
+        metadatas=[chunk["metadata"] for chunk in chunks]
+    )
+    # Read-only benchmark: no daemon to forward writes to
+    repository = SnapshotVectorRepository(snapshot_dir, writer=None)
+    started_at = time.perf_counter()
+    repository._summary_index(repository.snapshot())
+    return repository, {"summary_index_seconds": round(time.perf_counter() - started_at, 3)}
+
+
+def build_embedded_repository(chunks: List[Dict], vectors):
+    from app.repositories.vector_repository import VectorRepository
+    
+    repository = VectorRepository()
+    started_at = time.perf_counter()
+    repository.write_records(
+        ids=[f"{chunk['metadata']['document_id']}_{chunk['metadata']['chunk_index']}" for chunk in chunks],
+        embeddings=vectors,
+        documents=[chunk["text"] for chunk in chunks],
+        metadatas=[chunk["metadata"] for chunk in chunks],
+        upsert=False
+    )
+    loaded_at = time.perf_counter()
+    repository.rebuild_document_summaries()
+    return repository, {
+        "load_seconds": round(loaded_at - started_at, 1),
+        "summaries_seconds": round(time.perf_counter() - loaded_at, 1)
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--chunks-per-document", type=int, default=4)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--route", default="10,20,50", help="Comma-separated document counts for the first stage")
+    parser.add_argument("--backends", default="snapshot,embedded", help="Comma-separated: snapshot, embedded")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = isolated_environment("voice-ai-two-stage-", EMBEDDING_PROVIDER="local", LOG_LEVEL=args.log_level)
+    from app.services.embedding_providers import LocalEmbeddingProvider
+    
+    routes = [int(value) for value in args.route.split(",") if value]
+    try:
+        started_at = time.perf_counter()
+        chunks = generate_corpus(args.documents, args.chunks_per_document, args.topics, args.seed)
+        queries = generate_queries(chunks, args.queries, args.seed)
+        provider = LocalEmbeddingProvider()
+        vectors = provider.embed_sync([chunk["text"] for chunk in chunks])
+        query_vectors = provider.embed_sync([query["text"] for query in queries]).tolist()
+        print(f"Corpus: {args.documents} documents, {len(chunks)} chunks ({time.perf_counter() - started_at:.1f}s)")
+        
+        results = []
+        for backend in filter(None, args.backends.split(",")):
+            if backend == "snapshot":
+                repository, setup = build_snapshot_repository(workdir, chunks, vectors)
+            elif backend == "embedded":
+                repository, setup = build_embedded_repository(chunks, vectors)
+            else:
+                raise ValueError(f"Unknown backend: {backend}")
+            print(f"{backend}: {setup}")
+            for result in bench_backend(repository, query_vectors, queries, args.top_k, routes):
+                result.update(backend=backend, documents=args.documents, chunks=len(chunks), setup=setup)
+                results.append(result)
+                label = result["strategy"] if result["strategy"] == "flat" else f"two_stage M={result['route_documents']}"
+                recall = result.get(f"recall_at_{args.top_k}")
+                print(
+                    f"{backend:>9} {label:>18}  p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms"
+                    + (f"  recall@{args.top_k} {recall:.3f}  source routed {result['source_document_routed']:.3f}"
+                       if recall is not None else "")
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": run_metadata(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,30 @@
 import React, { useState } from 'react'
 import { BookOpen, ChevronDown, ChevronUp } from 'lucide-react'
 import { useVoiceStore } from '../../stores/useVoiceStore'
+import { documentService } from '../../services/documents'
 
 const SourcesPanel: React.FC = () => {
     const { sources } = useVoiceStore()
     const [expandedIndex, setExpandedIndex] = useState<number | null>(null)
+    const [fullText, setFullText] = useState<Record<string, string>>({})
+
+    // Compact payloads only carry snippets: fetch the full chunk on expand
+    const toggleSource = async (index: number) => {
+        const next = expandedIndex === index ? null : index
+        setExpandedIndex(next)
+
+        const source = next === null ? null : sources[next]
+        if (!source || source.text || !source.chunk_id || fullText[source.chunk_id]) return
+
+        try {
+            const [chunk] = await documentService.getChunks([source.chunk_id])
+            if (chunk) {
+                setFullText((prev) => ({ ...prev, [chunk.chunk_id]: chunk.text }))
+            }
+        } catch (error) {
+            console.error('Error fetching chunk text:', error)
+        }
+    }
 
     if (sources.length === 0) {
         return (
@@ -38,7 +58,7 @@ const SourcesPanel: React.FC = () => {
                         className="bg-primary-card border border-primary-border rounded-lg overflow-hidden"
                     >
                         <button
-                            onClick={() => setExpandedIndex(expandedIndex === index ? null : index)}
+                            onClick={() => toggleSource(index)}
                             className="w-full p-3 flex items-center justify-between hover:bg-primary-card/80 transition-colors"
                         >
                             <div className="flex items-center gap-2 flex-1 min-w-0">
@@ -62,7 +82,7 @@ const SourcesPanel: React.FC = () => {
                         {expandedIndex === index && (
                             <div className="px-3 pb-3">
                                 <div className="bg-primary-bg/50 rounded p-3 text-sm text-text-secondary">
-                                    {source.text}
+                                    {source.text ?? (source.chunk_id && fullText[source.chunk_id]) ?? source.snippet}
                                 </div>
                             </div>
                         )}
@@ -148,10 +148,23 @@ const VoiceAssistantUI: React.FC = () => {
     useEffect(() => {
         if (!room) return
 
-        const handleDataReceived = (payload: Uint8Array) => {
+        const handleDataReceived = async (
+            payload: Uint8Array,
+            _participant?: unknown,
+            _kind?: unknown,
+            topic?: string
+        ) => {
             try {
+                // Compressed payloads arrive on "<type>.deflate" topics
+                const bytes = topic?.endsWith('.deflate')
+                    ? new Uint8Array(
+                          await new Response(
+                              new Blob([payload]).stream().pipeThrough(new DecompressionStream('deflate'))
+                          ).arrayBuffer()
+                      )
+                    : payload
                 const decoder = new TextDecoder()
-                const data = JSON.parse(decoder.decode(payload))
+                const data = JSON.parse(decoder.decode(bytes))
 
                 if (data.type === 'rag_sources' && data.sources) {
                     setSources(data.sources)
@@ -1,5 +1,8 @@
 import api from './api'
-import type { Document, UploadResponse } from '../types'
+import type { Chunk, Document, UploadResponse } from '../types'
+
+// Full chunk text fetched on demand for compact rag_sources payloads
+const chunkCache = new Map<string, Chunk>()
 
 export const documentService = {
     // Upload multiple documents
@@ -23,6 +26,18 @@ export const documentService = {
         return response.data.data  // Backend returns { success, data: [...] }
     },
 
+    // Get full chunk text by chunk ID (cached)
+    getChunks: async (chunkIds: string[]): Promise<Chunk[]> => {
+        const missing = chunkIds.filter((id) => !chunkCache.has(id))
+        if (missing.length > 0) {
+            const params = new URLSearchParams()
+            missing.forEach((id) => params.append('ids', id))
+            const response = await api.get<{ success: boolean; data: Chunk[] }>(`/documents/chunks?${params}`)
+            response.data.data.forEach((chunk) => chunkCache.set(chunk.chunk_id, chunk))
+        }
+        return chunkIds.filter((id) => chunkCache.has(id)).map((id) => chunkCache.get(id)!)
+    },
+
     // Delete document by ID
     delete: async (documentId: string): Promise<void> => {
         await api.delete(`/documents/${documentId}`)
@@ -42,14 +42,25 @@ export interface QueryResponse {
     answer: string
     sources: Source[]
     chunks_used: number
+    context_tokens?: number
 }
 
 export interface Source {
+    chunk_id?: string
     document_name: string
-    text: string
+    text?: string  // Omitted in compact rag_sources payloads; fetch by chunk_id
+    snippet?: string
     similarity?: number
 }
 
+export interface Chunk {
+    chunk_id: string
+    document_id: string
+    document_name: string
+    chunk_index: number
+    text: string
+}
+
 // UI Types
 export interface TranscriptItem {
     id: string